@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Times GameSet.get_games_with_images against the old one-query-per-game
+loop on synthetic libraries of 100, 1,000 and 10,000 games.
+
+    python3 benchmarks/grid_benchmark.py [--runs N] [--images N]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "defaults", "scripts", "shared"))
+import GameSet
+
+SIZES = [100, 1000, 10000]
+
+
+def build_database(path, games, images):
+    game_set = GameSet.GameSet(path, "Benchmark")
+    game_set.create_tables()
+    conn = sqlite3.connect(path)
+    c = conn.cursor()
+    for i in range(games):
+        c.execute("INSERT INTO Game (Title, ShortName, SteamClientID) VALUES (?, ?, ?)",
+                  (f"Game {i:05d}", f"game{i}", str(i) if i % 3 == 0 else None))
+        game_id = c.lastrowid
+        c.executemany("INSERT INTO Images (GameID, ImagePath, FileName, Type, SortOrder) VALUES (?, ?, ?, ?, ?)",
+                      [(game_id, f"https://images.example/{i}/{n}.jpg", "", "vertical_cover", n) for n in range(images)])
+    conn.commit()
+    conn.close()
+    return game_set
+
+
+def old_grid(db_file):
+    """The previous implementation: one SELECT for the games, then one per game."""
+    conn = sqlite3.connect(db_file)
+    c = conn.cursor()
+    c.execute("SELECT Game.ID, ShortName, Title, SteamClientID FROM Game WHERE LOWER(Title) LIKE ? ORDER BY Title COLLATE NOCASE", ('%%',))
+    result = []
+    for game_id, shortname, title, steam_client_id in c.fetchall():
+        c.execute("SELECT ImagePath FROM Images WHERE GameID=? order by SortOrder", (game_id,))
+        images = [row[0] or "" for row in c.fetchall()]
+        result.append({'ID': game_id, 'Name': title, 'Images': images, 'ShortName': shortname, 'SteamClientID': steam_client_id})
+    conn.close()
+    return json.dumps({'Type': 'GameGrid', 'Content': {'NeedsLogin': False, 'Games': result}})
+
+
+def time_ms(fn, runs):
+    fn()  # warm up the page cache
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="timed runs per case, the median is reported")
+    parser.add_argument("--images", type=int, default=4, help="images per game")
+    args = parser.parse_args()
+
+    print(f"{'games':>8} {'old (ms)':>10} {'new (ms)':>10} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for games in SIZES:
+            db_file = os.path.join(tmp, f"grid-{games}.db")
+            game_set = build_database(db_file, games, args.images)
+            old = time_ms(lambda: old_grid(db_file), args.runs)
+            new = time_ms(lambda: game_set.get_games_with_images("", "", "false", "false", False, False), args.runs)
+            print(f"{games:>8} {old:>10.1f} {new:>10.1f} {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,11 @@ function Amazon_refresh() {
     TEMP=$(Amazon_init)
     echo "{\"Type\": \"RefreshContent\", \"Content\": {\"Message\": \"Refreshed\"}}"
 }
+
+# Long-lived JSON-RPC worker used by the plugin for hot actions, see GenericArgs.serve
+function Amazon_worker(){
+    exec "$AMAZONCONF" --worker --dbfile "$DBFILE"
+}
 function Amazon_getgames(){
     if [ -z "${1}" ]; then
         FILTER=""
@@ -36,13 +41,18 @@ function Amazon_getgames(){
     else
         LIMIT="${3}"
     fi
+    # Keyset paging, both empty for the first page / the whole list
+    CURSOR="${4}"
+    PAGE_SIZE="${5}"
+    # title (default), sortingtitle, releasedate, size or installed
+    SORT="${6}"
     IMAGE_PATH=""
-    TEMP=$($AMAZONCONF --getgameswithimages "${IMAGE_PATH}" "${FILTER}" "${INSTALLED}" "${LIMIT}" "true" --dbfile "$DBFILE")
+    TEMP=$($AMAZONCONF --getgameswithimages "${IMAGE_PATH}" "${FILTER}" "${INSTALLED}" "${LIMIT}" "true" "${CURSOR}" "${PAGE_SIZE}" "${SORT}" --dbfile "$DBFILE")
     echo "$TEMP" >> $DECKY_PLUGIN_LOG_DIR/debug.log
     if echo "$TEMP" | jq -e '.Content.Games | length == 0' &>/dev/null; then
-        if [[ $FILTER == "" ]] && [[ $INSTALLED == "false" ]]; then
+        if [[ $FILTER == "" ]] && [[ $INSTALLED == "false" ]] && [[ $CURSOR == "" ]]; then
             TEMP=$(Amazon_init)
-            TEMP=$($AMAZONCONF --getgameswithimages "${IMAGE_PATH}" "${FILTER}" "${INSTALLED}" "${LIMIT}" "true" --dbfile "$DBFILE")
+            TEMP=$($AMAZONCONF --getgameswithimages "${IMAGE_PATH}" "${FILTER}" "${INSTALLED}" "${LIMIT}" "true" "${CURSOR}" "${PAGE_SIZE}" "${SORT}" --dbfile "$DBFILE")
         fi
     fi
     echo "$TEMP"
@@ -228,6 +238,10 @@ function Amazon_getjsonimages(){
     TEMP=$($AMAZONCONF --get-base64-images "${1}" --dbfile "$DBFILE" --offline)
     echo "$TEMP"
 }
+function Amazon_getjsonimagesbatch(){
+    # Short names come in on stdin as a json list
+    $AMAZONCONF --get-batch-images --dbfile "$DBFILE" --offline
+}
 function Amazon_gettabconfig(){
     if [[ ! -d "${DECKY_PLUGIN_RUNTIME_DIR}/conf_schemas" ]]; then
         mkdir -p "${DECKY_PLUGIN_RUNTIME_DIR}/conf_schemas"
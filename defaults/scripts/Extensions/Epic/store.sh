@@ -20,6 +20,11 @@ function Epic_refresh() {
     TEMP=$(Epic_init)
     echo "{\"Type\": \"RefreshContent\", \"Content\": {\"Message\": \"Refreshed\"}}"
 }
+
+# Long-lived JSON-RPC worker used by the plugin for hot actions, see GenericArgs.serve
+function Epic_worker(){
+    exec "$EPICCONF" --worker --dbfile "$DBFILE"
+}
 function Epic_getgames(){
     if [ -z "${1}" ]; then
         FILTER=""
@@ -36,15 +41,20 @@ function Epic_getgames(){
     else
         LIMIT="${3}"
     fi
+    # Keyset paging, both empty for the first page / the whole list
+    CURSOR="${4}"
+    PAGE_SIZE="${5}"
+    # title (default), sortingtitle, releasedate, size or installed
+    SORT="${6}"
     IMAGE_PATH=""
-    TEMP=$($EPICCONF --getgameswithimages "${IMAGE_PATH}" "${FILTER}" "${INSTALLED}" "${LIMIT}" "true" --dbfile "$DBFILE")
+    TEMP=$($EPICCONF --getgameswithimages "${IMAGE_PATH}" "${FILTER}" "${INSTALLED}" "${LIMIT}" "true" "${CURSOR}" "${PAGE_SIZE}" "${SORT}" --dbfile "$DBFILE")
     # This might be a bit fragile, but it should work for now.
     # checking if the Game's content is empty, if it is, then we need to refresh the list
     echo "$TEMP" >> $DECKY_PLUGIN_LOG_DIR/debug.log
     if echo "$TEMP" | jq -e '.Content.Games | length == 0' &>/dev/null; then
-        if [[ $FILTER == "" ]] && [[ $INSTALLED == "false" ]]; then
+        if [[ $FILTER == "" ]] && [[ $INSTALLED == "false" ]] && [[ $CURSOR == "" ]]; then
             TEMP=$(Epic_init)
-            TEMP=$($EPICCONF --getgameswithimages "${IMAGE_PATH}" "${FILTER}" "${INSTALLED}" "${LIMIT}" "true" --dbfile "$DBFILE")
+            TEMP=$($EPICCONF --getgameswithimages "${IMAGE_PATH}" "${FILTER}" "${INSTALLED}" "${LIMIT}" "true" "${CURSOR}" "${PAGE_SIZE}" "${SORT}" --dbfile "$DBFILE")
         fi
     fi
     echo "$TEMP"
@@ -383,6 +393,10 @@ function Epic_getjsonimages(){
     TEMP=$($EPICCONF --get-base64-images "${1}" --dbfile "$DBFILE" --offline)
     echo "$TEMP"
 }
+function Epic_getjsonimagesbatch(){
+    # Short names come in on stdin as a json list
+    $EPICCONF --get-batch-images --dbfile "$DBFILE" --offline
+}
 function Epic_gettabconfig(){
 # Check if conf_schemas directory exists, create it if not
     if [[ ! -d "${DECKY_PLUGIN_RUNTIME_DIR}/conf_schemas" ]]; then
@@ -27,6 +27,11 @@ function GOG_refresh() {
     TEMP=$(GOG_init)
     echo "{\"Type\": \"RefreshContent\", \"Content\": {\"Message\": \"Refreshed\"}}"
 }
+
+# Long-lived JSON-RPC worker used by the plugin for hot actions, see GenericArgs.serve
+function GOG_worker(){
+    exec "$GOGCONF" --worker --dbfile "$DBFILE"
+}
 function GOG_getgames(){
     if [ -z "${1}" ]; then
         FILTER=""
@@ -43,13 +48,18 @@ function GOG_getgames(){
     else
         LIMIT="${3}"
     fi
+    # Keyset paging, both empty for the first page / the whole list
+    CURSOR="${4}"
+    PAGE_SIZE="${5}"
+    # title (default), sortingtitle, releasedate, size or installed
+    SORT="${6}"
     IMAGE_PATH=""
-    TEMP=$($GOGCONF --getgameswithimages "${IMAGE_PATH}" "${FILTER}" "${INSTALLED}" "${LIMIT}" "true" --dbfile "$DBFILE")
+    TEMP=$($GOGCONF --getgameswithimages "${IMAGE_PATH}" "${FILTER}" "${INSTALLED}" "${LIMIT}" "true" "${CURSOR}" "${PAGE_SIZE}" "${SORT}" --dbfile "$DBFILE")
     echo "$TEMP" >> $DECKY_PLUGIN_LOG_DIR/debug.log
     if echo "$TEMP" | jq -e '.Content.Games | length == 0' &>/dev/null; then
-        if [[ $FILTER == "" ]] && [[ $INSTALLED == "false" ]]; then
+        if [[ $FILTER == "" ]] && [[ $INSTALLED == "false" ]] && [[ $CURSOR == "" ]]; then
             TEMP=$(GOG_init)
-            TEMP=$($GOGCONF --getgameswithimages "${IMAGE_PATH}" "${FILTER}" "${INSTALLED}" "${LIMIT}" "true" --dbfile "$DBFILE")
+            TEMP=$($GOGCONF --getgameswithimages "${IMAGE_PATH}" "${FILTER}" "${INSTALLED}" "${LIMIT}" "true" "${CURSOR}" "${PAGE_SIZE}" "${SORT}" --dbfile "$DBFILE")
         fi
     fi
     echo "$TEMP"
@@ -330,6 +340,10 @@ function GOG_getjsonimages(){
     TEMP=$($GOGCONF --get-base64-images "${1}" --dbfile "$DBFILE" --offline)
     echo "$TEMP"
 }
+function GOG_getjsonimagesbatch(){
+    # Short names come in on stdin as a json list
+    $GOGCONF --get-batch-images --dbfile "$DBFILE" --offline
+}
 function GOG_gettabconfig(){
     if [[ ! -d "${DECKY_PLUGIN_RUNTIME_DIR}/conf_schemas" ]]; then
         mkdir -p "${DECKY_PLUGIN_RUNTIME_DIR}/conf_schemas"
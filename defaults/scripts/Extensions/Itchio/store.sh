@@ -20,6 +20,11 @@ function Itchio_refresh() {
     TEMP=$(Itchio_init)
     echo "{\"Type\": \"RefreshContent\", \"Content\": {\"Message\": \"Refreshed\"}}"
 }
+
+# Long-lived JSON-RPC worker used by the plugin for hot actions, see GenericArgs.serve
+function Itchio_worker(){
+    exec "$ITCHIOCONF" --worker --dbfile "$DBFILE"
+}
 function Itchio_getgames(){
     if [ -z "${1}" ]; then
         FILTER=""
@@ -36,13 +41,18 @@ function Itchio_getgames(){
     else
         LIMIT="${3}"
     fi
+    # Keyset paging, both empty for the first page / the whole list
+    CURSOR="${4}"
+    PAGE_SIZE="${5}"
+    # title (default), sortingtitle, releasedate, size or installed
+    SORT="${6}"
     IMAGE_PATH=""
-    TEMP=$($ITCHIOCONF --getgameswithimages "${IMAGE_PATH}" "${FILTER}" "${INSTALLED}" "${LIMIT}" "true" --dbfile "$DBFILE")
+    TEMP=$($ITCHIOCONF --getgameswithimages "${IMAGE_PATH}" "${FILTER}" "${INSTALLED}" "${LIMIT}" "true" "${CURSOR}" "${PAGE_SIZE}" "${SORT}" --dbfile "$DBFILE")
     echo "$TEMP" >> $DECKY_PLUGIN_LOG_DIR/debug.log
     if echo "$TEMP" | jq -e '.Content.Games | length == 0' &>/dev/null; then
-        if [[ $FILTER == "" ]] && [[ $INSTALLED == "false" ]]; then
+        if [[ $FILTER == "" ]] && [[ $INSTALLED == "false" ]] && [[ $CURSOR == "" ]]; then
             TEMP=$(Itchio_init)
-            TEMP=$($ITCHIOCONF --getgameswithimages "${IMAGE_PATH}" "${FILTER}" "${INSTALLED}" "${LIMIT}" "true" --dbfile "$DBFILE")
+            TEMP=$($ITCHIOCONF --getgameswithimages "${IMAGE_PATH}" "${FILTER}" "${INSTALLED}" "${LIMIT}" "true" "${CURSOR}" "${PAGE_SIZE}" "${SORT}" --dbfile "$DBFILE")
         fi
     fi
     echo "$TEMP"
@@ -203,6 +213,10 @@ function Itchio_getjsonimages(){
     TEMP=$($ITCHIOCONF --get-base64-images "${1}" --dbfile "$DBFILE" --offline)
     echo "$TEMP"
 }
+function Itchio_getjsonimagesbatch(){
+    # Short names come in on stdin as a json list
+    $ITCHIOCONF --get-batch-images --dbfile "$DBFILE" --offline
+}
 function Itchio_gettabconfig(){
     if [[ ! -d "${DECKY_PLUGIN_RUNTIME_DIR}/conf_schemas" ]]; then
         mkdir -p "${DECKY_PLUGIN_RUNTIME_DIR}/conf_schemas"
@@ -30,6 +30,8 @@ class AmazonArgs(GameSet.GenericArgs):
         self.parser.add_argument(
             '--get-base64-images', help='Get base64 images for short name'
         )
+        self.parser.add_argument(
+            '--get-batch-images', help='Get images for many games, a json list of short names is read from stdin', action='store_true')
         self.parser.add_argument(
             '--offline', help='Offline mode', action='store_true')
         self.parser.add_argument(
@@ -43,10 +45,12 @@ class AmazonArgs(GameSet.GenericArgs):
         self.parser.add_argument(
             '--process-fuel-json', help='Process fuel.json to extract exe path for game')
 
-    def parseArgs(self):
-        super().parseArgs()
-        self.gameSet = amazon.Amazon(self.args.dbfile, self.storeName, self.setNameConfig)
-        self.gameSet.create_tables()
+    def parseArgs(self, argv=None):
+        super().parseArgs(argv)
+        # In worker mode the store object and its database stay warm between requests
+        if self.gameSet is None or self.gameSet.db_file != self.args.dbfile:
+            self.gameSet = amazon.Amazon(self.args.dbfile, self.storeName, self.setNameConfig)
+            self.gameSet.create_tables()
 
     def processArgs(self):
         try:
@@ -79,6 +83,9 @@ class AmazonArgs(GameSet.GenericArgs):
             if self.args.get_base64_images:
                 print(self.gameSet.get_base64_images(
                     self.args.get_base64_images))
+            if self.args.get_batch_images:
+                print(self.gameSet.get_batch_images(
+                    self.gameSet.read_json_from_stdin()))
             if self.args.has_updates:
                 print(self.gameSet.has_updates(self.args.has_updates))
             if self.args.update_game_details:
@@ -99,7 +106,10 @@ class AmazonArgs(GameSet.GenericArgs):
 def main():
     amazonArgs = AmazonArgs("Amazon", "Proton")
     amazonArgs.parseArgs()
-    amazonArgs.processArgs()
+    if amazonArgs.args.worker:
+        amazonArgs.serve()
+    else:
+        amazonArgs.processArgs()
 
 
 if __name__ == '__main__':
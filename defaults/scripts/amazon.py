@@ -5,6 +5,7 @@ import os
 import sqlite3
 import sys
 import subprocess
+import signal
 import time
 
 import GamesDb
@@ -23,10 +24,18 @@ class Amazon(GamesDb.GamesDb):
     nile_cmd = os.path.expanduser(os.environ.get('NILE', '~/.local/bin/nile'))
     nile_config_dir = os.path.expanduser('~/.config/nile')
 
-    def execute_shell(self, cmd):
-        result = subprocess.Popen(cmd, stdout=subprocess.PIPE, stdin=subprocess.PIPE,
+    def execute_shell(self, cmd, timeout=120):
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stdin=subprocess.PIPE,
                                   stderr=subprocess.PIPE,
-                                  shell=True).communicate()[0].decode()
+                                  shell=True, start_new_session=True)
+        try:
+            stdout, stderr = proc.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            # Kill the whole group, not just the shell, so nile doesn't linger
+            os.killpg(proc.pid, signal.SIGKILL)
+            proc.communicate()
+            raise CmdException(f"Command timed out after {timeout}s: {cmd}")
+        result = stdout.decode()
 
         if result.strip() == "":
             raise CmdException(f"Command produced no output (try installing dependencies from the About menu): {cmd}")
@@ -39,7 +48,7 @@ class Amazon(GamesDb.GamesDb):
     def get_list(self, offline=False):
         # Sync library first
         try:
-            self.execute_shell(f"{self.nile_cmd} library sync")
+            self.execute_shell(f"{self.nile_cmd} library sync", timeout=600)
         except CmdException:
             pass  # sync may fail offline, continue with cached data
 
@@ -61,58 +70,59 @@ class Amazon(GamesDb.GamesDb):
                 id_list.append(game_id)
                 game_dict[game_id] = game
 
-        left_overs = self.insert_data(id_list)
+        left_overs, misses = self.insert_data(id_list)
         print(f"left_overs: {left_overs}", file=sys.stderr)
+        stored = set()
         for game_id in left_overs:
-            if game_id in game_dict:
-                self.proccess_leftovers(game_dict[game_id])
+            if game_id in game_dict and self.proccess_leftovers(game_dict[game_id]):
+                stored.add(game_id)
+        # Only once the fallback has the game, or a failure would hide it
+        self.record_metadata_misses([miss for miss in misses if miss[0] in stored])
 
     def proccess_leftovers(self, game):
         product = game.get('product', {})
         details = product.get('productDetail', {}).get('details', {})
         title = product.get('title', game.get('title', 'Unknown'))
         print(f"Processing leftover Amazon game: {title}", file=sys.stderr)
-        conn = self.get_connection()
-        c = conn.cursor()
-
         try:
-            game_id = str(product.get('id', game.get('id', '')))
-            shortname = game_id
-
-            c.execute("SELECT * FROM Game WHERE ShortName=?", (shortname,))
-            result = c.fetchone()
-            if result is None:
-                notes = details.get('shortDescription', '')
-                publisher = details.get('publisher', '')
-                developer = details.get('developer', '')
-                release_date = details.get('releaseDate', '')
-                icon_url = product.get('productDetail', {}).get('iconUrl', '')
-
-                vals = [
-                    title, notes, "", "", publisher, "", "Amazon",
-                    game_id, "", "", developer, release_date,
-                    "", "", "", "", shortname,
-                ]
-                cols_with_pk = [
-                    "Title", "Notes", "ApplicationPath", "ManualPath",
-                    "Publisher", "RootFolder", "Source", "DatabaseID",
-                    "Genre", "ConfigurationPath", "Developer", "ReleaseDate",
-                    "Size", "InstallPath", "UmuId", "SteamClientID", "ShortName"
-                ]
-                placeholders = ', '.join(['?' for _ in range(len(cols_with_pk))])
-                tmp = f"INSERT INTO Game ({', '.join(cols_with_pk)}) VALUES ({placeholders})"
-                c.execute(tmp, vals)
-
-                game_id_db = c.lastrowid
-                if icon_url:
-                    c.execute(
-                        "INSERT INTO Images (GameID, ImagePath, FileName, SortOrder, Type) VALUES (?, ?, ?, ?, ?)",
-                        (game_id_db, icon_url, '', 0, 'vertical_cover'))
-                conn.commit()
+            with self.transaction() as conn:
+                c = conn.cursor()
+                game_id = str(product.get('id', game.get('id', '')))
+                shortname = game_id
+
+                c.execute("SELECT * FROM Game WHERE ShortName=?", (shortname,))
+                result = c.fetchone()
+                if result is None:
+                    notes = details.get('shortDescription', '')
+                    publisher = details.get('publisher', '')
+                    developer = details.get('developer', '')
+                    release_date = details.get('releaseDate', '')
+                    icon_url = product.get('productDetail', {}).get('iconUrl', '')
+
+                    vals = [
+                        title, notes, "", "", publisher, "", "Amazon",
+                        game_id, "", "", developer, release_date,
+                        "", "", "", "", shortname,
+                    ]
+                    cols_with_pk = [
+                        "Title", "Notes", "ApplicationPath", "ManualPath",
+                        "Publisher", "RootFolder", "Source", "DatabaseID",
+                        "Genre", "ConfigurationPath", "Developer", "ReleaseDate",
+                        "Size", "InstallPath", "UmuId", "SteamClientID", "ShortName"
+                    ]
+                    placeholders = ', '.join(['?' for _ in range(len(cols_with_pk))])
+                    tmp = f"INSERT INTO Game ({', '.join(cols_with_pk)}) VALUES ({placeholders})"
+                    c.execute(tmp, vals)
+
+                    game_id_db = c.lastrowid
+                    if icon_url:
+                        c.execute(
+                            "INSERT INTO Images (GameID, ImagePath, FileName, SortOrder, Type) VALUES (?, ?, ?, ?, ?)",
+                            (game_id_db, icon_url, '', 0, 'vertical_cover'))
+            return True
         except Exception as e:
             print(f"Error parsing metadata for Amazon game: {title} {e}", file=sys.stderr)
-
-        conn.close()
+            return False
 
     def process_fuel_json(self, game_id):
         """Parse fuel.json from installed game to extract exe path and store in DB."""
@@ -150,12 +160,9 @@ class Amazon(GamesDb.GamesDb):
         if not os.path.exists(fuel_path):
             print(f"No fuel.json found at {fuel_path}", file=sys.stderr)
             # Still update RootFolder so launch options have the install dir
-            conn = self.get_connection()
-            c = conn.cursor()
-            c.execute("UPDATE Game SET RootFolder=?, InstallPath=? WHERE ShortName=?",
-                      (install_path, install_path, game_id))
-            conn.commit()
-            conn.close()
+            with self.transaction() as conn:
+                conn.execute("UPDATE Game SET RootFolder=?, InstallPath=? WHERE ShortName=?",
+                             (install_path, install_path, game_id))
             return
 
         try:
@@ -169,12 +176,9 @@ class Amazon(GamesDb.GamesDb):
             print(f"Exe file: {exe_file}", file=sys.stderr)
             print(f"Install path: {install_path}", file=sys.stderr)
 
-            conn = self.get_connection()
-            c = conn.cursor()
-            c.execute("UPDATE Game SET ApplicationPath=?, RootFolder=?, Arguments=?, InstallPath=? WHERE ShortName=?",
-                      (exe_file, install_path, args, install_path, game_id))
-            conn.commit()
-            conn.close()
+            with self.transaction() as conn:
+                conn.execute("UPDATE Game SET ApplicationPath=?, RootFolder=?, Arguments=?, InstallPath=? WHERE ShortName=?",
+                             (exe_file, install_path, args, install_path, game_id))
         except Exception as e:
             print(f"Error parsing fuel.json for {game_id}: {e}", file=sys.stderr)
 
@@ -227,7 +231,7 @@ class Amazon(GamesDb.GamesDb):
         try:
             # Sync library to get latest versions
             try:
-                self.execute_shell(f"{self.nile_cmd} library sync")
+                self.execute_shell(f"{self.nile_cmd} library sync", timeout=600)
             except CmdException:
                 pass
 
@@ -271,17 +275,7 @@ class Amazon(GamesDb.GamesDb):
 
     def get_game_size(self, game_id, installed):
         if installed == 'true':
-            conn = self.get_connection()
-            c = conn.cursor()
-            c.row_factory = sqlite3.Row
-            c.execute("SELECT Size FROM Game WHERE ShortName=?", (game_id,))
-            result = c.fetchone()
-            conn.close()
-            if result and bool(result['Size']):
-                disk_size = result['Size']
-                size = f"Size on Disk: {disk_size}"
-            else:
-                size = ""
+            size = self.get_disk_size(game_id)
         else:
             try:
                 result = self.execute_shell_json(f"{self.nile_cmd} install --info --json {game_id}")
@@ -332,21 +326,22 @@ class Amazon(GamesDb.GamesDb):
         c = conn.cursor()
         c.execute("SELECT * FROM Game WHERE ShortName=?", (game_id,))
         result = c.fetchone()
+        conn.close()
         if result is not None:
             try:
                 info = self.execute_shell_json(f"{self.nile_cmd} install --info --json {game_id}")
                 title = info.get('title', '')
                 download_size = info.get('download_size', info.get('size', 0))
                 install_path = info.get('install_path', info.get('path', ''))
-                size = self.convert_bytes(int(download_size)) if download_size else None
+                size_bytes = int(download_size) if download_size else None
+                size = self.convert_bytes(size_bytes) if size_bytes else None
                 if title:
-                    c.execute(
-                        "UPDATE Game SET Title=?, Size=?, InstallPath=? WHERE ShortName=?",
-                        (title, size, install_path, game_id))
-                conn.commit()
+                    with self.transaction() as conn:
+                        conn.execute(
+                            "UPDATE Game SET Title=?, Size=?, SizeBytes=?, InstallPath=? WHERE ShortName=?",
+                            (title, size, size_bytes, install_path, game_id))
             except Exception as e:
                 print(f"Error updating Amazon game details: {e}", file=sys.stderr)
-        conn.close()
 
     # Nile progress format (individual lines):
     # Progress: 45.67 (no percent sign, just a number)
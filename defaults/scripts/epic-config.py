@@ -37,6 +37,8 @@ class EpicArgs(GameSet.GenericArgs):
         self.parser.add_argument(
             '--get-base64-images', help='Get base64 images for short name'
         )
+        self.parser.add_argument(
+            '--get-batch-images', help='Get images for many games, a json list of short names is read from stdin', action='store_true')
         self.parser.add_argument(
             '--offline', help='Offline mode', action='store_true')
         self.parser.add_argument(
@@ -53,10 +55,12 @@ class EpicArgs(GameSet.GenericArgs):
         self.parser.add_argument(
             '--get-autosync', help='Check if auto-sync is enabled')
 
-    def parseArgs(self):
-        super().parseArgs()
-        self.gameSet = epic.Epic(self.args.dbfile, self.storeName, self.setNameConfig)
-        self.gameSet.create_tables()
+    def parseArgs(self, argv=None):
+        super().parseArgs(argv)
+        # In worker mode the store object and its database stay warm between requests
+        if self.gameSet is None or self.gameSet.db_file != self.args.dbfile:
+            self.gameSet = epic.Epic(self.args.dbfile, self.storeName, self.setNameConfig)
+            self.gameSet.create_tables()
 
     def processArgs(self):
         try:
@@ -92,6 +96,9 @@ class EpicArgs(GameSet.GenericArgs):
             if self.args.get_base64_images:
                 print(self.gameSet.get_base64_images(
                     self.args.get_base64_images))
+            if self.args.get_batch_images:
+                print(self.gameSet.get_batch_images(
+                    self.gameSet.read_json_from_stdin()))
             if self.args.update_game_details:
                 self.gameSet.update_game_details(
                     self.args.update_game_details)
@@ -116,7 +123,10 @@ class EpicArgs(GameSet.GenericArgs):
 def main():
     epicArgs = EpicArgs("Epic","Proton")
     epicArgs.parseArgs()
-    epicArgs.processArgs()
+    if epicArgs.args.worker:
+        epicArgs.serve()
+    else:
+        epicArgs.processArgs()
 
 
 if __name__ == '__main__':
@@ -3,12 +3,12 @@ import re
 import json
 import argparse
 import os
-import sqlite3
 import sys
 import xml.etree.ElementTree as ET
 
 from typing import List
 import subprocess
+import signal
 import time
 
 import GamesDb
@@ -58,11 +58,18 @@ class Epic(GamesDb.GamesDb):
 
     legendary_cmd = os.path.expanduser( os.environ['LEGENDARY'])
 
-    def execute_shell(self, cmd):
-       
-        result = subprocess.Popen(cmd, stdout=subprocess.PIPE, stdin=subprocess.PIPE,
+    def execute_shell(self, cmd, timeout=120):
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stdin=subprocess.PIPE,
                                   stderr=subprocess.PIPE,
-                                  shell=True).communicate()[0].decode()
+                                  shell=True, start_new_session=True)
+        try:
+            stdout, stderr = proc.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            # Kill the whole group, not just the shell, so legendary doesn't linger
+            os.killpg(proc.pid, signal.SIGKILL)
+            proc.communicate()
+            raise CmdException(f"Command timed out after {timeout}s: {cmd}")
+        result = stdout.decode()
 
         if "[cli] ERROR:" in result:
             raise CmdException(result)
@@ -75,8 +82,9 @@ class Epic(GamesDb.GamesDb):
 
     def get_list(self,  offline):
         offline_switch = "--offline" if offline else ""
+        # Listing a large library fetches metadata for every game, allow it longer
         games_list = self.execute_shell(os.path.expanduser(
-            f"{self.legendary_cmd} list --json {offline_switch}"))
+            f"{self.legendary_cmd} list --json {offline_switch}"), timeout=600)
         id_list = []
         game_dict = {}
         for game in games_list:
@@ -84,101 +92,101 @@ class Epic(GamesDb.GamesDb):
             id_list.append(shortname)
             game_dict.update({shortname: game})
                 
-        left_overs = self.insert_data(id_list)
+        left_overs, misses = self.insert_data(id_list)
         print(f"left_overs: {left_overs}", file=sys.stderr)
+        stored = set()
         for game in left_overs:
-            self.proccess_leftovers(game_dict[game])
+            if self.proccess_leftovers(game_dict[game]):
+                stored.add(game)
+        # Only once the fallback has the game, or a failure would hide it
+        self.record_metadata_misses([miss for miss in misses if miss[0] in stored])
 
    
     def proccess_leftovers(self, game):
         print(f"Processing leftover game: {game['app_title']}", file=sys.stderr)
-        conn = self.get_connection()
-        c = conn.cursor()
-
-       
         try:
-            title = game['app_title'].replace("''", "'")
-            shortname = game['asset_infos']['Windows']['asset_id']
-
-            c.execute("SELECT * FROM Game WHERE ShortName=?", (shortname,))
-            result = c.fetchone()
-            if result is None:
-                notes = game['metadata']['description']
-                application_path = ""
-                manual_path = ""
-                root_folder = ""
-                source = "Epic"
-                database_id = game['app_name']
-                genre = ""
-                configuration_path = ""
-                publisher = game['metadata']['developer']
-                developer = game['metadata']['developer']
-                release_date = game['metadata']['creationDate']
-                vals = [
-                    title,
-                    notes,
-                    application_path,
-                    manual_path,
-                    publisher,
-                    root_folder,
-                    source,
-                    database_id,
-                    genre,
-                    configuration_path,
-                    developer,
-                    release_date,
-                    "",
-                    "",
-                    "",
-                    "",
-                    shortname,
+            with self.transaction() as conn:
+                c = conn.cursor()
+                title = game['app_title'].replace("''", "'")
+                shortname = game['asset_infos']['Windows']['asset_id']
+
+                c.execute("SELECT * FROM Game WHERE ShortName=?", (shortname,))
+                result = c.fetchone()
+                if result is None:
+                    notes = game['metadata']['description']
+                    application_path = ""
+                    manual_path = ""
+                    root_folder = ""
+                    source = "Epic"
+                    database_id = game['app_name']
+                    genre = ""
+                    configuration_path = ""
+                    publisher = game['metadata']['developer']
+                    developer = game['metadata']['developer']
+                    release_date = game['metadata']['creationDate']
+                    vals = [
+                        title,
+                        notes,
+                        application_path,
+                        manual_path,
+                        publisher,
+                        root_folder,
+                        source,
+                        database_id,
+                        genre,
+                        configuration_path,
+                        developer,
+                        release_date,
+                        "",
+                        "",
+                        "",
+                        "",
+                        shortname,
                     
-                ]
-                cols = ["Title",
-                        "Notes",
-                        "ApplicationPath",
-                        "ManualPath",
-                        "Publisher",
-                        "RootFolder",
-                        "Source",
-                        "DatabaseID",
-                        "Genre",
-                        "ConfigurationPath",
-                        "Developer",
-                        "ReleaseDate",
-                        "Size",
-                        "InstallPath",
-                        "UmuId"
-                        ]
-                # print(f"Inserting game {title} into database: {vals}")
-
-                placeholders = ', '.join(
-                    ['?' for _ in range(len(cols))])
-                cols_with_pk = cols + ["SteamClientID", "ShortName"]
-                placeholders = ', '.join(
-                    ['?' for _ in range(len(cols_with_pk))])
-                tmp = f"INSERT INTO Game ({', '.join(cols_with_pk)}) VALUES ({placeholders})"
-                # print(tmp)
-                c.execute(tmp, vals)
-
-                game_id = c.lastrowid
-                # Insert images into the Images table
-                for image in game['metadata']['keyImages']:
-                    width = image['width']
-                    height = image['height']
-                    Type = ""
-                    if height > width:
-                        Type = "vertical_cover"
-                    else:
-                        Type = "horizontal_artwork"
-                    c.execute(
-                        "INSERT INTO Images (GameID, ImagePath, FileName, SortOrder, Type) VALUES (?, ?, ?, ?,?)", (game_id, image['url'], '', image['width'], Type))
-                conn.commit()
-
+                    ]
+                    cols = ["Title",
+                            "Notes",
+                            "ApplicationPath",
+                            "ManualPath",
+                            "Publisher",
+                            "RootFolder",
+                            "Source",
+                            "DatabaseID",
+                            "Genre",
+                            "ConfigurationPath",
+                            "Developer",
+                            "ReleaseDate",
+                            "Size",
+                            "InstallPath",
+                            "UmuId"
+                            ]
+                    # print(f"Inserting game {title} into database: {vals}")
+
+                    placeholders = ', '.join(
+                        ['?' for _ in range(len(cols))])
+                    cols_with_pk = cols + ["SteamClientID", "ShortName"]
+                    placeholders = ', '.join(
+                        ['?' for _ in range(len(cols_with_pk))])
+                    tmp = f"INSERT INTO Game ({', '.join(cols_with_pk)}) VALUES ({placeholders})"
+                    # print(tmp)
+                    c.execute(tmp, vals)
+
+                    game_id = c.lastrowid
+                    # Insert images into the Images table
+                    for image in game['metadata']['keyImages']:
+                        width = image['width']
+                        height = image['height']
+                        Type = ""
+                        if height > width:
+                            Type = "vertical_cover"
+                        else:
+                            Type = "horizontal_artwork"
+                        c.execute(
+                            "INSERT INTO Images (GameID, ImagePath, FileName, SortOrder, Type) VALUES (?, ?, ?, ?,?)", (game_id, image['url'], '', image['width'], Type))
+            return True
         except Exception as e:
             print(f"Error parsing metadata for game: {title} {e}")
-
-        conn.close()
+            return False
 
     def get_working_dir(self, game_id, offline):
         self.get_directory(offline, game_id, 'working_directory')
@@ -277,17 +285,7 @@ class Epic(GamesDb.GamesDb):
 
     def get_game_size(self, game_id, installed):
         if installed == 'true':
-            conn = self.get_connection()
-            c = conn.cursor()
-            c.row_factory = sqlite3.Row
-            c.execute("SELECT Size FROM Game WHERE ShortName=?", (game_id,))
-            result = c.fetchone()
-            conn.close()
-            if result and bool(result['Size']):
-                disk_size = result['Size']
-                size = f"Size on Disk: {disk_size}"
-            else:
-                size = ""
+            size = self.get_disk_size(game_id)
         else:
             result = self.execute_shell(f"{self.legendary_cmd} info {game_id} --json")
             manifest = result.get('manifest')
@@ -342,15 +340,19 @@ class Epic(GamesDb.GamesDb):
         c = conn.cursor()
         c.execute("SELECT * FROM Game WHERE ShortName=?", (game_id,))
         result = c.fetchone()
+        conn.close()
         if result is not None:
             result = self.execute_shell(f"{self.legendary_cmd} info {game_id} --json --offline")
             game = result['game']
             title = game['title']
             install = result['install']
+            size = None
+            size_bytes = None
             if install != None:
                 print(f"install info: {install}", file=sys.stderr)
                 if install != None and bool(install['disk_size']):
                     disk_size = install['disk_size']
+                    size_bytes = int(disk_size)
                     print(f"disk_size: {disk_size}", file=sys.stderr)
 
                     size = f"{self.convert_bytes(disk_size)}"
@@ -359,11 +361,10 @@ class Epic(GamesDb.GamesDb):
                 else:
                     size = None
 
-            c.execute(
-                "UPDATE Game SET Title=?, Size=? WHERE ShortName=?", 
-                (title, size, game_id))
-            conn.commit()
-            conn.close()
+            with self.transaction() as conn:
+                conn.execute(
+                    "UPDATE Game SET Title=?, Size=?, SizeBytes=? WHERE ShortName=?", 
+                    (title, size, size_bytes, game_id))
 
     # [DLManager] INFO: = Progress: 0.51% (368/72002), Running for 00:01:58, ETA: 06:23:02
     # [DLManager] INFO:  - Downloaded: 316.12 MiB, Written: 361.03 MiB
@@ -471,15 +472,13 @@ class Epic(GamesDb.GamesDb):
         return json.dumps({'Type': 'ProgressUpdate', 'Content': last_progress_update})
 
     def toggle_autosync(self, game_id):
-        conn = self.get_connection()
-        c = conn.cursor()
-        c.execute("SELECT CloudSaveAutoSync FROM Game WHERE ShortName=?", (game_id,))
-        result = c.fetchone()
-        current = result[0] if result and result[0] else 0
-        new_val = 0 if current else 1
-        c.execute("UPDATE Game SET CloudSaveAutoSync=? WHERE ShortName=?", (new_val, game_id))
-        conn.commit()
-        conn.close()
+        with self.transaction() as conn:
+            c = conn.cursor()
+            c.execute("SELECT CloudSaveAutoSync FROM Game WHERE ShortName=?", (game_id,))
+            result = c.fetchone()
+            current = result[0] if result and result[0] else 0
+            new_val = 0 if current else 1
+            c.execute("UPDATE Game SET CloudSaveAutoSync=? WHERE ShortName=?", (new_val, game_id))
         state = "enabled" if new_val else "disabled"
         return json.dumps({'Type': 'Success', 'Content': {'Message': f'Cloud save auto-sync {state}'}})
 
@@ -11,13 +11,13 @@ PLATFORM="${1}"
 
 # List of actions that can be performed by the gamevault.sh script
 ACTIONS=("init" "getgames" "getactions" "saveconfig" "getconfig" "download" \
-"install" "update" "verify" "repair" "import" "getjsonimages" "cancelinstall" \
+"install" "update" "verify" "repair" "import" "getjsonimages" "getjsonimagesbatch" "cancelinstall" \
 "uninstall" "protontricks" "enable-eos-overlay" "disable-eos-overlay" \
 "getgamedetails" "getbats" "savebats" "getprogress" "login" \
 "login-launch-options" "logout" "loginstatus" "getsetting" "savesetting" \
 "getlaunchoptions" "run-exe" "get-exe-list" "gettabconfig" "savetabconfig" \
 "saveplatformconfig" "getplatformconfig" "refresh" "getgamesize" "move" "repair_and_update" \
-"download-saves" "upload-saves" "toggle-autosync" "checkupdate")
+"download-saves" "upload-saves" "toggle-autosync" "checkupdate" "worker")
 
 
 # Function to source scripts recursively from a directory
@@ -30,6 +30,8 @@ class GOGArgs(GameSet.GenericArgs):
         self.parser.add_argument(
             '--get-base64-images', help='Get base64 images for short name'
         )
+        self.parser.add_argument(
+            '--get-batch-images', help='Get images for many games, a json list of short names is read from stdin', action='store_true')
         self.parser.add_argument(
             '--offline', help='Offline mode', action='store_true')
         self.parser.add_argument(
@@ -57,10 +59,12 @@ class GOGArgs(GameSet.GenericArgs):
         self.parser.add_argument(
             '--retrodetect', help='Retrodetect game types for installed games', action='store_true')
 
-    def parseArgs(self):
-        super().parseArgs()
-        self.gameSet = gog.GOG(self.args.dbfile, self.storeName, self.setNameConfig)
-        self.gameSet.create_tables()
+    def parseArgs(self, argv=None):
+        super().parseArgs(argv)
+        # In worker mode the store object and its database stay warm between requests
+        if self.gameSet is None or self.gameSet.db_file != self.args.dbfile:
+            self.gameSet = gog.GOG(self.args.dbfile, self.storeName, self.setNameConfig)
+            self.gameSet.create_tables()
 
     def processArgs(self):
         try:
@@ -93,6 +97,9 @@ class GOGArgs(GameSet.GenericArgs):
             if self.args.get_base64_images:
                 print(self.gameSet.get_base64_images(
                     self.args.get_base64_images))
+            if self.args.get_batch_images:
+                print(self.gameSet.get_batch_images(
+                    self.gameSet.read_json_from_stdin()))
             if self.args.has_updates:
                 print(self.gameSet.has_updates(self.args.has_updates))
             if self.args.update_game_details:
@@ -126,7 +133,10 @@ class GOGArgs(GameSet.GenericArgs):
 def main():
     gogArgs = GOGArgs("GOG", "Proton")
     gogArgs.parseArgs()
-    gogArgs.processArgs()
+    if gogArgs.args.worker:
+        gogArgs.serve()
+    else:
+        gogArgs.processArgs()
 
 
 if __name__ == '__main__':
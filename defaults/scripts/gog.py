@@ -5,11 +5,13 @@ import os
 import sqlite3
 import sys
 import subprocess
+import signal
 import time
 import urllib.request
 import urllib.error
 
 import GamesDb
+import HttpClient
 from datetime import datetime, timedelta
 
 
@@ -31,11 +33,12 @@ class GOG(GamesDb.GamesDb):
     def execute_shell(self, cmd, timeout=120):
         proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stdin=subprocess.PIPE,
                                   stderr=subprocess.PIPE,
-                                  shell=True)
+                                  shell=True, start_new_session=True)
         try:
             stdout, stderr = proc.communicate(timeout=timeout)
         except subprocess.TimeoutExpired:
-            proc.kill()
+            # Kill the whole group, not just the shell, so gogdl doesn't linger
+            os.killpg(proc.pid, signal.SIGKILL)
             proc.communicate()
             raise CmdException(f"Command timed out after {timeout}s: {cmd}")
         result = stdout.decode()
@@ -106,9 +109,7 @@ class GOG(GamesDb.GamesDb):
             'refresh_token': token_info['refresh_token'],
         })
 
-        req = urllib.request.Request(refresh_url)
-        resp = urllib.request.urlopen(req, timeout=30)
-        new_tokens = json.loads(resp.read())
+        new_tokens = HttpClient.get(refresh_url, timeout=30).json()
 
         token_info['access_token'] = new_tokens['access_token']
         token_info['expires_in'] = new_tokens['expires_in']
@@ -128,71 +129,74 @@ class GOG(GamesDb.GamesDb):
     def get_list(self, offline=False):
         # Use GOG API to get owned game IDs
         access_token = self._get_auth_token()
-        req = urllib.request.Request(
+        data = HttpClient.get(
             'https://embed.gog.com/user/data/games',
-            headers={'Authorization': f'Bearer {access_token}'}
-        )
-        resp = urllib.request.urlopen(req, timeout=30)
-        data = json.loads(resp.read())
+            headers={'Authorization': f'Bearer {access_token}'},
+            timeout=30
+        ).json()
         owned_ids = [str(gid) for gid in data.get('owned', [])]
 
-        left_overs = self.insert_data(owned_ids)
+        left_overs, misses = self.insert_data(owned_ids)
         print(f"left_overs: {left_overs}", file=sys.stderr)
 
         # Fetch titles for new games from the public GOG API
         # Only add actual games — skip DLC, packs/bundles, and delisted products (404)
+        # Those are remembered, so later refreshes don't ask again
+        not_games = []
+        stored = set()
         for game_id in left_overs:
             gamename = ''
             try:
-                prod_req = urllib.request.Request(
-                    f'https://api.gog.com/products/{game_id}',
-                    headers={'User-Agent': 'Mozilla/5.0'}
-                )
-                prod_resp = urllib.request.urlopen(prod_req, timeout=10)
-                prod_data = json.loads(prod_resp.read())
+                prod_data = HttpClient.get(f'https://api.gog.com/products/{game_id}', timeout=10).json()
                 game_type = prod_data.get('game_type', '')
                 if game_type != 'game':
                     print(f"Skipping {game_type}: {prod_data.get('title', game_id)}", file=sys.stderr)
+                    not_games.append((game_id, game_type or "not a game"))
                     continue
                 gamename = prod_data.get('title', '')
             except urllib.error.HTTPError as e:
                 print(f"Skipping {game_id}: HTTP {e.code}", file=sys.stderr)
+                if e.code in (404, 410):
+                    not_games.append((game_id, "delisted"))
                 continue
             except Exception as e:
                 print(f"Could not fetch product {game_id}: {e}", file=sys.stderr)
                 continue
-            self.proccess_leftovers_simple(game_id, gamename)
+            if self.proccess_leftovers_simple(game_id, gamename):
+                stored.add(game_id)
+        self.record_metadata_misses(not_games, ttl=self.not_game_ttl)
+        # Only once the fallback has the game, or a failure would hide it
+        self.record_metadata_misses([miss for miss in misses if miss[0] in stored])
 
     def proccess_leftovers_simple(self, game_id, gamename):
-        """Insert a new GOG game into the DB with minimal info (ID + title)."""
+        """Insert a new GOG game into the DB with minimal info (ID + title).
+        Returns True once the game has a Game row."""
         print(f"Processing leftover GOG game: {gamename} ({game_id})", file=sys.stderr)
-        conn = self.get_connection()
-        c = conn.cursor()
-
         try:
-            shortname = str(game_id)
-            c.execute("SELECT id FROM Game WHERE ShortName=?", (shortname,))
-            result = c.fetchone()
-            if result is None:
-                vals = [
-                    gamename, "", "", "", "", "", "GOG",
-                    game_id, "", "", "", "",
-                    "", "", "", "", shortname,
-                ]
-                cols_with_pk = [
-                    "Title", "Notes", "ApplicationPath", "ManualPath",
-                    "Publisher", "RootFolder", "Source", "DatabaseID",
-                    "Genre", "ConfigurationPath", "Developer", "ReleaseDate",
-                    "Size", "InstallPath", "UmuId", "SteamClientID", "ShortName"
-                ]
-                placeholders = ', '.join(['?' for _ in range(len(cols_with_pk))])
-                tmp = f"INSERT INTO Game ({', '.join(cols_with_pk)}) VALUES ({placeholders})"
-                c.execute(tmp, vals)
-                conn.commit()
+            with self.transaction() as conn:
+                c = conn.cursor()
+                shortname = str(game_id)
+                c.execute("SELECT id FROM Game WHERE ShortName=?", (shortname,))
+                result = c.fetchone()
+                if result is None:
+                    vals = [
+                        gamename, "", "", "", "", "", "GOG",
+                        game_id, "", "", "", "",
+                        "", "", "", "", shortname,
+                    ]
+                    cols_with_pk = [
+                        "Title", "Notes", "ApplicationPath", "ManualPath",
+                        "Publisher", "RootFolder", "Source", "DatabaseID",
+                        "Genre", "ConfigurationPath", "Developer", "ReleaseDate",
+                        "Size", "InstallPath", "UmuId", "SteamClientID", "ShortName"
+                    ]
+                    placeholders = ', '.join(['?' for _ in range(len(cols_with_pk))])
+                    tmp = f"INSERT INTO Game ({', '.join(cols_with_pk)}) VALUES ({placeholders})"
+                    c.execute(tmp, vals)
+            return True
         except Exception as e:
             print(f"Error inserting GOG game: {gamename} {e}", file=sys.stderr)
-
-        conn.close()
+            return False
 
     @staticmethod
     def detect_game_type(exe_path):
@@ -321,8 +325,6 @@ class GOG(GamesDb.GamesDb):
     def process_info_file(self, file_path):
         """Parse goggame-{id}.info to extract exe path, args, working dir and store in DB."""
         print(f"Processing info file: {file_path}", file=sys.stderr)
-        conn = self.get_connection()
-        c = conn.cursor()
         install_dir = os.environ.get('INSTALL_DIR', os.path.expanduser('~/Games/gog/'))
         file_path = os.path.realpath(os.path.join(install_dir, file_path))
         print(f"File path: {file_path}", file=sys.stderr)
@@ -335,7 +337,6 @@ class GOG(GamesDb.GamesDb):
             play_tasks = data.get('playTasks', [])
             if not play_tasks:
                 print(f"[process_info] WARNING: No playTasks in info file (DLC or malformed?)", file=sys.stderr)
-                conn.close()
                 return
 
             # First pass: grab the primary/game task
@@ -384,14 +385,11 @@ class GOG(GamesDb.GamesDb):
             game_id = data.get('gameId')
             if not game_id:
                 print(f"[process_info] WARNING: No gameId in info file", file=sys.stderr)
-                conn.close()
                 return
 
             print(f"Game id: {game_id}", file=sys.stderr)
-            c.execute("update Game set ApplicationPath = ?, RootFolder = ?, Arguments =?, WorkingDir =?, GameType =? where DatabaseID = ?", (exe_file, root_dir, args, working_dir, game_type, game_id))
-            conn.commit()
-
-        conn.close()
+            with self.transaction() as conn:
+                conn.execute("update Game set ApplicationPath = ?, RootFolder = ?, Arguments =?, WorkingDir =?, GameType =? where DatabaseID = ?", (exe_file, root_dir, args, working_dir, game_type, game_id))
 
     def get_game_dir(self, game_id):
         conn = self.get_connection()
@@ -422,10 +420,15 @@ class GOG(GamesDb.GamesDb):
         c = conn.cursor()
         c.execute("SELECT ShortName, ApplicationPath, RootFolder, DatabaseID FROM Game WHERE ApplicationPath IS NOT NULL AND ApplicationPath != '' AND (GameType IS NULL OR GameType = 'windows')")
         rows = c.fetchall()
+        conn.close()
         print(f"[retrodetect] Found {len(rows)} games with type=windows or NULL to scan", file=sys.stderr)
         updated = 0
+        # Applied together at the end, so the ScummVM detection below doesn't
+        # run with the write lock held
+        updates = []
         for row in rows:
             shortname, app_path, root_folder, db_id = row
+            game_updated = False
             game_type = self.detect_game_type(app_path)
             print(f"[retrodetect] {shortname} (db_id={db_id}): app_path={app_path!r} -> {game_type}, root_folder={root_folder!r}", file=sys.stderr)
 
@@ -449,8 +452,9 @@ class GOG(GamesDb.GamesDb):
                                 game_type = task_type
                                 new_args = task.get('arguments', '')
                                 new_working_dir = task.get('workingDir', '')
-                                c.execute("UPDATE Game SET ApplicationPath=?, Arguments=?, WorkingDir=?, GameType=? WHERE ShortName=?",
-                                          (task_path, new_args, new_working_dir, game_type, shortname))
+                                updates.append(("UPDATE Game SET ApplicationPath=?, Arguments=?, WorkingDir=?, GameType=? WHERE ShortName=?",
+                                                (task_path, new_args, new_working_dir, game_type, shortname)))
+                                game_updated = True
                                 updated += 1
                                 print(f"[retrodetect] {shortname} -> {game_type} (from info file playTask[{i}])", file=sys.stderr)
                                 break
@@ -463,20 +467,23 @@ class GOG(GamesDb.GamesDb):
                 scummvm_target = self.detect_and_add_scummvm_game(root_folder)
                 if scummvm_target:
                     game_type = 'scummvm'
-                    c.execute("UPDATE Game SET Arguments=?, GameType=? WHERE ShortName=?",
-                              (scummvm_target, game_type, shortname))
+                    updates.append(("UPDATE Game SET Arguments=?, GameType=? WHERE ShortName=?",
+                                    (scummvm_target, game_type, shortname)))
+                    game_updated = True
                     updated += 1
                     print(f"[retrodetect] {shortname} -> scummvm (target={scummvm_target})", file=sys.stderr)
                 else:
                     print(f"[retrodetect] {shortname}: ScummVM detection returned None", file=sys.stderr)
 
-            if game_type != 'windows':
-                c.execute("UPDATE Game SET GameType=? WHERE ShortName=? AND (GameType IS NULL OR GameType = 'windows')", (game_type, shortname))
-                if c.rowcount > 0:
-                    updated += 1
-                    print(f"[retrodetect] {shortname} -> {game_type}", file=sys.stderr)
-        conn.commit()
-        conn.close()
+            if game_type != 'windows' and not game_updated:
+                # Selected because its type was windows or NULL
+                updates.append(("UPDATE Game SET GameType=? WHERE ShortName=?", (game_type, shortname)))
+                updated += 1
+                print(f"[retrodetect] {shortname} -> {game_type}", file=sys.stderr)
+        if updates:
+            with self.transaction() as conn:
+                for sql, params in updates:
+                    conn.execute(sql, params)
         print(f"[retrodetect] Done. Updated {updated} games out of {len(rows)} scanned", file=sys.stderr)
 
     def get_login_status(self, flush_cache=False):
@@ -508,11 +515,10 @@ class GOG(GamesDb.GamesDb):
                     username = 'GOG User'
                     if access_token:
                         try:
-                            req = urllib.request.Request(
+                            user_data = HttpClient.get(
                                 'https://embed.gog.com/userData.json',
-                                headers={'Authorization': f'Bearer {access_token}'})
-                            resp = urllib.request.urlopen(req, timeout=5)
-                            user_data = json.loads(resp.read())
+                                headers={'Authorization': f'Bearer {access_token}'},
+                                timeout=5).json()
                             username = user_data.get('username', username)
                         except Exception:
                             pass
@@ -564,17 +570,7 @@ class GOG(GamesDb.GamesDb):
 
     def get_game_size(self, game_id, installed):
         if installed == 'true':
-            conn = self.get_connection()
-            c = conn.cursor()
-            c.row_factory = sqlite3.Row
-            c.execute("SELECT Size FROM Game WHERE ShortName=?", (game_id,))
-            result = c.fetchone()
-            conn.close()
-            if result and bool(result['Size']):
-                disk_size = result['Size']
-                size = f"Size on Disk: {disk_size}"
-            else:
-                size = ""
+            size = self.get_disk_size(game_id)
         else:
             try:
                 result = self.execute_shell_json(
@@ -821,6 +817,7 @@ class GOG(GamesDb.GamesDb):
         c = conn.cursor()
         c.execute("SELECT * FROM Game WHERE ShortName=?", (game_id,))
         result = c.fetchone()
+        conn.close()
         if result is not None:
             try:
                 info = self.execute_shell_json(
@@ -828,15 +825,15 @@ class GOG(GamesDb.GamesDb):
                 title = info.get('title', '')
                 disk_size = info.get('disk_size', info.get('size', 0))
                 install_path = info.get('install_path', info.get('folder_name', ''))
-                size = self.convert_bytes(int(disk_size)) if disk_size else None
+                size_bytes = int(disk_size) if disk_size else None
+                size = self.convert_bytes(size_bytes) if size_bytes else None
                 if title:
-                    c.execute(
-                        "UPDATE Game SET Title=?, Size=?, InstallPath=? WHERE ShortName=?",
-                        (title, size, install_path, game_id))
-                conn.commit()
+                    with self.transaction() as conn:
+                        conn.execute(
+                            "UPDATE Game SET Title=?, Size=?, SizeBytes=?, InstallPath=? WHERE ShortName=?",
+                            (title, size, size_bytes, install_path, game_id))
             except Exception as e:
                 print(f"Error updating GOG game details: {e}", file=sys.stderr)
-        conn.close()
 
     def get_client_id(self, game_id):
         """Get the Galaxy clientId for a game from the GOG builds API manifest.
@@ -845,13 +842,10 @@ class GOG(GamesDb.GamesDb):
         """
         try:
             builds_url = f"https://content-system.gog.com/products/{game_id}/os/windows/builds?generation=2"
-            req = urllib.request.Request(builds_url, headers={'User-Agent': 'Mozilla/5.0'})
-            response = urllib.request.urlopen(req, timeout=10)
-            builds = json.loads(response.read())
+            builds = HttpClient.get(builds_url, timeout=10).json()
 
             meta_url = builds['items'][0]['link']
-            req = urllib.request.Request(meta_url, headers={'User-Agent': 'Mozilla/5.0'})
-            response = urllib.request.urlopen(req, timeout=10)
+            response = HttpClient.get(meta_url, timeout=10)
             import zlib
             data = zlib.decompress(response.read())
             meta = json.loads(data)
@@ -897,9 +891,7 @@ class GOG(GamesDb.GamesDb):
         # Query GOG remote config for save locations
         try:
             url = f"https://remote-config.gog.com/components/galaxy_client/clients/{client_id}?component_version=2.0.45"
-            req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-            response = urllib.request.urlopen(req, timeout=10)
-            config = json.loads(response.read())
+            config = HttpClient.get(url, timeout=10).json()
         except Exception as e:
             print(f"Error querying GOG remote config: {e}", file=sys.stderr)
             return []
@@ -970,15 +962,13 @@ class GOG(GamesDb.GamesDb):
     # + Download - 45.50 MiB/s (raw: ...)
 
     def toggle_autosync(self, game_id):
-        conn = self.get_connection()
-        c = conn.cursor()
-        c.execute("SELECT CloudSaveAutoSync FROM Game WHERE ShortName=?", (game_id,))
-        result = c.fetchone()
-        current = result[0] if result and result[0] else 0
-        new_val = 0 if current else 1
-        c.execute("UPDATE Game SET CloudSaveAutoSync=? WHERE ShortName=?", (new_val, game_id))
-        conn.commit()
-        conn.close()
+        with self.transaction() as conn:
+            c = conn.cursor()
+            c.execute("SELECT CloudSaveAutoSync FROM Game WHERE ShortName=?", (game_id,))
+            result = c.fetchone()
+            current = result[0] if result and result[0] else 0
+            new_val = 0 if current else 1
+            c.execute("UPDATE Game SET CloudSaveAutoSync=? WHERE ShortName=?", (new_val, game_id))
         state = "enabled" if new_val else "disabled"
         return json.dumps({'Type': 'Success', 'Content': {'Message': f'Cloud save auto-sync {state}'}})
 
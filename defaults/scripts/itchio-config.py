@@ -31,6 +31,8 @@ class ItchioArgs(GameSet.GenericArgs):
         self.parser.add_argument(
             '--get-base64-images', help='Get base64 images for short name'
         )
+        self.parser.add_argument(
+            '--get-batch-images', help='Get images for many games, a json list of short names is read from stdin', action='store_true')
         self.parser.add_argument(
             '--offline', help='Offline mode', action='store_true')
         self.parser.add_argument(
@@ -52,10 +54,12 @@ class ItchioArgs(GameSet.GenericArgs):
         self.parser.add_argument(
             '--get-browse-details', help='Get details for a browsed game by ID')
 
-    def parseArgs(self):
-        super().parseArgs()
-        self.gameSet = itchio.Itchio(self.args.dbfile, self.storeName, self.setNameConfig)
-        self.gameSet.create_tables()
+    def parseArgs(self, argv=None):
+        super().parseArgs(argv)
+        # In worker mode the store object and its database stay warm between requests
+        if self.gameSet is None or self.gameSet.db_file != self.args.dbfile:
+            self.gameSet = itchio.Itchio(self.args.dbfile, self.storeName, self.setNameConfig)
+            self.gameSet.create_tables()
 
     def processArgs(self):
         try:
@@ -86,6 +90,9 @@ class ItchioArgs(GameSet.GenericArgs):
             if self.args.get_base64_images:
                 print(self.gameSet.get_base64_images(
                     self.args.get_base64_images))
+            if self.args.get_batch_images:
+                print(self.gameSet.get_batch_images(
+                    self.gameSet.read_json_from_stdin()))
             if self.args.update_game_details:
                 self.gameSet.update_game_details(
                     self.args.update_game_details)
@@ -114,7 +121,10 @@ class ItchioArgs(GameSet.GenericArgs):
 def main():
     itchioArgs = ItchioArgs("Itchio", "Proton")
     itchioArgs.parseArgs()
-    itchioArgs.processArgs()
+    if itchioArgs.args.worker:
+        itchioArgs.serve()
+    else:
+        itchioArgs.processArgs()
 
 
 if __name__ == '__main__':
@@ -16,6 +16,7 @@ import urllib.error
 import html as html_module
 
 import GamesDb
+import HttpClient
 from datetime import datetime, timedelta
 
 
@@ -56,10 +57,7 @@ class Itchio(GamesDb.GamesDb):
             url = f"https://itch.io/api/1/{api_key}/{endpoint}"
             headers = {'User-Agent': 'Mozilla/5.0'}
 
-        req = urllib.request.Request(url, headers=headers)
-        response = urllib.request.urlopen(req, timeout=60)
-        data = response.read()
-        return json.loads(data)
+        return HttpClient.get(url, headers=headers, timeout=60).json()
 
     def get_list(self, offline=False):
         """Fetch owned games from itch.io API and populate database."""
@@ -100,63 +98,62 @@ class Itchio(GamesDb.GamesDb):
         id_list = [str(g['id']) for g in all_games]
         game_dict = {str(g['id']): g for g in all_games}
 
-        left_overs = self.insert_data(id_list)
+        left_overs, misses = self.insert_data(id_list)
         print(f"left_overs: {left_overs}", file=sys.stderr)
 
+        stored = set()
         for game_id in left_overs:
-            if game_id in game_dict:
-                self.proccess_leftovers(game_dict[game_id], download_keys.get(game_id, ''))
+            if game_id in game_dict and self.proccess_leftovers(game_dict[game_id], download_keys.get(game_id, '')):
+                stored.add(game_id)
+        # Only once the fallback has the game, or a failure would hide it
+        self.record_metadata_misses([miss for miss in misses if miss[0] in stored])
 
         # Update download key IDs for all games (including ones from GamesDb)
-        conn = self.get_connection()
-        c = conn.cursor()
-        for game_id, dk_id in download_keys.items():
-            c.execute("UPDATE Game SET ManualPath=? WHERE ShortName=?", (dk_id, game_id))
-        conn.commit()
-        conn.close()
+        with self.transaction() as conn:
+            conn.executemany("UPDATE Game SET ManualPath=? WHERE ShortName=?",
+                             [(dk_id, game_id) for game_id, dk_id in download_keys.items()])
 
     def proccess_leftovers(self, game_data, download_key_id=''):
-        """Insert game from itch.io API data that wasn't found in GamesDb."""
+        """Insert game from itch.io API data that wasn't found in GamesDb.
+        Returns True once the game has a Game row."""
         title = game_data.get('title', 'Unknown')
         print(f"Processing leftover itch.io game: {title}", file=sys.stderr)
-        conn = self.get_connection()
-        c = conn.cursor()
-
         try:
-            game_id = str(game_data.get('id', ''))
-            shortname = game_id
-
-            c.execute("SELECT * FROM Game WHERE ShortName=?", (shortname,))
-            result = c.fetchone()
-            if result is None:
-                notes = game_data.get('short_text', '')
-
-                vals = [
-                    title, notes, "", download_key_id, "",  "", "Itchio",
-                    game_id, "", "", "", "",
-                    "", "", "", "", shortname,
-                ]
-                cols_with_pk = [
-                    "Title", "Notes", "ApplicationPath", "ManualPath",
-                    "Publisher", "RootFolder", "Source", "DatabaseID",
-                    "Genre", "ConfigurationPath", "Developer", "ReleaseDate",
-                    "Size", "InstallPath", "UmuId", "SteamClientID", "ShortName"
-                ]
-                placeholders = ', '.join(['?' for _ in range(len(cols_with_pk))])
-                tmp = f"INSERT INTO Game ({', '.join(cols_with_pk)}) VALUES ({placeholders})"
-                c.execute(tmp, vals)
-
-                game_id_db = c.lastrowid
-                cover_url = game_data.get('cover_url', '')
-                if cover_url:
-                    c.execute(
-                        "INSERT INTO Images (GameID, ImagePath, FileName, SortOrder, Type) VALUES (?, ?, ?, ?, ?)",
-                        (game_id_db, cover_url, '', 0, 'vertical_cover'))
-                conn.commit()
+            with self.transaction() as conn:
+                c = conn.cursor()
+                game_id = str(game_data.get('id', ''))
+                shortname = game_id
+
+                c.execute("SELECT * FROM Game WHERE ShortName=?", (shortname,))
+                result = c.fetchone()
+                if result is None:
+                    notes = game_data.get('short_text', '')
+
+                    vals = [
+                        title, notes, "", download_key_id, "",  "", "Itchio",
+                        game_id, "", "", "", "",
+                        "", "", "", "", shortname,
+                    ]
+                    cols_with_pk = [
+                        "Title", "Notes", "ApplicationPath", "ManualPath",
+                        "Publisher", "RootFolder", "Source", "DatabaseID",
+                        "Genre", "ConfigurationPath", "Developer", "ReleaseDate",
+                        "Size", "InstallPath", "UmuId", "SteamClientID", "ShortName"
+                    ]
+                    placeholders = ', '.join(['?' for _ in range(len(cols_with_pk))])
+                    tmp = f"INSERT INTO Game ({', '.join(cols_with_pk)}) VALUES ({placeholders})"
+                    c.execute(tmp, vals)
+
+                    game_id_db = c.lastrowid
+                    cover_url = game_data.get('cover_url', '')
+                    if cover_url:
+                        c.execute(
+                            "INSERT INTO Images (GameID, ImagePath, FileName, SortOrder, Type) VALUES (?, ?, ?, ?, ?)",
+                            (game_id_db, cover_url, '', 0, 'vertical_cover'))
+            return True
         except Exception as e:
             print(f"Error parsing metadata for itch.io game: {title} {e}", file=sys.stderr)
-
-        conn.close()
+            return False
 
     def _get_download_key(self, game_id):
         """Get the download key ID for a game from the database."""
@@ -303,15 +300,12 @@ class Itchio(GamesDb.GamesDb):
         extracted_dir = self.extract_archive(download_path, game_dir)
 
         # Update database
-        conn = self.get_connection()
-        c = conn.cursor()
-        c.execute("UPDATE Game SET RootFolder=?, InstallPath=?, ConfigurationPath=? WHERE ShortName=?",
-                  (extracted_dir or game_dir, game_dir, platform_type, game_id))
-        if actual_size > 0:
-            c.execute("UPDATE Game SET Size=? WHERE ShortName=?",
-                      (self.convert_bytes(actual_size), game_id))
-        conn.commit()
-        conn.close()
+        with self.transaction() as conn:
+            conn.execute("UPDATE Game SET RootFolder=?, InstallPath=?, ConfigurationPath=? WHERE ShortName=?",
+                         (extracted_dir or game_dir, game_dir, platform_type, game_id))
+            if actual_size > 0:
+                conn.execute("UPDATE Game SET Size=?, SizeBytes=? WHERE ShortName=?",
+                             (self.convert_bytes(actual_size), actual_size, game_id))
 
         print(f"Game {game_id} downloaded to {game_dir}", file=sys.stderr)
 
@@ -429,9 +423,9 @@ class Itchio(GamesDb.GamesDb):
         c.row_factory = sqlite3.Row
         c.execute("SELECT RootFolder, InstallPath, ConfigurationPath FROM Game WHERE ShortName=?", (game_id,))
         result = c.fetchone()
+        conn.close()
 
         if not result:
-            conn.close()
             print(f"Game {game_id} not found in database", file=sys.stderr)
             return
 
@@ -439,7 +433,6 @@ class Itchio(GamesDb.GamesDb):
         platform_type = result['ConfigurationPath'] or 'linux'
 
         if not game_dir or not os.path.exists(game_dir):
-            conn.close()
             print(f"Game directory not found: {game_dir}", file=sys.stderr)
             return
 
@@ -486,16 +479,13 @@ class Itchio(GamesDb.GamesDb):
                 print(f"Found HTML5 game: {exe_relative}", file=sys.stderr)
 
         if exe_relative:
-            c2 = conn.cursor()
-            c2.execute("UPDATE Game SET ApplicationPath=?, RootFolder=?, ConfigurationPath=? WHERE ShortName=?",
-                       (exe_relative, game_dir, platform_type, game_id))
-            conn.commit()
+            with self.transaction() as conn:
+                conn.execute("UPDATE Game SET ApplicationPath=?, RootFolder=?, ConfigurationPath=? WHERE ShortName=?",
+                             (exe_relative, game_dir, platform_type, game_id))
             print(f"Executable set: {exe_relative} (platform: {platform_type})", file=sys.stderr)
         else:
             print(f"No executable found for game {game_id} in {game_dir}", file=sys.stderr)
 
-        conn.close()
-
     def _find_itch_toml(self, game_dir):
         """Find .itch.toml file in game directory."""
         for root, dirs, files in os.walk(game_dir):
@@ -658,10 +648,8 @@ class Itchio(GamesDb.GamesDb):
 
     def _fetch_html(self, url):
         """Fetch a URL and return the response body as string."""
-        req = urllib.request.Request(url, headers={
-            'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36'})
-        response = urllib.request.urlopen(req, timeout=15)
-        return response.read().decode()
+        return HttpClient.get(url, headers={
+            'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36'}, timeout=15).text()
 
     def _fetch_browse_json(self, url):
         """Fetch an itch.io browse page with format=json and return the HTML content."""
@@ -792,8 +780,9 @@ class Itchio(GamesDb.GamesDb):
         conn = self.get_connection()
         c = conn.cursor()
         c.execute("SELECT id FROM Game WHERE ShortName=?", (game_id,))
-        if c.fetchone() is not None:
-            conn.close()
+        found = c.fetchone() is not None
+        conn.close()
+        if found:
             return json.dumps({'Type': 'Success', 'Content': {'Message': 'Game already in your library. Go to the itch.io tab to download it.'}})
 
         # Fetch game metadata - try API first, fall back to scraping the game page
@@ -805,10 +794,7 @@ class Itchio(GamesDb.GamesDb):
         try:
             api_key = self._get_api_key()
             if api_key:
-                req = urllib.request.Request(f'https://itch.io/api/1/{api_key}/game/{game_id}',
-                                             headers={'User-Agent': 'Mozilla/5.0'})
-                resp = urllib.request.urlopen(req, timeout=10)
-                api_data = json.loads(resp.read().decode())
+                api_data = HttpClient.get(f'https://itch.io/api/1/{api_key}/game/{game_id}', timeout=10).json()
                 game_info = api_data.get('game', {})
                 title = game_info.get('title', title)
                 description = game_info.get('short_text', '')
@@ -821,9 +807,7 @@ class Itchio(GamesDb.GamesDb):
         if title == f'itch.io Game {game_id}':
             try:
                 embed_url = f'https://itch.io/embed/{game_id}'
-                req = urllib.request.Request(embed_url, headers={'User-Agent': 'Mozilla/5.0'})
-                resp = urllib.request.urlopen(req, timeout=10)
-                embed_html = resp.read().decode()
+                embed_html = HttpClient.get(embed_url, timeout=10).text()
                 t = re.search(r'<title>([^<]+)</title>', embed_html)
                 if t:
                     raw_title = html_module.unescape(t.group(1))
@@ -852,14 +836,14 @@ class Itchio(GamesDb.GamesDb):
         ]
         placeholders = ', '.join(['?' for _ in range(len(cols_with_pk))])
         tmp = f"INSERT INTO Game ({', '.join(cols_with_pk)}) VALUES ({placeholders})"
-        c.execute(tmp, vals)
-        game_db_id = c.lastrowid
-        if cover_url:
-            c.execute(
-                "INSERT INTO Images (GameID, ImagePath, FileName, SortOrder, Type) VALUES (?, ?, ?, ?, ?)",
-                (game_db_id, cover_url, '', 0, 'vertical_cover'))
-        conn.commit()
-        conn.close()
+        with self.transaction() as conn:
+            c = conn.cursor()
+            c.execute(tmp, vals)
+            game_db_id = c.lastrowid
+            if cover_url:
+                c.execute(
+                    "INSERT INTO Images (GameID, ImagePath, FileName, SortOrder, Type) VALUES (?, ?, ?, ?, ?)",
+                    (game_db_id, cover_url, '', 0, 'vertical_cover'))
         return json.dumps({'Type': 'Success', 'Content': {'Message': f'{title} added to your library. Go to the itch.io tab to download it.'}})
 
     def get_login_status(self, flush_cache=False):
@@ -894,17 +878,7 @@ class Itchio(GamesDb.GamesDb):
 
     def get_game_size(self, game_id, installed):
         if installed == 'true':
-            conn = self.get_connection()
-            c = conn.cursor()
-            c.row_factory = sqlite3.Row
-            c.execute("SELECT Size FROM Game WHERE ShortName=?", (game_id,))
-            result = c.fetchone()
-            conn.close()
-            if result and bool(result['Size']):
-                disk_size = result['Size']
-                size = f"Size on Disk: {disk_size}"
-            else:
-                size = ""
+            size = self.get_disk_size(game_id)
         else:
             try:
                 uploads = self._get_uploads(game_id)
@@ -963,17 +937,18 @@ class Itchio(GamesDb.GamesDb):
         c = conn.cursor()
         c.execute("SELECT * FROM Game WHERE ShortName=?", (game_id,))
         result = c.fetchone()
+        conn.close()
         if result is not None:
             try:
                 uploads = self._get_uploads(game_id)
                 upload = self._pick_upload(uploads) if uploads else None
                 if upload and upload.get('size'):
-                    size = self.convert_bytes(int(upload['size']))
-                    c.execute("UPDATE Game SET Size=? WHERE ShortName=?", (size, game_id))
-                    conn.commit()
+                    size_bytes = int(upload['size'])
+                    with self.transaction() as conn:
+                        conn.execute("UPDATE Game SET Size=?, SizeBytes=? WHERE ShortName=?",
+                                     (self.convert_bytes(size_bytes), size_bytes, game_id))
             except Exception as e:
                 print(f"Error updating itch.io game details: {e}", file=sys.stderr)
-        conn.close()
 
     def get_last_progress_update(self, file_path):
         progress_re = re.compile(r"Progress: (\d+\.?\d*) ")
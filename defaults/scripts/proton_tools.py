@@ -18,6 +18,9 @@ import tempfile
 import urllib.request
 import urllib.error
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "shared"))
+import HttpClient
+
 
 GE_PROTON_API = "https://api.github.com/repos/GloriousEggroll/proton-ge-custom/releases/latest"
 UMU_PROTONFIXES_RAW = "https://raw.githubusercontent.com/Open-Wine-Components/umu-protonfixes/master"
@@ -52,10 +55,9 @@ def install_ge_proton():
     sys.stdout.flush()
 
     headers = {"User-Agent": "GameVault/1.0"}
-    req = urllib.request.Request(GE_PROTON_API, headers=headers)
     try:
-        resp = urllib.request.urlopen(req, timeout=30)
-        release = json.loads(resp.read())
+        # Conditional, GitHub doesn't count a 304 against the rate limit
+        release = HttpClient.get_cached(GE_PROTON_API, headers=headers, timeout=30).json()
     except Exception as e:
         print(f"Error fetching release info: {e}")
         return
@@ -197,10 +199,8 @@ def fetch_protonfixes_source(game_id, store, shortname=None, db_file=None):
     # Try store-specific directory first
     if store_dir:
         url = f"{UMU_PROTONFIXES_RAW}/{store_dir}/{game_id}.py"
-        req = urllib.request.Request(url, headers=headers)
         try:
-            resp = urllib.request.urlopen(req, timeout=15)
-            source = resp.read().decode("utf-8")
+            source = HttpClient.get(url, headers=headers, timeout=15).text()
             return source, f"{store}/{game_id}"
         except urllib.error.HTTPError as e:
             if e.code != 404:
@@ -212,10 +212,8 @@ def fetch_protonfixes_source(game_id, store, shortname=None, db_file=None):
     steam_id = get_umu_steam_id(shortname or game_id, db_file, store)
     if steam_id:
         url = f"{UMU_PROTONFIXES_RAW}/gamefixes-steam/{steam_id}.py"
-        req = urllib.request.Request(url, headers=headers)
         try:
-            resp = urllib.request.urlopen(req, timeout=15)
-            source = resp.read().decode("utf-8")
+            source = HttpClient.get(url, headers=headers, timeout=15).text()
             return source, f"steam/{steam_id} (via UMU ID)"
         except urllib.error.HTTPError as e:
             if e.code != 404:
@@ -304,65 +302,62 @@ def apply_protonfixes(game_id, store, shortname, db_file, platform):
         import GameSet as gs
 
         game_set = gs.GameSet(db_file, store)
-        conn = game_set.get_connection()
-        c = conn.cursor()
-
-        # Find or create config_set for this game
-        c.execute(
-            "SELECT id FROM config_set WHERE ShortName=? AND forkname=? AND version=? AND platform=?",
-            (shortname, "", "", platform),
-        )
-        row = c.fetchone()
-        config_set_id = None
-        if row:
-            config_set_id = row[0]
-        else:
-            c.execute(
-                "INSERT INTO config_set (ShortName, forkname, version, platform) VALUES (?, ?, ?, ?)",
-                (shortname, "", "", platform),
-            )
-            config_set_id = c.lastrowid
-            conn.commit()
-
-        # Read current advanced > variables value
-        c.execute(
-            "SELECT value FROM configs WHERE config_set_id=? AND section='advanced' AND key='variables'",
-            (config_set_id,),
-        )
-        row = c.fetchone()
-        current_vars = row[0] if row else ""
-
-        # Deduplicate: skip exports that already exist
-        added = []
-        for export_line in new_exports:
-            if export_line not in current_vars:
-                added.append(export_line)
-
-        if not added:
-            conn.close()
-            return json.dumps({
-                "Type": "Success",
-                "Content": {"Message": "All fixes are already applied!", "Toast": True}
-            })
+        # Read, merge and write back as one transaction
+        with game_set.transaction() as conn:
+            c = conn.cursor()
 
-        # Append new exports
-        if current_vars and not current_vars.endswith("\n"):
-            current_vars += "\n"
-        current_vars += "\n".join(added)
-
-        # Upsert
-        if row:
+            # Find or create config_set for this game
             c.execute(
-                "UPDATE configs SET value=? WHERE config_set_id=? AND section='advanced' AND key='variables'",
-                (current_vars, config_set_id),
+                "SELECT id FROM config_set WHERE ShortName=? AND forkname=? AND version=? AND platform=?",
+                (shortname, "", "", platform),
             )
-        else:
+            row = c.fetchone()
+            config_set_id = None
+            if row:
+                config_set_id = row[0]
+            else:
+                c.execute(
+                    "INSERT INTO config_set (ShortName, forkname, version, platform) VALUES (?, ?, ?, ?)",
+                    (shortname, "", "", platform),
+                )
+                config_set_id = c.lastrowid
+
+            # Read current advanced > variables value
             c.execute(
-                "INSERT INTO configs (section, key, value, config_set_id) VALUES (?, ?, ?, ?)",
-                ("advanced", "variables", current_vars, config_set_id),
+                "SELECT value FROM configs WHERE config_set_id=? AND section='advanced' AND key='variables'",
+                (config_set_id,),
             )
-        conn.commit()
-        conn.close()
+            row = c.fetchone()
+            current_vars = row[0] if row else ""
+
+            # Deduplicate: skip exports that already exist
+            added = []
+            for export_line in new_exports:
+                if export_line not in current_vars:
+                    added.append(export_line)
+
+            if not added:
+                return json.dumps({
+                    "Type": "Success",
+                    "Content": {"Message": "All fixes are already applied!", "Toast": True}
+                })
+
+            # Append new exports
+            if current_vars and not current_vars.endswith("\n"):
+                current_vars += "\n"
+            current_vars += "\n".join(added)
+
+            # Upsert
+            if row:
+                c.execute(
+                    "UPDATE configs SET value=? WHERE config_set_id=? AND section='advanced' AND key='variables'",
+                    (current_vars, config_set_id),
+                )
+            else:
+                c.execute(
+                    "INSERT INTO configs (section, key, value, config_set_id) VALUES (?, ?, ?, ?)",
+                    ("advanced", "variables", current_vars, config_set_id),
+                )
 
         applied_str = "\n".join(f"  {a}" for a in added)
         msg = f"Applied {len(added)} fix(es):\n{applied_str}"
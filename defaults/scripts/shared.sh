@@ -28,8 +28,13 @@ function getgames(){
     else
         LIMIT="${3}"
     fi
+    # Keyset paging, both empty for the first page / the whole list
+    CURSOR="${4}"
+    PAGE_SIZE="${5}"
+    # title (default), sortingtitle, releasedate, size or installed
+    SORT="${6}"
     IMAGE_PATH=""
-    TEMP=$($DOSCONF --getgameswithimages "${IMAGE_PATH}" "${FILTER}" "${INSTALLED}" "${LIMIT}" "true" --dbfile $DBFILE)
+    TEMP=$($DOSCONF --getgameswithimages "${IMAGE_PATH}" "${FILTER}" "${INSTALLED}" "${LIMIT}" "true" "${CURSOR}" "${PAGE_SIZE}" "${SORT}" --dbfile $DBFILE)
    
     echo $TEMP
 }
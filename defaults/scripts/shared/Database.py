@@ -0,0 +1,150 @@
+"""Shared sqlite access for the store scripts.
+
+Connections are opened once per thread and database file and then reused for
+the life of the process, so a CLI call or a warm worker doesn't reconnect and
+re-issue PRAGMAs for every query. GameSet.get_connection() hands out a
+PooledConnection; its close() only gives the shared connection back.
+"""
+import contextlib
+import sqlite3
+import sys
+import threading
+import time
+
+# How long sqlite itself waits on a locked database before raising
+BUSY_TIMEOUT_MS = 10000
+CACHED_STATEMENTS = 256
+# Extra attempts at taking the write lock when busy_timeout wasn't enough
+BEGIN_RETRIES = 5
+
+local = threading.local()
+
+
+def is_busy(error):
+    message = str(error).lower()
+    return "database is locked" in message or "database is busy" in message
+
+
+class PooledConnection:
+    """Looks like a sqlite3.Connection. Several can share one underlying
+    connection on the same thread; uncommitted work is rolled back when the
+    last of them is closed, as closing a real connection would.
+
+    Inside a transaction() commit() does nothing, the transaction commits
+    as a whole when it ends. row_factory is this wrapper's own and applies
+    to the cursors it makes, so it doesn't carry over to other users of the
+    shared connection."""
+
+    def __init__(self, entry):
+        self.__dict__['entry'] = entry
+        self.__dict__['closed'] = False
+        self.__dict__['row_factory'] = None
+
+    def __getattr__(self, name):
+        return getattr(self.entry['conn'], name)
+
+    def __setattr__(self, name, value):
+        if name == 'row_factory':
+            self.__dict__['row_factory'] = value
+            return
+        setattr(self.entry['conn'], name, value)
+
+    def cursor(self, *args):
+        cursor = self.entry['conn'].cursor(*args)
+        if self.row_factory is not None:
+            cursor.row_factory = self.row_factory
+        return cursor
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, parameters):
+        return self.cursor().executemany(sql, parameters)
+
+    def commit(self):
+        if self.entry['depth']:
+            return
+        self.entry['conn'].commit()
+
+    def __enter__(self):
+        self.entry['conn'].__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        if self.entry['depth']:
+            # Part of a transaction(), it commits or rolls back at its end
+            return False
+        return self.entry['conn'].__exit__(*exc)
+
+    def close(self):
+        if self.closed:
+            return
+        self.__dict__['closed'] = True
+        release(self.entry)
+
+
+def open_connection(db_file):
+    conn = sqlite3.connect(db_file, timeout=BUSY_TIMEOUT_MS / 1000,
+                           cached_statements=CACHED_STATEMENTS)
+    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.execute("PRAGMA synchronous=NORMAL;")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS};")
+    conn.commit()
+    return conn
+
+
+def connect(db_file):
+    """Returns a PooledConnection to db_file for the calling thread."""
+    entries = getattr(local, 'entries', None)
+    if entries is None:
+        entries = local.entries = {}
+    entry = entries.get(db_file)
+    if entry is None:
+        entry = {'conn': open_connection(db_file), 'users': 0, 'depth': 0}
+        entries[db_file] = entry
+    entry['users'] += 1
+    return PooledConnection(entry)
+
+
+def release(entry):
+    entry['users'] -= 1
+    if entry['users'] <= 0:
+        entry['users'] = 0
+        if entry['conn'].in_transaction:
+            entry['conn'].rollback()
+
+
+def begin(conn):
+    """BEGIN IMMEDIATE takes the write lock up front, so two writers can't
+    both start reading and then deadlock upgrading to a write."""
+    for attempt in range(BEGIN_RETRIES + 1):
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            return
+        except sqlite3.OperationalError as e:
+            if not is_busy(e) or attempt == BEGIN_RETRIES:
+                raise
+            print(f"Database busy, retrying ({attempt + 1}/{BEGIN_RETRIES})", file=sys.stderr)
+            time.sleep(0.1 * 2 ** attempt)
+
+
+@contextlib.contextmanager
+def transaction(conn):
+    """Commits on success and rolls back on error. Nested use joins the
+    transaction that is already open. conn is a PooledConnection."""
+    entry = conn.entry
+    if entry['depth']:
+        yield conn
+        return
+    if not conn.in_transaction:
+        begin(conn)
+    entry['depth'] += 1
+    try:
+        yield conn
+    except BaseException:
+        entry['conn'].rollback()
+        raise
+    else:
+        entry['conn'].commit()
+    finally:
+        entry['depth'] -= 1
@@ -13,7 +13,17 @@ import configparser
 import urllib.request
 import base64
 import sys
+import contextlib
+import io
+import queue
+import re
+import threading
+import time
+import traceback
 
+import Database
+import HttpClient
+import ImageCache
 
 
 class GameSet:
@@ -21,6 +31,11 @@ class GameSet:
     setNameConfig = None
     storeURL = None
     storeName = None
+    image_cache = None
+    # Artwork is fetched this many at a time; a slot still loading after
+    # image_deadline seconds is left empty rather than holding up the others
+    image_workers = 4
+    image_deadline = 20
 
     def __init__(self, db_file, storeName="", setNameConfig=None):
         parser = argparse.ArgumentParser()
@@ -65,83 +80,188 @@ class GameSet:
         return json.loads(json_str)
 
     def get_connection(self):
-        conn = sqlite3.connect(self.db_file)
-        c = conn.cursor()
-        
-        res = c.execute("PRAGMA journal_mode=WAL;")
-        c.execute("PRAGMA synchronous=NORMAL;")
-        conn.commit()
+        # Pooled per thread, see Database.py; close() hands the connection back
+        return Database.connect(self.db_file)
 
-        return conn
+    @contextlib.contextmanager
+    def transaction(self):
+        """Runs the block as one write transaction (BEGIN IMMEDIATE, retried
+        while the database is busy), committing on success."""
+        conn = self.get_connection()
+        try:
+            with Database.transaction(conn):
+                yield conn
+        finally:
+            conn.close()
 
     def create_tables(self):
+        """Brings the schema up to date. When the database is already current
+        this is a single PRAGMA user_version read."""
         conn = self.get_connection()
-        c = conn.cursor()
+        try:
+            migrations = self.get_migrations()
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version >= len(migrations):
+                return
+            with Database.transaction(conn):
+                # Another process may have migrated while we waited for the lock
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                for number, migration in enumerate(migrations[version:], start=version + 1):
+                    print(f"Migrating {self.db_file} to schema version {number}", file=sys.stderr)
+                    migration(conn.cursor())
+                    conn.execute(f"PRAGMA user_version={number}")
+        finally:
+            conn.close()
+
+    def get_migrations(self):
+        """Schema migrations in order, migration n leaves the database at
+        user_version n. Only ever append to this list."""
+        return [
+            self.migrate_baseline,
+            self.migrate_indexes,
+            self.migrate_search_index,
+            self.migrate_grid_index,
+            self.migrate_sort_indexes,
+            self.migrate_size_bytes,
+            self.migrate_steamgriddb_cache,
+            self.migrate_metadata_sync,
+            self.migrate_metadata_misses,
+        ]
+
+    def migrate_baseline(self, c):
+        # Databases from before user_version was used may be at any earlier
+        # layout, so this has to be safe to run on all of them
         c.execute(
             'CREATE TABLE IF NOT EXISTS configs (id INTEGER PRIMARY KEY, section TEXT, key TEXT, value TEXT, config_set_id INTEGER, FOREIGN KEY(config_set_id) REFERENCES config_set(id))')
         c.execute(
             'CREATE TABLE IF NOT EXISTS config_set (id INTEGER PRIMARY KEY, ShortName TEXT, forkname TEXT, version TEXT, platform TEXT)')
         c.execute(
             f"CREATE TABLE IF NOT EXISTS Game (id INTEGER PRIMARY KEY, {', '.join([f'{col} TEXT' for col in self.cols])}, SteamClientID TEXT, ShortName TEXT UNIQUE)")
-        c.execute(f"CREATE TABLE IF NOT EXISTS Images (id INTEGER PRIMARY KEY, GameID INTEGER, ImagePath TEXT, FileName TEXT, SortOrder INTEGER, FOREIGN KEY(GameID) REFERENCES Game(id))")
+        c.execute(f"CREATE TABLE IF NOT EXISTS Images (id INTEGER PRIMARY KEY, GameID INTEGER, ImagePath TEXT, FileName TEXT, Type TEXT, SortOrder INTEGER, FOREIGN KEY(GameID) REFERENCES Game(id))")
         c.execute(f"CREATE TABLE IF NOT EXISTS ZipFiles (id INTEGER PRIMARY KEY, GameID INTEGER, ZipFileName TEXT UNIQUE, FOREIGN KEY(GameID) REFERENCES Game(id))")
         c.execute(f"CREATE TABLE IF NOT EXISTS BatFiles (id INTEGER PRIMARY KEY, GameID INTEGER, Path TEXT, BatFileName TEXT,  Content TEXT, FOREIGN KEY(GameID) REFERENCES Game(id))")
         c.execute(
             'CREATE TABLE IF NOT EXISTS settings (id INTEGER PRIMARY KEY, name TEXT UNIQUE, value TEXT)')
         c.execute(f"CREATE TABLE IF NOT EXISTS Cache (id INTEGER PRIMARY KEY, Key TEXT UNIQUE, Value TEXT, ExpiryDate DateTime)")
-        
-         
-
-        c.execute("PRAGMA table_info(Game)")
-        columns = [column[1] for column in c.fetchall()]
-        if "Size" not in columns:
-            c.execute("ALTER TABLE Game ADD COLUMN Size TEXT")
-        
-        c.execute("PRAGMA table_info(Game)")
-        columns = [column[1] for column in c.fetchall()]
-        if "InstallPath" not in columns:
-            c.execute("ALTER TABLE Game ADD COLUMN InstallPath TEXT")
-        
 
         c.execute("PRAGMA table_info(Game)")
         columns = [column[1] for column in c.fetchall()]
-        if "UmuId" not in columns:
-            c.execute("ALTER TABLE Game ADD COLUMN UmuId TEXT")
-        
-        c.execute("PRAGMA table_info(Game)")
-        columns = [column[1] for column in c.fetchall()]
-        if "Arguments" not in columns:
-            c.execute("ALTER TABLE Game ADD COLUMN Arguments TEXT")
-
-        c.execute("PRAGMA table_info(Game)")
+        game_columns = [
+            ("Size", "TEXT"),
+            ("InstallPath", "TEXT"),
+            ("UmuId", "TEXT"),
+            ("Arguments", "TEXT"),
+            ("WorkingDir", "TEXT"),
+            ("SortingTitle", "TEXT"),
+            ("CloudSaveAutoSync", "INTEGER DEFAULT 0"),
+            ("GameType", "TEXT DEFAULT 'windows'"),
+        ]
+        for name, definition in game_columns:
+            if name not in columns:
+                c.execute(f"ALTER TABLE Game ADD COLUMN {name} {definition}")
+
+        c.execute("PRAGMA table_info(Images)")
         columns = [column[1] for column in c.fetchall()]
-        if "WorkingDir" not in columns:
-            c.execute("ALTER TABLE Game ADD COLUMN WorkingDir TEXT")
-        conn.commit()
-       
-
-        c.execute("PRAGMA table_info(Game)")
-        columns = [column[1] for column in c.fetchall()]
-        if "SortingTitle" not in columns:
-            c.execute("ALTER TABLE Game ADD COLUMN SortingTitle TEXT")
-        conn.commit()
-
-        c.execute("PRAGMA table_info(Game)")
-        columns = [column[1] for column in c.fetchall()]
-        if "CloudSaveAutoSync" not in columns:
-            c.execute("ALTER TABLE Game ADD COLUMN CloudSaveAutoSync INTEGER DEFAULT 0")
-        conn.commit()
-
-        c.execute("PRAGMA table_info(Game)")
-        columns = [column[1] for column in c.fetchall()]
-        if "GameType" not in columns:
-            c.execute("ALTER TABLE Game ADD COLUMN GameType TEXT DEFAULT 'windows'")
-        conn.commit()
-
-        conn.close()
+        if "Type" not in columns:
+            # Untyped rows are dropped and refetched by GamesDb.insert_data
+            c.execute("ALTER TABLE Images ADD COLUMN Type TEXT")
 
+    def migrate_indexes(self, c):
+        c.execute("CREATE INDEX IF NOT EXISTS idx_images_game ON Images (GameID, SortOrder)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_game_steam_client ON Game (SteamClientID)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_config_set_shortname ON config_set (ShortName, platform)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_configs_set ON configs (config_set_id)")
 
+    search_columns = ["Title", "SortingTitle", "Developer", "Publisher", "Genre"]
 
+    def migrate_search_index(self, c):
+        # Full text index over Game for the grid filter. Left out on sqlite
+        # builds without FTS5, get_games_with_images then keeps using LIKE.
+        try:
+            c.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+            c.execute("DROP TABLE temp.fts5_probe")
+        except sqlite3.OperationalError:
+            print("sqlite has no FTS5, library search will use LIKE", file=sys.stderr)
+            return
+        columns = ", ".join(self.search_columns)
+        new_values = ", ".join(f"new.{col}" for col in self.search_columns)
+        old_values = ", ".join(f"old.{col}" for col in self.search_columns)
+        c.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS GameSearch USING fts5({columns}, content='Game', content_rowid='id', tokenize='unicode61 remove_diacritics 2')")
+        c.execute(f"""CREATE TRIGGER IF NOT EXISTS game_search_insert AFTER INSERT ON Game BEGIN
+            INSERT INTO GameSearch(rowid, {columns}) VALUES (new.id, {new_values});
+            END""")
+        c.execute(f"""CREATE TRIGGER IF NOT EXISTS game_search_delete AFTER DELETE ON Game BEGIN
+            INSERT INTO GameSearch(GameSearch, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+            END""")
+        c.execute(f"""CREATE TRIGGER IF NOT EXISTS game_search_update AFTER UPDATE OF {columns} ON Game BEGIN
+            INSERT INTO GameSearch(GameSearch, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO GameSearch(rowid, {columns}) VALUES (new.id, {new_values});
+            END""")
+        c.execute("INSERT INTO GameSearch(GameSearch) VALUES ('rebuild')")
+
+    def migrate_grid_index(self, c):
+        # Matches the grid's sort order, so a page is read straight off the index
+        c.execute("CREATE INDEX IF NOT EXISTS idx_game_title ON Game (Title COLLATE NOCASE, id)")
+
+    def migrate_sort_indexes(self, c):
+        # One per grid sort, in the sort's order and covering the grid's
+        # columns, so a page is read off the index without a sort or table
+        # lookup. Spelled out rather than built from grid_sorts, which may
+        # change after this has run.
+        c.execute("DROP INDEX IF EXISTS idx_game_title")
+        c.execute("""CREATE INDEX IF NOT EXISTS idx_game_sort_title ON Game
+            (Title COLLATE NOCASE, id, ShortName, Title, SteamClientID)""")
+        c.execute("""CREATE INDEX IF NOT EXISTS idx_game_sort_sortingtitle ON Game
+            (COALESCE(NULLIF(SortingTitle, ''), Title) COLLATE NOCASE, id, ShortName, Title, SteamClientID)""")
+        c.execute("""CREATE INDEX IF NOT EXISTS idx_game_sort_releasedate ON Game
+            (COALESCE(ReleaseDate, '') DESC, Title COLLATE NOCASE, id, ShortName, Title, SteamClientID)""")
+        c.execute("""CREATE INDEX IF NOT EXISTS idx_game_sort_installed ON Game
+            ((SteamClientID IS NULL OR SteamClientID = ''), Title COLLATE NOCASE, id, ShortName, Title, SteamClientID)""")
+        # The size sort as of this version, migrate_size_bytes replaces it
+        c.execute(f"""CREATE INDEX IF NOT EXISTS idx_game_sort_size ON Game
+            ({self.size_bytes_expression.replace('Game.', '')} DESC, Title COLLATE NOCASE,
+            id, ShortName, Title, SteamClientID)""")
+
+    def migrate_size_bytes(self, c):
+        # Sizes as a number of bytes, so totals and the size sort don't have to
+        # parse the Size strings. Backfilled from Size for existing games.
+        columns = [row[1] for row in c.execute("PRAGMA table_info(Game)")]
+        if "SizeBytes" not in columns:
+            c.execute("ALTER TABLE Game ADD COLUMN SizeBytes INTEGER")
+        c.execute(f"""UPDATE Game SET SizeBytes = CAST({self.size_bytes_expression} AS INTEGER)
+            WHERE SizeBytes IS NULL AND Size IS NOT NULL AND Size <> ''""")
+        c.execute("DROP INDEX IF EXISTS idx_game_sort_size")
+        c.execute("""CREATE INDEX IF NOT EXISTS idx_game_sort_size ON Game
+            (COALESCE(SizeBytes, 0) DESC, Title COLLATE NOCASE, id, ShortName, Title, SteamClientID)""")
+
+    def migrate_steamgriddb_cache(self, c):
+        # SteamGridDB answers, so artwork fill-ins don't ask again every time.
+        # A NULL SGDBID or Url is a cached miss; Misses counts them in a row
+        # for the backoff. Expires is a unix time.
+        c.execute("""CREATE TABLE IF NOT EXISTS SteamGridDBGame (
+            ShortName TEXT PRIMARY KEY, SGDBID INTEGER,
+            Misses INTEGER NOT NULL DEFAULT 0, Expires REAL NOT NULL)""")
+        c.execute("""CREATE TABLE IF NOT EXISTS SteamGridDBImages (
+            SGDBID INTEGER NOT NULL, Type TEXT NOT NULL, Url TEXT,
+            Misses INTEGER NOT NULL DEFAULT 0, Expires REAL NOT NULL,
+            PRIMARY KEY (SGDBID, Type))""")
+
+    def migrate_metadata_sync(self, c):
+        # When each owned id's gamesdb record was last fetched and a hash of
+        # it, so a refresh only fetches new and stale ids. HasGame is 0 for
+        # records that aren't a game (DLC, packs) and have no Game row.
+        c.execute("""CREATE TABLE IF NOT EXISTS GameMetadata (
+            ShortName TEXT PRIMARY KEY, Hash TEXT NOT NULL,
+            HasGame INTEGER NOT NULL, Fetched REAL NOT NULL)""")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_game_metadata_fetched ON GameMetadata (Fetched)")
+
+    def migrate_metadata_misses(self, c):
+        # Owned ids gamesdb doesn't know, or the store says aren't games, so
+        # refreshes skip them until Expires (unix time). Misses counts them
+        # in a row for the backoff.
+        c.execute("""CREATE TABLE IF NOT EXISTS MetadataMiss (
+            ShortName TEXT PRIMARY KEY, Reason TEXT NOT NULL,
+            Misses INTEGER NOT NULL DEFAULT 0, Expires REAL NOT NULL)""")
 
     def get_umu_id(self, shortname):
         conn = self.get_connection()
@@ -153,28 +273,24 @@ class GameSet:
     
     def update_umu_id(self, shortname, store):
         url = "https://umu.openwinecomponents.org/umu_api.php?codename=" + shortname + "&store=" + store
-        headers = {'User-Agent': 'Mozilla/5.0'}
         print( url, file=sys.stderr)
-        req = urllib.request.Request(url, headers=headers)
-        response = urllib.request.urlopen(req, timeout=5)
-        data = response.read()
-        json_data = json.loads(data)
+        response = HttpClient.get_cached(url, timeout=5)
+        if response.not_modified and self.get_umu_id(shortname):
+            # Unchanged since the id was stored
+            return
+        json_data = response.json()
         print(json_data, file=sys.stderr)
         
         if json_data.__len__() > 0:
             umu_id = json_data[0]['umu_id']
-            conn = self.get_connection()
-            c = conn.cursor()
-            c.execute("UPDATE Game SET UmuId=? WHERE ShortName=?", (umu_id, shortname))
-            conn.commit()
-            conn.close()
+            with self.transaction() as conn:
+                c = conn.cursor()
+                c.execute("UPDATE Game SET UmuId=? WHERE ShortName=?", (umu_id, shortname))
     
     def flush_cache(self):
-        conn = self.get_connection()
-        c = conn.cursor()
-        c.execute("DELETE FROM Cache where ExpiryDate < datetime('now')")
-        conn.commit()
-        conn.close()
+        with self.transaction() as conn:
+            c = conn.cursor()
+            c.execute("DELETE FROM Cache where ExpiryDate < datetime('now')")
 
 
     def get_cache(self, key):
@@ -193,62 +309,191 @@ class GameSet:
             return None
     
     def add_cache(self, key, value, expiry_date):
-        conn = self.get_connection()
-        c = conn.cursor()
-        c.execute("INSERT INTO Cache (Key, Value, ExpiryDate) VALUES (?, ?, ?)", (key, value, expiry_date))
-        conn.commit()
+        with self.transaction() as conn:
+            c = conn.cursor()
+            c.execute("INSERT INTO Cache (Key, Value, ExpiryDate) VALUES (?, ?, ?)", (key, value, expiry_date))
         print(f"Added cache {key} {value} {expiry_date}", file=sys.stderr)
-        conn.close()
         
     def clear_cache(self, key):
-        conn = self.get_connection()
-        c = conn.cursor()
-        c.execute("DELETE FROM Cache WHERE Key=?", (key,))
-        conn.commit()
-        conn.close()
+        with self.transaction() as conn:
+            c = conn.cursor()
+            c.execute("DELETE FROM Cache WHERE Key=?", (key,))
 
-    def get_games_with_images(self,  image_prefix, filter_str, installed, isLimited, urlencode, needsLogin):
+    def has_search_index(self, c):
+        c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='GameSearch'")
+        return c.fetchone() is not None
+
+    @staticmethod
+    def get_search_query(filter_str):
+        """Turns the grid filter into an FTS5 query: every word must match the
+        start of a word in one of the search columns."""
+        terms = [term.replace('"', '""') for term in filter_str.split()]
+        return " ".join(f'"{term}"*' for term in terms if term.strip('"'))
+
+    grid_page_size = 100
+
+    # "12.34 GB" style Size strings as a number of bytes, for migrating to
+    # SizeBytes. Shipped migrations use it, so it mustn't change
+    size_bytes_expression = """COALESCE(CAST(substr(Game.Size, 1, instr(Game.Size, ' ') - 1) AS REAL) *
+        CASE upper(substr(Game.Size, instr(Game.Size, ' ') + 1))
+        WHEN 'GB' THEN 1073741824 WHEN 'MB' THEN 1048576 WHEN 'KB' THEN 1024 ELSE 1 END, 0)"""
+
+    # Grid sort orders as (expression, collation, descending) keys, the game
+    # id breaks any remaining ties. Each has an index made by the migrations
+    # (migrate_sort_indexes, migrate_size_bytes) to match it; changing a
+    # sort's keys means appending a migration that recreates its index.
+    grid_sorts = {
+        "title": [("Game.Title", "COLLATE NOCASE", False)],
+        "sortingtitle": [("COALESCE(NULLIF(Game.SortingTitle, ''), Game.Title)", "COLLATE NOCASE", False)],
+        "releasedate": [("COALESCE(Game.ReleaseDate, '')", "", True), ("Game.Title", "COLLATE NOCASE", False)],
+        "size": [("COALESCE(Game.SizeBytes, 0)", "", True), ("Game.Title", "COLLATE NOCASE", False)],
+        "installed": [("(Game.SteamClientID IS NULL OR Game.SteamClientID = '')", "", False),
+                      ("Game.Title", "COLLATE NOCASE", False)],
+    }
+
+    @staticmethod
+    def encode_grid_cursor(keys):
+        # keys is the JSON array of the last row's sort keys and id, as sqlite built it
+        return base64.urlsafe_b64encode(keys.encode()).decode()
+
+    @staticmethod
+    def decode_grid_cursor(cursor, key_count):
+        try:
+            keys = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except ValueError:
+            return None
+        if not isinstance(keys, list) or len(keys) != key_count + 1:
+            return None
+        return keys
+
+    @staticmethod
+    def get_keyset_condition(sort_keys, values):
+        """WHERE clause and parameters for the rows after the row whose sort
+        keys are values, for keys that may mix directions. The leading >= (or
+        <=) lets sqlite seek the index to the cursor."""
+        terms = []
+        params = []
+        for n, (column, collation, descending) in enumerate(sort_keys):
+            equal = [f"{col} {coll} = ?" for col, coll, _ in sort_keys[:n]]
+            terms.append("(" + " AND ".join(equal + [f"{column} {collation} {'<' if descending else '>'} ?"]) + ")")
+            params.extend(values[:n + 1])
+        column, collation, descending = sort_keys[0]
+        condition = f"{column} {collation} {'<=' if descending else '>='} ? AND ({' OR '.join(terms)})"
+        return condition, [values[0]] + params
+
+    def query_grid(self, c, image_column, image_params, installed, filter_str, search, page_size, cursor, sort=""):
+        """Returns the grid's games as a JSON array, and the cursor for the
+        next page when page_size is set and there are more games.
+
+        Pages are keyset based: the cursor holds the sort keys and id of the
+        last game sent, and the next page starts right after it, so a page
+        costs the same however deep into the library it is."""
+        where = []
+        where_params = []
+        source = "Game"
+        if sort and sort not in self.grid_sorts:
+            print(f"Unknown grid sort {sort}, sorting by title", file=sys.stderr)
+        sort_keys = list(self.grid_sorts.get(sort) or self.grid_sorts["title"])
+        if installed:
+            where.append("Game.SteamClientID IS NOT NULL AND Game.SteamClientID <> ''")
+        if search:
+            source = "GameSearch JOIN Game ON Game.id = GameSearch.rowid"
+            where.append("GameSearch MATCH ?")
+            where_params.append(search)
+            if not sort:
+                # Best match first. Title hits rank above sorting title, then developer,
+                # publisher and genre. Rounded so the rank survives the cursor exactly.
+                sort_keys.insert(0, ("round(bm25(GameSearch, 10.0, 5.0, 1.0, 1.0, 1.0), 6)", "", False))
+        elif filter_str:
+            where.append("LOWER(Game.Title) LIKE ?")
+            where_params.append('%' + filter_str.lower().replace(" ", "%") + '%')
+        key_columns = ", ".join(f"{expr} AS SortKey{n}" for n, (expr, _, _) in enumerate(sort_keys))
+        order = ", ".join(f"SortKey{n} {collation} {'DESC' if descending else ''}"
+                          for n, (_, collation, descending) in enumerate(sort_keys)) + ", id"
+        games = f"""SELECT Game.id, Game.ShortName, Game.Title, Game.SteamClientID, {key_columns}
+            FROM {source} WHERE {' AND '.join(where) or '1'}"""
+        params = list(image_params) + where_params
+        if page_size is None:
+            grid = f"SELECT * FROM ({games}) ORDER BY {order}"
+            page_filter = ""
+            last_keys = "NULL"
+        else:
+            after = ""
+            if cursor:
+                keys = self.decode_grid_cursor(cursor, len(sort_keys))
+                if keys is None:
+                    print(f"Ignoring invalid grid cursor: {cursor}", file=sys.stderr)
+                    return "[]", None
+                condition, keyset_params = self.get_keyset_condition(
+                    [(f"SortKey{n}", collation, descending) for n, (_, collation, descending) in enumerate(sort_keys)]
+                    + [("id", "", False)], keys)
+                after = f"WHERE {condition}"
+                params.extend(keyset_params)
+            # One row past the page tells whether there is a next one
+            grid = f"""SELECT *, row_number() OVER (ORDER BY {order}) AS RowNum FROM
+                (SELECT * FROM ({games}) {after} ORDER BY {order} LIMIT {page_size + 1})"""
+            page_filter = f" FILTER (WHERE RowNum <= {page_size})"
+            sort_values = ", ".join(f"SortKey{n}" for n in range(len(sort_keys)))
+            last_keys = f"CASE WHEN count(*) > {page_size} THEN max(CASE WHEN RowNum = {page_size} THEN json_array({sort_values}, id) END) END"
+        # One query for the whole grid, built as a single JSON array by sqlite
+        c.execute(
+            f"""SELECT json_group_array(json_object(
+                    'ID', id, 'Name', Title,
+                    'Images', json((SELECT json_group_array({image_column}) FROM
+                        (SELECT ImagePath FROM Images WHERE Images.GameID = Grid.id ORDER BY SortOrder))),
+                    'ShortName', ShortName, 'SteamClientID', SteamClientID)){page_filter},
+                {last_keys}
+            FROM ({grid}) AS Grid""",
+            params)
+        games_json, keys = c.fetchone()
+        return games_json, (self.encode_grid_cursor(keys) if keys else None)
+
+    def get_games_with_images(self,  image_prefix, filter_str, installed, isLimited, urlencode, needsLogin, cursor="", page_size="", sort=""):
         conn = self.get_connection()
         c = conn.cursor()
-        c.row_factory = sqlite3.Row
-        limited_clause = ""
-        if (isLimited.lower() == "true"):
-            limited_clause = "LIMIT 100"
-        if (installed.lower() == "true"):
-            c.execute(
-                f"SELECT Game.ID, ShortName, Title, SteamClientID FROM Game WHERE SteamClientID IS NOT NULL AND SteamClientID <> '' and LOWER(Title) LIKE ? ORDER BY Title COLLATE NOCASE {limited_clause}", ('%' + filter_str.lower().replace(" ", "%") + '%',))
+        if page_size:
+            page_size = max(1, int(page_size))
+        elif (isLimited.lower() == "true"):
+            page_size = self.grid_page_size
         else:
-            c.execute(
-                f"SELECT Game.ID, ShortName, Title, SteamClientID FROM Game WHERE LOWER(Title) LIKE ? ORDER BY Title COLLATE NOCASE {limited_clause}", ('%' + filter_str.lower().replace(" ", "%") + '%',))
-        games = c.fetchall()
-        result = []
-        for game in games:
-            game_id = game['ID']
-            shortname = game['ShortName']
-            title = game['Title']
-            steam_client_id = game['SteamClientID']
-            c.execute(
-                "SELECT ImagePath FROM Images WHERE GameID=? order by SortOrder", (game_id,))
-            images = c.fetchall()
-            image_files = []
-            for image in images:
-                image_path = image[0]
-                if (image_path == None):
-                    image_url = ""
-                else:
-                    if (urlencode):
-                        image_path = urllib.parse.quote(image_path)
-
-                    image_url = image_prefix + image_path
-                image_files.append(image_url)
-            result.append({'ID': game_id, 'Name': title,
-                           'Images': image_files, 'ShortName': shortname, 'SteamClientID': steam_client_id})
+            page_size = None
+        installed = installed.lower() == "true"
+        image_params = []
+        image_column = "ImagePath"
+        if (not urlencode):
+            # The prefix can be applied in SQL, urlencoded paths are done below
+            image_column = "CASE WHEN ImagePath IS NULL THEN '' ELSE ? || ImagePath END"
+            image_params.append(image_prefix)
+        search = None
+        if filter_str.strip() and self.has_search_index(c):
+            search = self.get_search_query(filter_str)
+        try:
+            games_json, next_cursor = self.query_grid(
+                c, image_column, image_params, installed, filter_str, search, page_size, cursor, sort)
+        except sqlite3.OperationalError as e:
+            if not search:
+                raise
+            # e.g. this sqlite build can't load fts5
+            print(f"Search index unusable, falling back to LIKE: {e}", file=sys.stderr)
+            games_json, next_cursor = self.query_grid(
+                c, image_column, image_params, installed, filter_str, None, page_size, cursor, sort)
         conn.close()
-        content =  {'NeedsLogin': needsLogin, 'Games': result}
+        if (urlencode):
+            result = json.loads(games_json)
+            for game in result:
+                game['Images'] = ["" if image_path == None else image_prefix + urllib.parse.quote(image_path)
+                                  for image_path in game['Images']]
+            games_json = json.dumps(result)
+        content =  {'NeedsLogin': needsLogin}
+        if next_cursor:
+            content['NextCursor'] = next_cursor
         if self.storeURL != None:
             print(f"Store URL: {self.storeURL}", file=sys.stderr)
             content['storeURL'] = self.storeURL
-        return json.dumps({'Type': 'GameGrid', 'Content': content })
+        # The game list is already JSON, splice it in instead of decoding and
+        # re-encoding every game
+        content_json = json.dumps(content)
+        return f'{{"Type": "GameGrid", "Content": {content_json[:-1]}, "Games": {games_json}}}}}'
 
     def load_conf_data_from_json(self, json_file):
         with open(json_file, 'r') as f:
@@ -262,23 +507,23 @@ class GameSet:
     def create_empty_config_set(self, shortname, forkname, version, platform):
         conn = self.get_connection()
         c = conn.cursor()
-        config_set_id = 0
         c.execute("select id from config_set where ShortName = ? AND forkname = ? AND version = ? AND platform = ?",
                   (shortname, forkname, version, platform))
         row = c.fetchone()
-        if row is None:
-            c.execute("INSERT INTO config_set (ShortName, forkname, version, platform) VALUES (?, ?, ?, ?)",
-                      (shortname, forkname, version, platform))
-            conn.commit()
         conn.close()
+        if row is None:
+            with self.transaction() as conn:
+                c = conn.cursor()
+                # Checked again under the write lock in case another writer got here first
+                c.execute("INSERT INTO config_set (ShortName, forkname, version, platform) "
+                          "SELECT ?, ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM config_set WHERE ShortName = ? AND forkname = ? AND version = ? AND platform = ?)",
+                          (shortname, forkname, version, platform, shortname, forkname, version, platform))
 
     def add_missing_config_sets(self, name):
-        conn = self.get_connection()
-        c = conn.cursor()
-        query = "insert into config_set (ShortName, forkname, version, platform) select Game.ShortName, '', '', 'dos' from Game LEFT JOIN config_set ON Game.ShortName = config_set.ShortName AND config_set.platform = 'dos' WHERE config_set.id IS NULL"
-        c.execute(query)
-        conn.commit()
-        conn.close()
+        with self.transaction() as conn:
+            c = conn.cursor()
+            query = "insert into config_set (ShortName, forkname, version, platform) select Game.ShortName, '', '', 'dos' from Game LEFT JOIN config_set ON Game.ShortName = config_set.ShortName AND config_set.platform = 'dos' WHERE config_set.id IS NULL"
+            c.execute(query)
 
     def get_config(self, shortnames, forkname, version, platform):
         conn = self.get_connection()
@@ -319,78 +564,73 @@ class GameSet:
         return config, autoexec_text
 
     def store_config_in_database(self, shortname, forkname, version, platform, sections, autoexec):
-        conn = self.get_connection()
-        c = conn.cursor()
-        config_set_id = 0
-        c.execute("select id from config_set where ShortName = ? AND forkname = ? AND version = ? AND platform = ?",
-                  (shortname, forkname, version, platform))
-        row = c.fetchone()
-        if row is None:
-            c.execute("INSERT INTO config_set (ShortName, forkname, version, platform) VALUES (?, ?, ?, ?)",
+        with self.transaction() as conn:
+            c = conn.cursor()
+            config_set_id = 0
+            c.execute("select id from config_set where ShortName = ? AND forkname = ? AND version = ? AND platform = ?",
                       (shortname, forkname, version, platform))
-            config_set_id = c.lastrowid
-        else:
-            config_set_id = row[0]
-            c.execute("DELETE FROM configs WHERE config_set_id = ?",
-                      (config_set_id,))
-        for section, settings in sections.items():
-            for key, value in settings.items():
-                value = value.replace('$', '$$')
-                query = "INSERT INTO configs (section, key, value, config_set_id) VALUES (?, ?, ?, ?)"
-                params = (section, key, value, config_set_id)
-                c.execute(query, params)
-        autoexec = autoexec.replace('$', '$$')
-        query = "INSERT INTO configs (section, key, value, config_set_id) VALUES (?, ?, ?, ?)"
-        params = ('autoexec', 'text', autoexec, config_set_id)
-        c.execute(query, params)
-        conn.commit()
-        conn.close()
+            row = c.fetchone()
+            if row is None:
+                c.execute("INSERT INTO config_set (ShortName, forkname, version, platform) VALUES (?, ?, ?, ?)",
+                          (shortname, forkname, version, platform))
+                config_set_id = c.lastrowid
+            else:
+                config_set_id = row[0]
+                c.execute("DELETE FROM configs WHERE config_set_id = ?",
+                          (config_set_id,))
+            for section, settings in sections.items():
+                for key, value in settings.items():
+                    value = value.replace('$', '$$')
+                    query = "INSERT INTO configs (section, key, value, config_set_id) VALUES (?, ?, ?, ?)"
+                    params = (section, key, value, config_set_id)
+                    c.execute(query, params)
+            autoexec = autoexec.replace('$', '$$')
+            query = "INSERT INTO configs (section, key, value, config_set_id) VALUES (?, ?, ?, ?)"
+            params = ('autoexec', 'text', autoexec, config_set_id)
+            c.execute(query, params)
 
     def parse_json_store_in_database(self, shortname, forkname, version, platform, config_data):
         # filename = os.path.expanduser(f"~/{shortname}_{platform}_{forkname}.json")
         # with open(filename, 'w') as f:
         #     json.dump(config_data, f)
         # try:
-        conn = self.get_connection()
-        c = conn.cursor()
-        config_set_id = 0
-        c.execute("select id from config_set where ShortName = ? AND forkname = ? AND version = ? AND platform = ?",
-                  (shortname, forkname, version, platform))
-        row = c.fetchone()
-        if row is None:
-            c.execute("INSERT INTO config_set (ShortName, forkname, version, platform) VALUES (?, ?, ?, ?)",
+        with self.transaction() as conn:
+            c = conn.cursor()
+            config_set_id = 0
+            c.execute("select id from config_set where ShortName = ? AND forkname = ? AND version = ? AND platform = ?",
                       (shortname, forkname, version, platform))
-            config_set_id = c.lastrowid
-        else:
-            config_set_id = row[0]
-            c.execute("DELETE FROM configs WHERE config_set_id = ?",
-                      (config_set_id,))
-        for section in config_data['Sections']:
-            for option in section['Options']:
-                value = option['Value']
-                value = value.replace('$', '$$')
-                shouldUpdate = True
-                if (option['Value'] == option['DefaultValue']):
-                    shouldUpdate = False
-                try:
-                    if (option['Parents'] and len(option['Parents']) > 0 and option['Parents'][0]['Value'] == option['Value']
-                            and option['Parents'][0]['Parent'] != 'default'):
+            row = c.fetchone()
+            if row is None:
+                c.execute("INSERT INTO config_set (ShortName, forkname, version, platform) VALUES (?, ?, ?, ?)",
+                          (shortname, forkname, version, platform))
+                config_set_id = c.lastrowid
+            else:
+                config_set_id = row[0]
+                c.execute("DELETE FROM configs WHERE config_set_id = ?",
+                          (config_set_id,))
+            for section in config_data['Sections']:
+                for option in section['Options']:
+                    value = option['Value']
+                    value = value.replace('$', '$$')
+                    shouldUpdate = True
+                    if (option['Value'] == option['DefaultValue']):
                         shouldUpdate = False
-                except:
-                    print(option)
-                if (shouldUpdate):
-                    query = "INSERT INTO configs (section, key, value, config_set_id) VALUES (?, ?, ?, ?)"
-                    params = (section['Name'], option['Key'],
-                              value, config_set_id)
-                    c.execute(query, params)
-                    conn.commit()
-        autoexec = config_data['Autoexec']
-        autoexec = autoexec.replace('$', '$$')
-        query = "INSERT INTO configs (section, key, value, config_set_id) VALUES (?, ?, ?, ?)"
-        params = ('autoexec', 'text', autoexec, config_set_id)
-        c.execute(query, params)
-        conn.commit()
-        conn.close()
+                    try:
+                        if (option['Parents'] and len(option['Parents']) > 0 and option['Parents'][0]['Value'] == option['Value']
+                                and option['Parents'][0]['Parent'] != 'default'):
+                            shouldUpdate = False
+                    except:
+                        print(option)
+                    if (shouldUpdate):
+                        query = "INSERT INTO configs (section, key, value, config_set_id) VALUES (?, ?, ?, ?)"
+                        params = (section['Name'], option['Key'],
+                                  value, config_set_id)
+                        c.execute(query, params)
+            autoexec = config_data['Autoexec']
+            autoexec = autoexec.replace('$', '$$')
+            query = "INSERT INTO configs (section, key, value, config_set_id) VALUES (?, ?, ?, ?)"
+            params = ('autoexec', 'text', autoexec, config_set_id)
+            c.execute(query, params)
         return json.dumps({'Type': 'Success', 'Content': {'Message': "Config saved"}})
         # except Exception as e:
         #     return json.dumps({'Type': 'Error', 'Content': {'success': False, 'error': f'somethign went sideways {e}'}})
@@ -528,24 +768,80 @@ class GameSet:
         c = conn.cursor()
         c.row_factory = sqlite3.Row
         c.execute("SELECT ImagePath FROM Images join Game on Game.ID = Images.GameID WHERE ShortName=? order by Images.SortOrder", (game_id,))
-        images = []
+        urls = {}
 
-        for row in c.fetchall():
+        # Only the first two are used
+        for n, row in enumerate(c.fetchmany(2)):
             url = f"{image_prefix}{row['ImagePath']}"
             if url_encode:
                 url = f"{image_prefix}{urllib.parse.quote(row[0])}"
-
-            images.append(self.download(url))
+            urls[n] = url
 
         conn.close()
-        tallImage = images[0] if len(images) > 0 else None
-        wideImage = images[1] if len(images) > 1 else tallImage
+        images = self.download_all(urls)
+        tallImage = images.get(0)
+        wideImage = images.get(1) if 1 in urls else tallImage
         return json.dumps({'Type': 'Images', 'Content': {'Grid': tallImage, 'GridH': wideImage, 'Hero': wideImage, 'Logo': tallImage}})
 
     def download(self, url):
-        response = urllib.request.urlopen(url).read()
-        encoded_data = base64.b64encode(response).decode('utf-8')
-        return encoded_data
+        """Returns the image's path on the plugin's web server, fetching it into
+        the image cache first if needed, or None if it couldn't be fetched.
+        Without a runtime dir to cache in, returns the image as base64."""
+        try:
+            if self.image_cache is None:
+                self.image_cache = ImageCache.get_image_cache()
+            if self.image_cache is None:
+                response = HttpClient.get(url, timeout=ImageCache.FETCH_TIMEOUT)
+                return base64.b64encode(response.read()).decode('utf-8')
+            return ImageCache.ROUTE + self.image_cache.fetch(url)
+        except Exception as e:
+            print(f"Error downloading image {url}: {e}", file=sys.stderr)
+            return None
+
+    def download_all(self, urls, wait=False):
+        """Downloads {slot: url} concurrently into {slot: image}, each URL once.
+        Slots that failed, or missed image_deadline unless wait is set, are
+        left out."""
+        images = {}
+        if not urls:
+            return images
+        unique = set(urls.values())
+        todo = queue.Queue()
+        for url in unique:
+            todo.put(url)
+        finished = {}
+        cond = threading.Condition()
+
+        def worker():
+            while True:
+                try:
+                    url = todo.get_nowait()
+                except queue.Empty:
+                    return
+                image = self.download(url)
+                with cond:
+                    finished[url] = image
+                    cond.notify_all()
+
+        # Daemon threads, so a CLI call can exit at the deadline instead of
+        # waiting for stragglers. In the store worker they keep going and
+        # still land in the image cache.
+        for _ in range(min(self.image_workers, len(unique))):
+            threading.Thread(target=worker, daemon=True).start()
+        deadline = None if wait else time.monotonic() + self.image_deadline
+        with cond:
+            while len(finished) < len(unique):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                cond.wait(remaining)
+            downloaded = {url: image for url, image in finished.items() if image is not None}
+            for url in unique - finished.keys():
+                print(f"Timed out downloading image {url}", file=sys.stderr)
+        for slot, url in urls.items():
+            if url in downloaded:
+                images[slot] = downloaded[url]
+        return images
 
     def get_game_data(self, shortname, image_prefix, urlencode, platform, forkname, version):
         conn = self.get_connection()
@@ -697,6 +993,17 @@ class GameSet:
 
         return editors
 
+    def get_disk_size(self, game_id):
+        conn = self.get_connection()
+        c = conn.cursor()
+        c.row_factory = sqlite3.Row
+        c.execute("SELECT Size FROM Game WHERE ShortName=?", (game_id,))
+        result = c.fetchone()
+        conn.close()
+        if result and bool(result['Size']):
+            return f"Size on Disk: {result['Size']}"
+        return ""
+
     def get_setting(self, name):
         conn = self.get_connection()
         c = conn.cursor()
@@ -710,36 +1017,30 @@ class GameSet:
             return json.dumps({'Type': 'Setting', 'Content': {'name': name, 'value': ''}})
 
     def save_setting(self, name, value):
-        conn = self.get_connection()
-        c = conn.cursor()
-        c.execute("SELECT COUNT(*) FROM Settings WHERE name=?",
-                  (name,))
-        result = c.fetchone()
-        if result[0] == 0:
-            c.execute("INSERT INTO Settings (name, value) VALUES (?, ?)",
-                      (name, value))
-        else:
-            c.execute("UPDATE Settings SET value=? WHERE name=?",
-                      (value, name))
-        conn.commit()
-        conn.close()
+        with self.transaction() as conn:
+            c = conn.cursor()
+            c.execute("SELECT COUNT(*) FROM Settings WHERE name=?",
+                      (name,))
+            result = c.fetchone()
+            if result[0] == 0:
+                c.execute("INSERT INTO Settings (name, value) VALUES (?, ?)",
+                          (name, value))
+            else:
+                c.execute("UPDATE Settings SET value=? WHERE name=?",
+                          (value, name))
         return json.dumps({'Type': 'Success', 'Content': {'Message': "Setting Saved: " + name }})
 
     def add_steam_client_id(self, shortname, steam_client_id):
-        conn = self.get_connection()
-        c = conn.cursor()
-        c.execute("UPDATE Game SET SteamClientID=? WHERE ShortName=?",
-                  (steam_client_id, shortname))
-        conn.commit()
-        conn.close()
+        with self.transaction() as conn:
+            c = conn.cursor()
+            c.execute("UPDATE Game SET SteamClientID=? WHERE ShortName=?",
+                      (steam_client_id, shortname))
 
     def clear_steam_client_id(self, shortname):
-        conn = self.get_connection()
-        c = conn.cursor()
-        c.execute("UPDATE Game SET SteamClientID='' WHERE ShortName=?",
-                  (shortname,))
-        conn.commit()
-        conn.close()
+        with self.transaction() as conn:
+            c = conn.cursor()
+            c.execute("UPDATE Game SET SteamClientID='' WHERE ShortName=?",
+                      (shortname,))
 
 
 
@@ -852,9 +1153,70 @@ class GenericArgs:
             '--get-umu-id', nargs=1, help='Get UMU ID')
         self.parser.add_argument(
             '--add-achievement', nargs=1, help='Add achievement')
-
-    def parseArgs(self):
-        self.args = self.parser.parse_args()
+        self.parser.add_argument(
+            '--worker', help='Serve JSON-RPC requests on stdin/stdout', action='store_true')
+
+    def parseArgs(self, argv=None):
+        self.args = self.parser.parse_args(argv)
+
+    def serve(self):
+        """Worker mode: keep this process and its store object warm and run one
+        command line per request. Requests and responses are single JSON lines:
+        {"id": 1, "method": "execute", "params": {"argv": [...], "args": [...], "input": ""}}
+        {"id": 1, "result": {"stdout": "...", "returncode": 0}}"""
+        dbfile = self.args.dbfile
+        # Keep the RPC channel on private descriptors so stray prints and child
+        # processes can't read from or write into it
+        rpc_in = os.fdopen(os.dup(sys.stdin.fileno()), 'r')
+        rpc_out = os.fdopen(os.dup(sys.stdout.fileno()), 'w')
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, sys.stdin.fileno())
+        os.close(devnull)
+        os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+        for line in rpc_in:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                response = {'id': request.get('id')}
+                if request.get('method') == 'execute':
+                    params = request.get('params', {})
+                    response['result'] = self.execute(
+                        params.get('argv', []), params.get('args', []), params.get('input', ''), dbfile)
+                else:
+                    response['error'] = {'message': f"Unknown method {request.get('method')}"}
+            except Exception as e:
+                response = {'id': None, 'error': {'message': f"Invalid request: {e}"}}
+            rpc_out.write(json.dumps(response) + "\n")
+            rpc_out.flush()
+
+    def execute(self, argv, args, input_data, dbfile):
+        """Run one command line in-process. argv is a template: environment
+        variables are expanded and {0}, {1}, ... are replaced by args."""
+        def substitute(part):
+            part = os.path.expandvars(part)
+            return re.sub(r'\{(\d+)\}', lambda m: str(args[int(m.group(1))]) if int(m.group(1)) < len(args) else '', part)
+
+        argv = [substitute(part) for part in argv]
+        if '--dbfile' not in argv:
+            argv += ['--dbfile', dbfile]
+        stdout = io.StringIO()
+        returncode = 0
+        real_stdin = sys.stdin
+        sys.stdin = io.StringIO(input_data)
+        try:
+            with contextlib.redirect_stdout(stdout):
+                self.parseArgs(argv)
+                self.processArgs()
+        except SystemExit as e:
+            returncode = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except Exception:
+            traceback.print_exc()
+            returncode = 1
+        finally:
+            sys.stdin = real_stdin
+        return {'stdout': stdout.getvalue(), 'returncode': returncode}
 
     def processArgs(self):
         if self.args.parsejson:
@@ -911,8 +1273,10 @@ class GenericArgs:
                 installed = self.args.getgameswithimages[2]
                 isLimited = self.args.getgameswithimages[3]
                 needsLogin = self.args.getgameswithimages[4]
+            # Optional keyset paging (cursor from the previous page, page size) and sort order
+            paging = self.args.getgameswithimages[5:8]
             print(self.gameSet.get_games_with_images(
-                self.args.getgameswithimages[0], filter, installed, isLimited, urlencode, needsLogin))
+                self.args.getgameswithimages[0], filter, installed, isLimited, urlencode, needsLogin, *paging))
         if self.args.update_umu_id:
             self.gameSet.update_umu_id(self.args.update_umu_id[0], self.args.update_umu_id[1])
         
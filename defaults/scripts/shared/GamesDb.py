@@ -1,10 +1,18 @@
+import hashlib
 import json
 import os
 import sqlite3
 import sys
-import urllib.request
+import queue
+import threading
+import time
+import urllib.error
+import urllib.parse
 
 import GameSet
+import Database
+import HttpClient
+import RateLimiter
 import SteamGridDB as sgdb_module
 import traceback
 import concurrent.futures
@@ -13,18 +21,6 @@ class GamesDb(GameSet.GameSet):
     def __init__(self, db_file, storeName, setNameConfig=None):
         super().__init__(db_file, storeName,  setNameConfig)
     
-    def create_tables(self):
-        super().create_tables()
-        conn = self.get_connection()
-        c = conn.cursor()
-        c.execute("PRAGMA table_info(Images)")
-        columns = [column[1] for column in c.fetchall()]
-        if "Type" not in columns:
-            c.execute("drop table Images")
-            c.execute(f"CREATE TABLE IF NOT EXISTS Images (id INTEGER PRIMARY KEY, GameID INTEGER, ImagePath TEXT, FileName TEXT, Type TEXT, SortOrder INTEGER, FOREIGN KEY(GameID) REFERENCES Game(id))")
-        conn.commit()
-        conn.close()
-    
     def _read_sgdb_key(self):
         runtime_dir = os.environ.get('DECKY_PLUGIN_RUNTIME_DIR', '')
         if not runtime_dir:
@@ -37,99 +33,203 @@ class GamesDb(GameSet.GameSet):
         except FileNotFoundError:
             return None
 
-    def get_base64_images(self, game_id, image_prefix="", url_encode=False):
+    # Images table Type -> slot in the Images response, and the SortOrder a
+    # SteamGridDB fill-in is cached with
+    image_slots = {
+        'vertical_cover': ('Grid', 0),
+        'logo': ('GridH', 1),
+        'horizontal_artwork': ('Hero', 1),
+        'square_icon': ('Logo', 1),
+    }
+
+    # How long SteamGridDB answers are trusted. Misses are asked again after
+    # sgdb_miss_ttl, doubling with each miss in a row up to sgdb_max_miss_ttl.
+    sgdb_game_ttl = 30 * 86400
+    sgdb_image_ttl = 7 * 86400
+    sgdb_miss_ttl = 3600
+    sgdb_max_miss_ttl = 30 * 86400
+
+    # gamesdb records are fetched again once last written more than
+    # metadata_ttl ago, at most metadata_refresh_batch of them per refresh.
+    # Unchanged records aren't written, so the stale ones are taken in turn by
+    # time slot rather than oldest first
+    metadata_ttl = 7 * 86400
+    metadata_refresh_batch = 50
+    # Ids gamesdb doesn't know, once the store's fallback has them, are asked
+    # again after metadata_miss_ttl, doubling with each miss in a row up to metadata_max_miss_ttl. Stores
+    # record ids they find aren't games (DLC, packs, delisted) for
+    # not_game_ttl.
+    metadata_miss_ttl = 86400
+    metadata_max_miss_ttl = 30 * 86400
+    not_game_ttl = 30 * 86400
+    # Most threads fetching gamesdb records, how many of them are let through
+    # at once is up to RateLimiter; and records per write transaction
+    fetch_workers = 40
+    write_batch = 200
+
+    def get_sgdb_expiry(self, found, misses, ttl):
+        if found:
+            return time.time() + ttl
+        return time.time() + min(self.sgdb_miss_ttl * 2 ** misses, self.sgdb_max_miss_ttl)
+
+    def find_sgdb_game(self, conn, sgdb, game_id, game_title):
+        """SteamGridDB's id for the game, or None, asking SGDB only when the
+        cached answer has expired."""
+        row = conn.execute("SELECT SGDBID, Misses, Expires FROM SteamGridDBGame WHERE ShortName=?",
+                           (game_id,)).fetchone()
+        if row is not None and row[2] > time.time():
+            return row[0]
+        misses = row[1] if row is not None else 0
+        errors = sgdb.errors
+        sgdb_id = sgdb.find_game(self.storeName, game_id, game_title)
+        if sgdb_id is None and sgdb.errors > errors:
+            # Not a real miss, don't hold it against the game
+            return None
+        misses = 0 if sgdb_id else misses + 1
+        with Database.transaction(conn):
+            conn.execute("INSERT OR REPLACE INTO SteamGridDBGame (ShortName, SGDBID, Misses, Expires) VALUES (?, ?, ?, ?)",
+                         (game_id, sgdb_id, misses, self.get_sgdb_expiry(sgdb_id, misses - 1, self.sgdb_game_ttl)))
+        return sgdb_id
+
+    def get_sgdb_images(self, conn, sgdb, sgdb_id, types):
+        """{type: url} for the image types asked for, url None where SGDB has
+        none. Only expired or uncached types are fetched."""
+        now = time.time()
+        cached = {}
+        misses = {}
+        for img_type, url, miss_count, expires in conn.execute(
+                "SELECT Type, Url, Misses, Expires FROM SteamGridDBImages WHERE SGDBID=?", (sgdb_id,)):
+            if img_type in types and expires > now:
+                cached[img_type] = url
+            misses[img_type] = miss_count
+        stale = [img_type for img_type in types if img_type not in cached]
+        if not stale:
+            return cached
+        fetched = sgdb.get_images(sgdb_id, stale)
+        rows = []
+        for img_type, url in fetched.items():
+            miss_count = 0 if url else misses.get(img_type, 0) + 1
+            rows.append((sgdb_id, img_type, url, miss_count,
+                         self.get_sgdb_expiry(url, miss_count - 1, self.sgdb_image_ttl)))
+        if rows:
+            with Database.transaction(conn):
+                conn.executemany("INSERT OR REPLACE INTO SteamGridDBImages (SGDBID, Type, Url, Misses, Expires) VALUES (?, ?, ?, ?, ?)", rows)
+        cached.update(fetched)
+        return cached
+
+    def resolve_images(self, game_ids, wait=False):
+        """{shortname: {img_type: image}} for the games, in one pass: one query
+        for their stored URLs, one download pool for every game's slots, and
+        SteamGridDB asked once per game (and once per SGDB game for images)
+        for the slots still missing. Games not in the database are left out."""
         conn = self.get_connection()
         c = conn.cursor()
         c.row_factory = sqlite3.Row
-        c.execute("SELECT ImagePath, Images.Type, Game.Title, Game.ID as GameDBID FROM Images join Game on Game.ID = Images.GameID WHERE Game.ShortName=? order by Images.SortOrder", (game_id,))
-
-        grid = None
-        gridH = None
-        heroImage = None
-        logo = None
-        game_title = None
-        game_db_id = None
+        c.execute("""SELECT Game.ShortName, Game.Title, Game.ID as GameDBID, Images.ImagePath, Images.Type
+            FROM Game LEFT JOIN Images ON Images.GameID = Game.ID
+            WHERE Game.ShortName IN (SELECT value FROM json_each(?)) order by Images.SortOrder""",
+                  (json.dumps(list(game_ids)),))
 
+        games = {}
+        urls = {}
         for row in c.fetchall():
-            image = row['ImagePath']
-            if game_title is None:
-                game_title = row['Title']
-                game_db_id = row['GameDBID']
-            print(f"{row['Type']}: {image}", file=sys.stderr)
-            if row['Type'] == 'vertical_cover':
-                grid = self.download(image)
-
-            elif row['Type'] == 'horizontal_artwork':
-                heroImage = self.download(image)
-
-            elif row['Type'] == 'logo':
-                gridH = self.download(image)
-            elif row['Type'] == 'square_icon':
-                logo = self.download(image)
-
-        # If we didn't get a title from the Images join, fetch it directly
-        if game_title is None:
-            c.execute("SELECT Title, ID FROM Game WHERE ShortName=?", (game_id,))
-            row = c.fetchone()
-            if row:
-                game_title = row['Title']
-                game_db_id = row['ID']
+            game_id = row['ShortName']
+            games.setdefault(game_id, (row['Title'], row['GameDBID']))
+            if row['Type'] is None:
+                continue
+            print(f"{game_id} {row['Type']}: {row['ImagePath']}", file=sys.stderr)
+            if row['Type'] in self.image_slots:
+                urls[(game_id, row['Type'])] = row['ImagePath']
+
+        # All slots at once, a slow one only costs its own timeout
+        images = {game_id: {} for game_id in games}
+        for (game_id, img_type), image in self.download_all(urls, wait).items():
+            images[game_id][img_type] = image
 
         # SteamGridDB fallback for missing image slots
-        missing = {}
-        if grid is None:
-            missing['vertical_cover'] = 0
-        if heroImage is None:
-            missing['horizontal_artwork'] = 1
-        if gridH is None:
-            missing['logo'] = 1
-        if logo is None:
-            missing['square_icon'] = 1
-
-        if missing and game_title:
-            api_key = self._read_sgdb_key()
-            if api_key:
-                try:
-                    sgdb = sgdb_module.SteamGridDB(api_key)
-                    sgdb_id = sgdb.find_game(self.storeName, game_id, game_title)
+        missing = {game_id: [img_type for img_type in self.image_slots if img_type not in images[game_id]]
+                   for game_id, (title, _) in games.items() if title}
+        missing = {game_id: types for game_id, types in missing.items() if types}
+
+        api_key = self._read_sgdb_key() if missing else None
+        if api_key:
+            try:
+                sgdb = sgdb_module.SteamGridDB(api_key)
+                sgdb_ids = {}
+                for game_id in missing:
+                    sgdb_id = self.find_sgdb_game(conn, sgdb, game_id, games[game_id][0])
                     if sgdb_id:
-                        sgdb_images = sgdb.get_images(sgdb_id)
-                        for img_type, sort_order in missing.items():
-                            url = sgdb_images.get(img_type)
-                            if url:
-                                print(f"SteamGridDB filling {img_type}: {url}", file=sys.stderr)
-                                b64 = self.download(url)
-                                if img_type == 'vertical_cover':
-                                    grid = b64
-                                elif img_type == 'horizontal_artwork':
-                                    heroImage = b64
-                                elif img_type == 'logo':
-                                    gridH = b64
-                                elif img_type == 'square_icon':
-                                    logo = b64
-                                # Cache URL in Images table
-                                if game_db_id is not None:
-                                    try:
-                                        c.execute("INSERT INTO Images (GameID, ImagePath, FileName, SortOrder, Type) VALUES (?, ?, ?, ?, ?)",
-                                                  (game_db_id, url, '', sort_order, img_type))
-                                    except Exception as e:
-                                        print(f"SteamGridDB cache insert error: {e}", file=sys.stderr)
-                        conn.commit()
-                except Exception as e:
-                    print(f"SteamGridDB fallback error: {e}", file=sys.stderr)
+                        sgdb_ids[game_id] = sgdb_id
+                # Games sharing an SGDB entry share one set of image lookups
+                wanted = {}
+                for game_id, sgdb_id in sgdb_ids.items():
+                    wanted.setdefault(sgdb_id, set()).update(missing[game_id])
+                sgdb_images = {sgdb_id: self.get_sgdb_images(conn, sgdb, sgdb_id, sorted(types))
+                               for sgdb_id, types in wanted.items()}
+                sgdb_urls = {}
+                for game_id, sgdb_id in sgdb_ids.items():
+                    for img_type in missing[game_id]:
+                        url = sgdb_images[sgdb_id].get(img_type)
+                        if url:
+                            print(f"SteamGridDB filling {game_id} {img_type}: {url}", file=sys.stderr)
+                            sgdb_urls[(game_id, img_type)] = url
+                for (game_id, img_type), image in self.download_all(sgdb_urls, wait).items():
+                    images[game_id][img_type] = image
+                # Cache URLs in Images table
+                found = [(games[game_id][1], url, '', self.image_slots[img_type][1], img_type)
+                         for (game_id, img_type), url in sgdb_urls.items()]
+                # Written after the downloads so the write lock isn't held over the network
+                if found:
+                    try:
+                        with Database.transaction(conn):
+                            c.executemany("INSERT INTO Images (GameID, ImagePath, FileName, SortOrder, Type) VALUES (?, ?, ?, ?, ?)", found)
+                    except Exception as e:
+                        print(f"SteamGridDB cache insert error: {e}", file=sys.stderr)
+            except Exception as e:
+                print(f"SteamGridDB fallback error: {e}", file=sys.stderr)
 
         conn.close()
-        return json.dumps({'Type': 'Images', 'Content': {'Grid': grid, 'GridH': gridH, 'Hero': heroImage, 'Logo': logo}})
-        
-    def get_game_info(self, store, id):
-        
-        url = f"https://gamesdb.gog.com/platforms/{self.storeName.lower()}/external_releases/{id}"
-        headers = {'User-Agent': 'Mozilla/5.0'}
+        return images
+
+    def get_image_content(self, images):
+        return {slot: images.get(img_type) for img_type, (slot, _) in self.image_slots.items()}
+
+    def get_base64_images(self, game_id, image_prefix="", url_encode=False):
+        images = self.resolve_images([game_id]).get(game_id, {})
+        return json.dumps({'Type': 'Images', 'Content': self.get_image_content(images)})
+
+    def get_batch_images(self, game_ids):
+        """Artwork for many games at once, e.g. when adding a whole library to
+        Steam. Waits for every download rather than cutting slow ones off."""
+        game_ids = list(dict.fromkeys(game_ids))
+        images = self.resolve_images(game_ids, wait=True)
+        return json.dumps({'Type': 'BatchImages', 'Content': {
+            'Images': {game_id: self.get_image_content(images.get(game_id, {})) for game_id in game_ids}}})
+
+    def get_game_info_url(self, id):
+        return f"https://gamesdb.gog.com/platforms/{self.storeName.lower()}/external_releases/{id}"
+
+    def fetch_game_info(self, id, defer=False):
+        """The game's gamesdb record, revalidated against the one fetched last
+        time; not_modified is set on the response when it hasn't changed.
+        With defer set the new validators are left in response.cache_entry
+        for the caller to store once the record is."""
+        url = self.get_game_info_url(id)
         print( url, file=sys.stderr)
-        req = urllib.request.Request(url, headers=headers)
-        response = urllib.request.urlopen(req, timeout=60)
-        data = response.read()
-        json_data = json.loads(data)
+        return HttpClient.get_cached(url, timeout=60, defer=defer)
+
+    def has_game(self, id):
+        conn = self.get_connection()
+        try:
+            return conn.execute("SELECT 1 FROM Game WHERE ShortName=?", (id,)).fetchone() is not None
+        finally:
+            conn.close()
+
+    def get_game_info(self, store, id, response=None):
+        
+        if response is None:
+            response = self.fetch_game_info(id)
+        json_data = response.json()
         
         if json_data.get('error'):
             print(f"Error getting game info for {id}: {json_data['error']}", file=sys.stderr)
@@ -224,76 +324,269 @@ class GamesDb(GameSet.GameSet):
         
             
         return game_data, images
+
+    def get_ids_to_fetch(self, id_list):
+        """The ids whose gamesdb record needs fetching: those never fetched or
+        whose Game row has gone, plus up to metadata_refresh_batch of the
+        stale ones. Ids with an unexpired MetadataMiss are left out. Returns
+        (ids, {id: (stored hash, HasGame)}, ids with an expired MetadataMiss).
+
+        The stale ids are split into slices of at most metadata_refresh_batch
+        and each metadata_ttl is divided between the slices, so every stale id
+        is asked again about once per metadata_ttl without a write to say so."""
+        conn = self.get_connection()
+        try:
+            rows = conn.execute("""SELECT ids.value, GameMetadata.Hash, GameMetadata.HasGame,
+                    GameMetadata.Fetched, Game.id, MetadataMiss.Expires
+                FROM (SELECT DISTINCT value FROM json_each(?)) AS ids
+                LEFT JOIN GameMetadata ON GameMetadata.ShortName = ids.value
+                LEFT JOIN Game ON Game.ShortName = ids.value
+                LEFT JOIN MetadataMiss ON MetadataMiss.ShortName = ids.value""",
+                (json.dumps(list(id_list)),)).fetchall()
+        finally:
+            conn.close()
+        new_ids = []
+        stale = []
+        hashes = {}
+        misses = set()
+        missed = 0
+        now = time.time()
+        cutoff = now - self.metadata_ttl
+        for id, hash, has_game, fetched, game_id, miss_expires in rows:
+            if miss_expires is not None:
+                if miss_expires > now:
+                    missed += 1
+                    continue
+                misses.add(id)
+            if fetched is None or (has_game and game_id is None):
+                new_ids.append(id)
+                continue
+            hashes[id] = (hash, has_game)
+            if fetched < cutoff:
+                stale.append(id)
+        stale.sort()
+        slices = -(-len(stale) // self.metadata_refresh_batch)
+        stale_ids = []
+        if slices:
+            turn = int(now / (self.metadata_ttl / slices)) % slices
+            stale_ids = stale[turn::slices]
+        print(f"Metadata: {len(new_ids)} new, {len(stale_ids)} of {len(stale)} stale, "
+              f"{len(rows) - len(new_ids) - len(stale) - missed} current, {missed} known misses", file=sys.stderr)
+        return new_ids + stale_ids, hashes, misses
+
+    def record_metadata_misses(self, misses, ttl=None):
+        """Records (id, reason) pairs for ids with no usable gamesdb record,
+        so refreshes skip both the fetch and the store's fallback for them
+        until the miss expires. A miss in a row waits twice as long as the
+        last, up to metadata_max_miss_ttl; ttl sets the wait instead, for
+        verdicts that won't change soon."""
+        if not misses:
+            return
+        now = time.time()
+        with self.transaction() as conn:
+            c = conn.cursor()
+            c.execute("SELECT ShortName, Misses FROM MetadataMiss WHERE ShortName IN (SELECT value FROM json_each(?))",
+                      (json.dumps([id for id, _ in misses]),))
+            counts = dict(c.fetchall())
+            rows = []
+            for id, reason in misses:
+                count = counts.get(id, -1) + 1
+                wait = ttl or min(self.metadata_miss_ttl * 2 ** count, self.metadata_max_miss_ttl)
+                rows.append((id, reason, count, now + wait))
+            c.executemany("INSERT OR REPLACE INTO MetadataMiss (ShortName, Reason, Misses, Expires) VALUES (?, ?, ?, ?)",
+                          rows)
+
+    def write_metadata(self, conn, items, misses=()):
+        """Applies a batch of fetched gamesdb records in the caller's
+        transaction, one statement per kind of change. Items are (kind, id,
+        hash, data): 'game' with data (game_data, images), 'other' for a
+        record that isn't a game and 'unchanged' with data its HasGame, for a
+        record whose Game row predates GameMetadata. misses are the ids with
+        a MetadataMiss row to drop. Returns (inserted, updated, removed) Game
+        row counts."""
+        c = conn.cursor()
+        parsed = [item for item in items if item[0] != 'unchanged']
+        c.execute("SELECT ShortName, id FROM Game WHERE ShortName IN (SELECT value FROM json_each(?))",
+                  (json.dumps([id for _, id, _, _ in parsed]),))
+        existing = dict(c.fetchall())
+
+        removed = [(existing[id],) for kind, id, _, _ in parsed if kind == 'other' and id in existing]
+        if removed:
+            c.executemany("DELETE FROM Images WHERE GameID=?", removed)
+            c.executemany("DELETE FROM BatFiles WHERE GameID=?", removed)
+            c.executemany("DELETE FROM ZipFiles WHERE GameID=?", removed)
+            c.executemany("DELETE FROM Game WHERE id=?", removed)
+
+        games = [(id, data) for kind, id, _, data in parsed if kind == 'game']
+        inserted = updated = 0
+        if games:
+            # get_game_info always returns the same keys
+            keys = list(games[0][1][0].keys())
+            new_games = [list(game_data.values()) for id, (game_data, _) in games if id not in existing]
+            if new_games:
+                c.executemany(f"INSERT INTO Game ({', '.join(keys)}) VALUES ({', '.join('?' for _ in keys)})", new_games)
+                inserted = len(new_games)
+            # Rows whose values are all unchanged are matched but not written
+            old_games = [list(game_data.values()) + [existing[id]] + list(game_data.values())
+                         for id, (game_data, _) in games if id in existing]
+            if old_games:
+                c.executemany(f"""UPDATE Game SET {', '.join(f'{key}=?' for key in keys)}
+                    WHERE id=? AND NOT ({' AND '.join(f'{key} IS ?' for key in keys)})""", old_games)
+                updated = c.rowcount
+            c.execute("SELECT ShortName, id FROM Game WHERE ShortName IN (SELECT value FROM json_each(?))",
+                      (json.dumps([game_data['ShortName'] for _, (game_data, _) in games]),))
+            game_ids = dict(c.fetchall())
+            c.execute("SELECT DISTINCT GameID FROM Images WHERE GameID IN (SELECT value FROM json_each(?))",
+                      (json.dumps(list(game_ids.values())),))
+            with_images = {row[0] for row in c.fetchall()}
+            # Images are only added for games that have none yet
+            image_rows = []
+            for _, (game_data, images) in games:
+                game_id = game_ids.get(game_data['ShortName'])
+                if game_id is None or game_id in with_images:
+                    continue
+                with_images.add(game_id)
+                image_rows.extend((game_id, image['ImagePath'], image['FileName'], image['SortOrder'], image['Type'])
+                                  for image in images)
+            if image_rows:
+                c.executemany("INSERT INTO Images (GameID, ImagePath, FileName, SortOrder, Type) VALUES (?, ?, ?, ?, ?)",
+                              image_rows)
+
+        now = time.time()
+        c.executemany("INSERT OR REPLACE INTO GameMetadata (ShortName, Hash, HasGame, Fetched) VALUES (?, ?, ?, ?)",
+                      [(id, hash, data if kind == 'unchanged' else int(kind == 'game'), now)
+                       for kind, id, hash, data in items])
+        # Found after all
+        found = [(id,) for _, id, _, _ in items if id in misses]
+        if found:
+            c.executemany("DELETE FROM MetadataMiss WHERE ShortName=?", found)
+        return inserted, updated, len(removed)
+
     def insert_data(self, id_list):
+        """Fetches gamesdb metadata for the ids that need it and stores it.
+        Returns the ids that couldn't be fetched or stored, for the store's
+        own fallback, and (id, reason) for those gamesdb doesn't have. The
+        store passes the latter to record_metadata_misses() once its fallback
+        has stored them, so a failed fallback is retried next refresh. Ids
+        that failed for a passing reason (network, 429, 5xx) are left out;
+        with no GameMetadata row they are fetched next refresh.
+
+        fetch_workers threads fetch and parse records and queue them; one
+        writer thread applies them write_batch at a time, each batch one
+        transaction, so the fetchers never wait on the write lock."""
         unprocessed_games = []
+        deferred_games = []
+        # (id, reason) of the ids gamesdb doesn't have
+        missing_games = []
+        id_list, hashes, misses = self.get_ids_to_fetch(id_list)
+        results = queue.Queue()
+        # id -> validators to cache once its record is written
+        cache_entries = {}
+        stats = {'unchanged': 0, 'written': 0, 'inserted': 0, 'updated': 0, 'removed': 0,
+                 'transactions': 0, 'lock_wait': 0.0, 'write_time': 0.0}
+        started = time.monotonic()
+
         def process_game(id):
-            conn = self.get_connection()
-            c = conn.cursor()
+            store = self.storeName
             try:
-                c.execute("SELECT id FROM Game WHERE ShortName=?", (id,))
-                result = c.fetchone()
-                # print(f"Result: {result}", file=sys.stderr)
-                store = self.storeName
-                # print(f"Processing game {id} from {store}", file=sys.stderr)
-                try:
-                    game_data,images = self.get_game_info(store.lower(), id)
-                except Exception as e:
-                    print(f"Error getting metadata for game: {id} {e}", file=sys.stderr)
-                    traceback.print_exc()
-                    unprocessed_games.append(id)
+                response = self.fetch_game_info(id, defer=True)
+                cache_entries[id] = response.cache_entry
+                hash = hashlib.sha256(response.body).hexdigest()
+                if id in hashes and hashes[id][0] == hash:
+                    # Same record as the one already stored, nothing to parse or write
+                    results.put(('unchanged', id, hash, hashes[id][1]))
                     return
-                if game_data is None:
-                    if result is not None:
-                        c.execute("DELETE FROM Images WHERE GameID=?", (result[0],))
-                        c.execute("DELETE FROM BatFiles WHERE GameID=?", (result[0],))
-                        c.execute("DELETE FROM ZipFiles WHERE GameID=?", (result[0],))
-                        c.execute("DELETE FROM Game WHERE id=?", (result[0],))
-                        conn.commit()
+                if response.not_modified and id not in hashes and self.has_game(id):
+                    # Stored before GameMetadata was kept
+                    results.put(('unchanged', id, hash, 1))
                     return
-                # print(f"Game data: {game_data}", file=sys.stderr)
-                game_id = None
-                key_count = len(game_data.keys())
-                placeholders = ', '.join(['?' for _ in range(key_count)])
-                if result is None:
-                    
-                    
-                    # print(f"Inserting game {game_data["Title"]} into database: {game_data}", file=sys.stderr)
-                    
-                    query = f"INSERT INTO Game ({', '.join(list(game_data.keys()))}) VALUES ({placeholders})"
-                    c.execute(query, list(game_data.values()))
-
-                    game_id = c.lastrowid
-                    conn.commit()
-                else:
-                    game_id = result[0]    
-                    #update game
-                    query = f"UPDATE Game SET {', '.join([f'{key}=?' for key in game_data.keys()])} WHERE id=?"
-                    c.execute(query, list(game_data.values()) + [game_id])
-                    conn.commit()
-
-                # Insert images into the Images table
-                c.execute("DELETE FROM Images WHERE Type is null")
-                
-                c.execute("select count(1) from Images where GameID=?", (game_id,))
-                count = c.fetchone()[0]
-                if count == 0:
-                    if images:
-                        for image in images:
-                            try:
-                                c.execute("INSERT INTO Images (GameID, ImagePath, FileName, SortOrder, Type) VALUES (?, ?, ?, ?, ?)", (game_id, image['ImagePath'], image['FileName'], image['SortOrder'], image['Type']))
-                                conn.commit()
-                            except Exception as e:
-                                path = image["ImagePath"]
-                                print(f"Error inserting image into database: {e}, {path}", file=sys.stderr)    
-                conn.commit()
-
+                game_data,images = self.get_game_info(store.lower(), id, response)
             except Exception as e:
-                print(f"Error parsing metadata for game: {id} {e}", file=sys.stderr)
-                unprocessed_games.append(id)
+                if HttpClient.is_transient(e):
+                    # Not a leftover, gamesdb may well have it
+                    print(f"Deferring metadata for game: {id} {e}", file=sys.stderr)
+                    deferred_games.append(id)
+                    return
+                if isinstance(e, urllib.error.HTTPError) and e.code in (404, 410):
+                    print(f"Not in gamesdb: {id}", file=sys.stderr)
+                    missing_games.append((id, "not in gamesdb"))
+                    unprocessed_games.append(id)
+                    return
+                print(f"Error getting metadata for game: {id} {e}", file=sys.stderr)
                 traceback.print_exc()
+                HttpClient.forget(self.get_game_info_url(id))
+                unprocessed_games.append(id)
+                return
+            if game_data is None:
+                results.put(('other', id, hash, None))
+            else:
+                results.put(('game', id, hash, (game_data, images)))
 
-            conn.close()
-        with concurrent.futures.ThreadPoolExecutor(max_workers=40) as executor:
-            executor.map(process_game, id_list)
+        def write(items):
+            # Records identical to the stored ones need no write, and when
+            # that's all of them there is no transaction either
+            changed = [item for item in items if item[0] != 'unchanged' or item[1] not in hashes]
+            stats['unchanged'] += len(items) - len(changed)
+            if changed:
+                begin = time.monotonic()
+                with self.transaction() as conn:
+                    stats['lock_wait'] += time.monotonic() - begin
+                    if not stats['transactions']:
+                        # Once per refresh that writes anything, not once per game
+                        conn.execute("DELETE FROM Images WHERE Type is null")
+                    inserted, updated, removed = self.write_metadata(conn, changed, misses)
+                stats['write_time'] += time.monotonic() - begin
+                stats['transactions'] += 1
+                stats['written'] += len(changed)
+                stats['inserted'] += inserted
+                stats['updated'] += updated
+                stats['removed'] += removed
+            # Only once the records are stored, and from this thread too so the
+            # fetchers never write the cache
+            HttpClient.store_validators([cache_entries.pop(item[1], None) for item in items])
+
+        def writer():
+            done = False
+            while not done:
+                items = [results.get()]
+                while len(items) < self.write_batch:
+                    try:
+                        items.append(results.get_nowait())
+                    except queue.Empty:
+                        break
+                if items[-1] is None:
+                    items.pop()
+                    done = True
+                if not items:
+                    continue
+                try:
+                    write(items)
+                except Exception as e:
+                    print(f"Error writing metadata batch, retrying one game at a time: {e}", file=sys.stderr)
+                    for item in items:
+                        try:
+                            write([item])
+                        except Exception as e:
+                            print(f"Error parsing metadata for game: {item[1]} {e}", file=sys.stderr)
+                            traceback.print_exc()
+                            unprocessed_games.append(item[1])
+
+        write_thread = threading.Thread(target=writer, name="GamesDbWriter")
+        write_thread.start()
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.fetch_workers) as executor:
+                executor.map(process_game, id_list)
+        finally:
+            results.put(None)
+            write_thread.join()
+        elapsed = time.monotonic() - started
+        print(f"Metadata refresh: {len(id_list)} fetched in {elapsed:.1f}s "
+              f"({len(id_list) / elapsed if elapsed else 0:.1f}/s), {stats['unchanged']} unchanged, {stats['written']} written "
+              f"({stats['inserted']} inserted, {stats['updated']} updated, {stats['removed']} removed) "
+              f"in {stats['transactions']} transactions taking {stats['write_time']:.2f}s, "
+              f"lock wait {stats['lock_wait']:.2f}s, {len(deferred_games)} deferred, {len(missing_games)} not in gamesdb", file=sys.stderr)
+        limiter = RateLimiter.get_limiter(urllib.parse.urlsplit(self.get_game_info_url('')).hostname)
+        if limiter:
+            print(limiter.describe(), file=sys.stderr)
         print(f"Unprocessed games: {unprocessed_games}", file=sys.stderr)
-        return unprocessed_games
+        return unprocessed_games, missing_games
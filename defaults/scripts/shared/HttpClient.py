@@ -0,0 +1,398 @@
+"""Pooled HTTP client for the store scripts.
+
+urllib.request opens a new connection, and does a new TLS handshake, for
+every request. Here connections are kept alive and reused per host for the
+life of the process, so a metadata sync over thousands of games pays for a
+handful of handshakes. Responses are decompressed (gzip/deflate), redirects
+are followed, and idempotent requests are retried with backoff on connection
+errors and 429/5xx answers. Requests to the API hosts in RateLimiter.HOSTS
+go through that host's shared limiter.
+
+Errors look like urllib's: a status >= 400 raises urllib.error.HTTPError,
+so callers that check e.code keep working.
+
+    response = HttpClient.get(url, headers={'Authorization': ...}, timeout=10)
+    data = response.json()
+
+get_cached() also remembers each response's ETag/Last-Modified and body in
+<runtime dir>/http_cache.db and makes the next request for the URL
+conditional. On a 304 the cached body is returned with not_modified set, so
+callers can skip work for data that hasn't changed. Callers making many
+requests can defer the cache write and store a batch at once with
+store_validators().
+"""
+import email.utils
+import gzip
+import http.client
+import io
+import json
+import os
+import ssl
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import zlib
+
+import Database
+import RateLimiter
+
+DEFAULT_TIMEOUT = 30
+USER_AGENT = 'Mozilla/5.0'
+# Extra attempts after the first, waiting BACKOFF * 2**attempt seconds between
+RETRIES = 2
+BACKOFF = 0.5
+# Longest Retry-After we are willing to sleep through
+MAX_RETRY_AFTER = 10
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS')
+MAX_REDIRECTS = 5
+# Idle connections kept per host
+MAX_IDLE = 8
+
+
+class Response:
+    def __init__(self, url, status, reason, headers, body):
+        self.url = url
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+        # Answered from the validator cache after a 304
+        self.not_modified = False
+        # Set by get_cached(), see there
+        self.cache_entry = None
+
+    def read(self):
+        return self.body
+
+    def text(self, encoding='utf-8'):
+        return self.body.decode(encoding)
+
+    def json(self):
+        return json.loads(self.body)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def decode_body(headers, body):
+    encoding = (headers.get('Content-Encoding') or '').lower().strip()
+    if encoding == 'gzip':
+        return gzip.decompress(body)
+    if encoding == 'deflate':
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            # Some servers send raw deflate without the zlib header
+            return zlib.decompress(body, -zlib.MAX_WBITS)
+    return body
+
+
+def get_retry_after(headers):
+    """Seconds asked for by a Retry-After header (delay or HTTP date), or None."""
+    value = (headers.get('Retry-After') or '').strip()
+    if value.isdigit():
+        return int(value)
+    try:
+        return max(0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_transient(error):
+    """Whether a request error may go away on its own: a connection failure,
+    a timeout, or an overloaded or throttling server."""
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code in RETRY_STATUSES
+    return isinstance(error, OSError)
+
+
+class HttpClient:
+    def __init__(self, max_idle=MAX_IDLE):
+        self.max_idle = max_idle
+        self.idle = {}  # (scheme, host, port) -> [connection, ...]
+        self.lock = threading.Lock()
+        self.ssl_context = ssl.create_default_context()
+        self.connections_opened = 0
+
+    def get_connection(self, key, timeout):
+        with self.lock:
+            pool = self.idle.get(key)
+            if pool:
+                conn = pool.pop()
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+            self.connections_opened += 1
+        scheme, host, port = key
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host, port, timeout=timeout, context=self.ssl_context), False
+        return http.client.HTTPConnection(host, port, timeout=timeout), False
+
+    def release(self, key, conn):
+        with self.lock:
+            pool = self.idle.setdefault(key, [])
+            if len(pool) < self.max_idle:
+                pool.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        with self.lock:
+            pools, self.idle = self.idle, {}
+        for pool in pools.values():
+            for conn in pool:
+                conn.close()
+
+    def send(self, method, url, body, headers, timeout):
+        """One request and response on a pooled connection, no retries."""
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise ValueError(f"unsupported url: {url}")
+        key = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80))
+        path = urllib.parse.urlunsplit(('', '', parts.path or '/', parts.query, ''))
+        headers = {'User-Agent': USER_AGENT, 'Accept-Encoding': 'gzip, deflate', **headers}
+        while True:
+            conn, reused = self.get_connection(key, timeout)
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if reused:
+                    # The server dropped an idle keep-alive connection, not a
+                    # real failure; try again on a new one
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                self.release(key, conn)
+            return response.status, response.reason, response.headers, data
+
+    def request(self, method, url, body=None, headers=None, timeout=DEFAULT_TIMEOUT, retries=None):
+        """Sends the request, following redirects. Returns a Response for a
+        2xx/3xx answer and raises urllib.error.HTTPError for >= 400. Failed
+        attempts are retried for idempotent methods unless retries is given."""
+        method = method.upper()
+        headers = dict(headers or {})
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        if retries is None:
+            retries = RETRIES if method in IDEMPOTENT_METHODS else 0
+        for redirect in range(MAX_REDIRECTS + 1):
+            limiter = RateLimiter.get_limiter(urllib.parse.urlsplit(url).hostname)
+            for attempt in range(retries + 1):
+                started = limiter.acquire() if limiter else None
+                try:
+                    status, reason, response_headers, data = self.send(method, url, body, headers, timeout)
+                except OSError as e:
+                    if limiter:
+                        limiter.release(started, error=True)
+                    if attempt == retries:
+                        raise
+                    delay = BACKOFF * 2 ** attempt
+                    print(f"HTTP {method} {url} failed ({e}), retrying in {delay:.1f}s", file=sys.stderr)
+                    time.sleep(delay)
+                    continue
+                except Exception:
+                    if limiter:
+                        limiter.release(started, error=True)
+                    raise
+                retry_after = get_retry_after(response_headers) if status in (429, 503) else None
+                if limiter:
+                    limiter.release(started, error=status in RETRY_STATUSES, retry_after=retry_after)
+                if status in RETRY_STATUSES and attempt < retries:
+                    delay = BACKOFF * 2 ** attempt
+                    if retry_after is not None:
+                        delay = max(delay, min(retry_after, MAX_RETRY_AFTER))
+                    print(f"HTTP {method} {url} returned {status}, retrying in {delay:.1f}s", file=sys.stderr)
+                    time.sleep(delay)
+                    continue
+                break
+            if status in (301, 302, 303, 307, 308) and response_headers.get('Location'):
+                url = urllib.parse.urljoin(url, response_headers['Location'])
+                if status == 303 or (status in (301, 302) and method == 'POST'):
+                    method, body = 'GET', None
+                    headers.pop('Content-Type', None)
+                continue
+            data = decode_body(response_headers, data)
+            if status >= 400:
+                raise urllib.error.HTTPError(url, status, reason, response_headers, io.BytesIO(data))
+            return Response(url, status, reason, response_headers, data)
+        raise urllib.error.HTTPError(url, status, "Too many redirects", response_headers, io.BytesIO(data))
+
+
+class ValidatorCache:
+    """The validators (ETag, Last-Modified) and body of the last response
+    for each URL, bodies zlib-compressed."""
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self.ready = False
+
+    def get_connection(self):
+        conn = Database.connect(self.db_file)
+        if not self.ready:
+            with Database.transaction(conn):
+                conn.execute("""CREATE TABLE IF NOT EXISTS Responses (
+                    Url TEXT PRIMARY KEY, ETag TEXT, LastModified TEXT,
+                    Body BLOB NOT NULL, Updated REAL NOT NULL)""")
+            self.ready = True
+        return conn
+
+    def get_validators(self, url):
+        """(etag, last_modified) of the cached response, or None."""
+        conn = self.get_connection()
+        try:
+            return conn.execute("SELECT ETag, LastModified FROM Responses WHERE Url=?", (url,)).fetchone()
+        finally:
+            conn.close()
+
+    def get_body(self, url):
+        conn = self.get_connection()
+        try:
+            row = conn.execute("SELECT Body FROM Responses WHERE Url=?", (url,)).fetchone()
+        finally:
+            conn.close()
+        return zlib.decompress(row[0]) if row is not None else None
+
+    def get(self, url):
+        """(etag, last_modified, body) of the cached response, or None."""
+        conn = self.get_connection()
+        try:
+            row = conn.execute("SELECT ETag, LastModified, Body FROM Responses WHERE Url=?", (url,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return row[0], row[1], zlib.decompress(row[2])
+
+    def put(self, url, headers, body):
+        self.put_many([(url, headers, body)])
+
+    def put_many(self, entries):
+        """Stores (url, headers, body) responses in one transaction."""
+        if not entries:
+            return
+        rows = []
+        deleted = []
+        for url, headers, body in entries:
+            etag = headers.get('ETag')
+            last_modified = headers.get('Last-Modified')
+            if not etag and not last_modified:
+                # Nothing to revalidate with, don't keep the body
+                deleted.append((url,))
+            else:
+                rows.append((url, etag, last_modified, zlib.compress(body), time.time()))
+        conn = self.get_connection()
+        try:
+            with Database.transaction(conn):
+                conn.executemany("DELETE FROM Responses WHERE Url=?", deleted)
+                conn.executemany("INSERT OR REPLACE INTO Responses (Url, ETag, LastModified, Body, Updated) VALUES (?, ?, ?, ?, ?)",
+                                 rows)
+        finally:
+            conn.close()
+
+    def delete(self, url):
+        conn = self.get_connection()
+        try:
+            with Database.transaction(conn):
+                conn.execute("DELETE FROM Responses WHERE Url=?", (url,))
+        finally:
+            conn.close()
+
+
+def get_conditional_headers(entry):
+    """If-None-Match/If-Modified-Since for a ValidatorCache entry."""
+    headers = {}
+    if entry is not None:
+        etag, last_modified, _ = entry
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+    return headers
+
+
+def get_validator_cache(runtime_dir=None):
+    runtime_dir = runtime_dir or os.environ.get('DECKY_PLUGIN_RUNTIME_DIR', '')
+    if not runtime_dir:
+        return None
+    return ValidatorCache(os.path.join(runtime_dir, "http_cache.db"))
+
+
+# One client, and so one set of pools, per process
+default_client = HttpClient()
+validator_cache = None
+
+
+def request(method, url, body=None, headers=None, timeout=DEFAULT_TIMEOUT, retries=None):
+    return default_client.request(method, url, body, headers, timeout, retries)
+
+
+def get(url, headers=None, timeout=DEFAULT_TIMEOUT, retries=None):
+    return default_client.request('GET', url, None, headers, timeout, retries)
+
+
+def post(url, body=None, headers=None, timeout=DEFAULT_TIMEOUT, retries=None):
+    return default_client.request('POST', url, body, headers, timeout, retries)
+
+
+def get_cached(url, headers=None, timeout=DEFAULT_TIMEOUT, retries=None, defer=False):
+    """A conditional GET through the validator cache. Works like get() when
+    there is no runtime dir to keep the cache in.
+
+    The response is only written to the cache when its validators changed.
+    With defer set it isn't written at all; response.cache_entry is then
+    what to pass to store_validators(), or None if there is nothing new."""
+    global validator_cache
+    if validator_cache is None:
+        validator_cache = get_validator_cache()
+    if validator_cache is None:
+        return get(url, headers, timeout, retries)
+    validators = validator_cache.get_validators(url)
+    conditional = get_conditional_headers((*validators, None) if validators else None)
+    response = get(url, {**(headers or {}), **conditional}, timeout, retries)
+    if response.status == 304 and validators is not None:
+        body = validator_cache.get_body(url)
+        if body is not None:
+            response.body = body
+            response.not_modified = True
+            return response
+        # Dropped since we looked, ask again in full
+        response = get(url, headers, timeout, retries)
+        validators = None
+    new_validators = (response.headers.get('ETag'), response.headers.get('Last-Modified'))
+    if tuple(validators or (None, None)) == new_validators:
+        # Same validators, the stored body (if any) is this one
+        return response
+    response.cache_entry = (url, response.headers, response.body)
+    if not defer:
+        validator_cache.put(*response.cache_entry)
+    return response
+
+
+def store_validators(entries):
+    """Writes the cache_entry of responses fetched with defer set, in one
+    transaction."""
+    entries = [entry for entry in entries if entry is not None]
+    if entries and validator_cache is not None:
+        validator_cache.put_many(entries)
+
+
+def forget(url):
+    """Drops url from the validator cache, e.g. when its body couldn't be
+    used, so the next get_cached() fetches it in full."""
+    if validator_cache is not None:
+        validator_cache.delete(url)
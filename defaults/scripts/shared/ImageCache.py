@@ -0,0 +1,174 @@
+"""Artwork cache shared by the store scripts and the plugin.
+
+Images are fetched once and kept under <runtime dir>/images, each file named
+by the sha256 of its bytes, so the same picture behind several URLs is stored
+once. index.db maps the URLs fetched to those files and records when each
+file was last used; when the cache grows past its cap the least recently used
+files go first. The plugin serves the files at /images/<hash> on its local
+web server, so artwork is read from disk after the first fetch instead of
+being downloaded and passed around as base64 every time.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+import sys
+import tempfile
+import time
+
+import Database
+import HttpClient
+
+MAX_BYTES = 512 * 1024 * 1024
+# Evicting down to a bit under the cap, so the next few stores don't evict again
+EVICT_TO = 0.9
+FETCH_TIMEOUT = 15
+# LastUsed is only rewritten once it is older than this, so serving a grid
+# of artwork doesn't take a write lock per tile
+TOUCH_INTERVAL = 3600
+ROUTE = "/images/"
+
+key_pattern = re.compile(r"^[0-9a-f]{64}$")
+
+
+def get_cache_dir(runtime_dir=None):
+    runtime_dir = runtime_dir or os.environ.get('DECKY_PLUGIN_RUNTIME_DIR', '')
+    if not runtime_dir:
+        return None
+    return os.path.join(runtime_dir, "images")
+
+
+def is_key(key):
+    return bool(key_pattern.match(key or ""))
+
+
+class ImageCache:
+    def __init__(self, cache_dir, max_bytes=MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_file = os.path.join(cache_dir, "index.db")
+        self.ready = False
+
+    def get_connection(self):
+        if not self.ready:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        conn = Database.connect(self.index_file)
+        if not self.ready:
+            with Database.transaction(conn):
+                conn.execute("""CREATE TABLE IF NOT EXISTS Files (
+                    Hash TEXT PRIMARY KEY, Size INTEGER NOT NULL,
+                    ContentType TEXT, LastUsed REAL NOT NULL)""")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_files_last_used ON Files (LastUsed)")
+                conn.execute("CREATE TABLE IF NOT EXISTS Urls (Url TEXT PRIMARY KEY, Hash TEXT NOT NULL)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_urls_hash ON Urls (Hash)")
+            self.ready = True
+        return conn
+
+    def get_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def lookup(self, url):
+        """The key of url's cached file, or None if it has to be fetched."""
+        conn = self.get_connection()
+        try:
+            row = conn.execute("""SELECT Urls.Hash, Files.LastUsed FROM Urls
+                LEFT JOIN Files ON Files.Hash = Urls.Hash WHERE Url=?""", (url,)).fetchone()
+            if row is None:
+                return None
+            if not os.path.exists(self.get_path(row[0])):
+                # Removed behind our back, fetch it again
+                with Database.transaction(conn):
+                    conn.execute("DELETE FROM Urls WHERE Hash=?", (row[0],))
+                    conn.execute("DELETE FROM Files WHERE Hash=?", (row[0],))
+                return None
+            self.touch(row[0], conn, row[1])
+            return row[0]
+        finally:
+            conn.close()
+
+    def touch(self, key, conn=None, last_used=None):
+        """Marks the file used now. Skipped when last_used, the LastUsed the
+        caller read, is recent enough for the LRU order."""
+        if last_used is not None and time.time() - last_used < TOUCH_INTERVAL:
+            return
+        own = conn is None
+        conn = conn or self.get_connection()
+        try:
+            with Database.transaction(conn):
+                conn.execute("UPDATE Files SET LastUsed=? WHERE Hash=?", (time.time(), key))
+        finally:
+            if own:
+                conn.close()
+
+    def store(self, url, data, content_type=None):
+        key = hashlib.sha256(data).hexdigest()
+        path = self.get_path(key)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Written aside and renamed, so a reader never sees half a file.
+            # Each writer gets its own temp file, other threads may be
+            # storing the same bytes from another url
+            with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix=".tmp", delete=False) as f:
+                f.write(data)
+            os.replace(f.name, path)
+        content_type = content_type or mimetypes.guess_type(url)[0]
+        conn = self.get_connection()
+        try:
+            with Database.transaction(conn):
+                conn.execute("INSERT OR REPLACE INTO Files (Hash, Size, ContentType, LastUsed) VALUES (?, ?, ?, ?)",
+                             (key, len(data), content_type, time.time()))
+                conn.execute("INSERT OR REPLACE INTO Urls (Url, Hash) VALUES (?, ?)", (url, key))
+            self.evict(conn)
+        finally:
+            conn.close()
+        return key
+
+    def fetch(self, url, timeout=FETCH_TIMEOUT):
+        """Returns the key of url's image, downloading it on a miss."""
+        key = self.lookup(url)
+        if key is not None:
+            return key
+        response = HttpClient.get(url, timeout=timeout)
+        content_type = response.headers.get_content_type() if 'Content-Type' in response.headers else None
+        return self.store(url, response.read(), content_type)
+
+    def open(self, key):
+        """(path, content type) of a cached file, or None. Counts as a use."""
+        if not is_key(key):
+            return None
+        conn = self.get_connection()
+        try:
+            row = conn.execute("SELECT ContentType, LastUsed FROM Files WHERE Hash=?", (key,)).fetchone()
+            path = self.get_path(key)
+            if row is None or not os.path.exists(path):
+                return None
+            self.touch(key, conn, row[1])
+            return path, row[0] or "application/octet-stream"
+        finally:
+            conn.close()
+
+    def evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(Size), 0) FROM Files").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * EVICT_TO
+        evicted = []
+        for key, size in conn.execute("SELECT Hash, Size FROM Files ORDER BY LastUsed").fetchall():
+            if total <= target:
+                break
+            evicted.append(key)
+            total -= size
+        with Database.transaction(conn):
+            conn.executemany("DELETE FROM Urls WHERE Hash=?", [(key,) for key in evicted])
+            conn.executemany("DELETE FROM Files WHERE Hash=?", [(key,) for key in evicted])
+        for key in evicted:
+            try:
+                os.remove(self.get_path(key))
+            except OSError:
+                pass
+        print(f"Image cache: evicted {len(evicted)} files", file=sys.stderr)
+
+
+def get_image_cache(runtime_dir=None):
+    cache_dir = get_cache_dir(runtime_dir)
+    return ImageCache(cache_dir) if cache_dir else None
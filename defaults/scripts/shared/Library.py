@@ -0,0 +1,176 @@
+"""Read-only view over every store's database at once.
+
+Each store keeps its own sqlite file with the same Game/Images schema. A
+Library attaches all of them to one connection and exposes their Game tables
+as a single temp view, Library, with a Store column. Searching or totalling
+the whole library is then one query rather than a connection per store. The
+store databases stay the only copy of the data, so there is nothing to keep
+in sync.
+"""
+import json
+import os
+import sqlite3
+import sys
+
+import Database
+import GameSet
+
+# Store (the platform name the scripts use) -> database file in the runtime dir
+STORES = {
+    "GOG": "gog.db",
+    "Epic": "epic.db",
+    "Amazon": "amazon.db",
+    "Itchio": "itchio.db",
+}
+
+# Names shown to the user where they differ from the store name
+TITLES = {
+    "Itchio": "itch.io",
+}
+
+# Game columns the view exposes, stores missing one (not migrated yet) give NULL
+COLUMNS = ["id", "ShortName", "Title", "SortingTitle", "SteamClientID", "Size", "SizeBytes",
+           "InstallPath", "RootFolder", "Developer", "Publisher", "Genre"]
+
+
+class Library:
+    page_size = 100
+
+    def __init__(self, runtime_dir):
+        self.runtime_dir = runtime_dir
+        self.conn = None
+        # Store -> schema name, for the stores currently attached
+        self.schemas = {}
+        self.search_indexes = set()
+
+    def get_store_files(self):
+        files = {}
+        for store, db_file in STORES.items():
+            path = os.path.join(self.runtime_dir, db_file)
+            if os.path.exists(path):
+                files[store] = path
+        return files
+
+    def get_connection(self):
+        """Returns the shared connection, re-attaching when a store's database
+        has appeared since it was opened."""
+        files = self.get_store_files()
+        if self.conn is not None and set(files) == set(self.schemas):
+            return self.conn
+        self.close()
+        conn = sqlite3.connect(":memory:", uri=True, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout={Database.BUSY_TIMEOUT_MS};")
+        branches = []
+        for n, (store, path) in enumerate(files.items()):
+            schema = f"store{n}"
+            try:
+                # Read only, the store scripts are the writers
+                conn.execute("ATTACH DATABASE ? AS " + schema, (f"file:{path}?mode=ro",))
+                columns = {row[1] for row in conn.execute(f"PRAGMA {schema}.table_info(Game)")}
+                if not columns:
+                    conn.execute(f"DETACH DATABASE {schema}")
+                    continue
+            except sqlite3.Error as e:
+                print(f"Library: skipping {store} ({path}): {e}", file=sys.stderr)
+                continue
+            self.schemas[store] = schema
+            if conn.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE type='table' AND name='GameSearch'").fetchone():
+                self.search_indexes.add(store)
+            select = ", ".join(col if col in columns else f"NULL AS {col}" for col in COLUMNS)
+            branches.append(f"SELECT '{store}' AS Store, {select} FROM {schema}.Game")
+        if branches:
+            conn.execute("CREATE TEMP VIEW Library AS " + " UNION ALL ".join(branches))
+        self.conn = conn
+        return conn
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+        self.conn = None
+        self.schemas = {}
+        self.search_indexes = set()
+
+    def get_installed_games(self):
+        """Every installed game in every store, largest first."""
+        conn = self.get_connection()
+        if not self.schemas:
+            return []
+        return conn.execute(
+            "SELECT Store, ShortName, Title, Size, SizeBytes, InstallPath, RootFolder FROM Library "
+            "WHERE SteamClientID IS NOT NULL AND SteamClientID <> '' "
+            "ORDER BY COALESCE(SizeBytes, 0) DESC").fetchall()
+
+    def get_store_totals(self):
+        """Store -> (bytes, count) of its installed games, for every store
+        attached, including those with nothing installed."""
+        conn = self.get_connection()
+        totals = {store: (0, 0) for store in self.schemas}
+        if not self.schemas:
+            return totals
+        for row in conn.execute(
+                "SELECT Store, COALESCE(SUM(SizeBytes), 0), COUNT(*) FROM Library "
+                "WHERE SteamClientID IS NOT NULL AND SteamClientID <> '' GROUP BY Store"):
+            totals[row[0]] = (row[1], row[2])
+        return totals
+
+    def get_stores(self):
+        self.get_connection()
+        return list(self.schemas)
+
+    def search(self, filter_str="", installed=False, cursor="", page_size=None):
+        """One page of games from all stores, best match first when there is a
+        filter and by title otherwise. Pages work like the store grids: pass
+        the NextCursor of one page to get the next."""
+        conn = self.get_connection()
+        page_size = max(1, int(page_size or self.page_size))
+        content = {'Games': []}
+        if not self.schemas:
+            return {'Type': 'GameGrid', 'Content': content}
+        search = GameSet.GameSet.get_search_query(filter_str) if filter_str.strip() else ""
+        branches = []
+        params = []
+        for store, schema in self.schemas.items():
+            where = []
+            if installed:
+                where.append("Game.SteamClientID IS NOT NULL AND Game.SteamClientID <> ''")
+            source = f"{schema}.Game AS Game"
+            rank = "0"
+            if search and store in self.search_indexes:
+                source = f"{schema}.GameSearch JOIN {schema}.Game AS Game ON Game.id = GameSearch.rowid"
+                where.append("GameSearch MATCH ?")
+                params.append(search)
+                # Same weights as the store grid
+                rank = "round(bm25(GameSearch, 10.0, 5.0, 1.0, 1.0, 1.0), 6)"
+            elif filter_str.strip():
+                # Ranked after the indexed stores' matches
+                where.append("LOWER(Game.Title) LIKE ?")
+                params.append('%' + filter_str.lower().replace(" ", "%") + '%')
+            branches.append(
+                f"""SELECT '{store}' AS Store, Game.id, Game.ShortName, Game.Title, Game.SteamClientID,
+                    {rank} AS Rank FROM {source} WHERE {' AND '.join(where) or '1'}""")
+        order = "Rank, Title COLLATE NOCASE, Store, id"
+        after = ""
+        if cursor:
+            keys = GameSet.GameSet.decode_grid_cursor(cursor, 3)
+            if keys is None:
+                print(f"Library: ignoring invalid cursor: {cursor}", file=sys.stderr)
+                return {'Type': 'GameGrid', 'Content': content}
+            after = "WHERE (Rank, Title COLLATE NOCASE, Store, id) > (?, ?, ?, ?)"
+            params.extend(keys)
+        images = " ".join(
+            f"""WHEN '{store}' THEN (SELECT json_group_array(COALESCE(ImagePath, '')) FROM
+                (SELECT ImagePath FROM {schema}.Images WHERE Images.GameID = Grid.id ORDER BY SortOrder))"""
+            for store, schema in self.schemas.items())
+        rows = conn.execute(
+            f"""SELECT json_object(
+                    'ID', id, 'Name', Title, 'Images', json(CASE Store {images} END),
+                    'ShortName', ShortName, 'SteamClientID', SteamClientID, 'Store', Store) AS Game,
+                json_array(Rank, Title, Store, id) AS Keys
+            FROM (SELECT * FROM ({' UNION ALL '.join(branches)}) {after} ORDER BY {order} LIMIT {page_size + 1}) AS Grid
+            ORDER BY {order}""",
+            params).fetchall()
+        content['Games'] = [json.loads(row['Game']) for row in rows[:page_size]]
+        if len(rows) > page_size:
+            content['NextCursor'] = GameSet.GameSet.encode_grid_cursor(rows[page_size - 1]['Keys'])
+        return {'Type': 'GameGrid', 'Content': content}
@@ -0,0 +1,116 @@
+"""Per-host request limits for the store scripts.
+
+Each API host the scripts call has one AdaptiveLimiter, shared by every
+thread in the process, that HttpClient goes through for each request. It
+caps requests per second with a token bucket and finds the concurrency the
+host copes with by AIMD: the limit grows by one per round of requests that
+come back quickly and without errors, and halves when one is slow, fails or
+is throttled. A 429 or 503 with Retry-After holds every request to that
+host until it has passed, rather than each thread finding out on its own.
+
+Hosts not in HOSTS are not limited.
+"""
+import sys
+import threading
+import time
+
+# Host -> (requests per second, burst, most requests in flight)
+HOSTS = {
+    'gamesdb.gog.com': (20, 40, 40),
+    'api.gog.com': (10, 20, 16),
+    'embed.gog.com': (5, 10, 4),
+    'api.itch.io': (5, 10, 4),
+    'www.steamgriddb.com': (5, 10, 8),
+}
+# A request slower than this counts against the concurrency like an error
+TARGET_LATENCY = 3.0
+# Factor the concurrency limit is cut by, at most once per TARGET_LATENCY
+DECREASE = 0.5
+# Longest Retry-After a host is paused for
+MAX_PAUSE = 60
+
+
+class AdaptiveLimiter:
+    def __init__(self, host, rate, burst, max_concurrency, min_concurrency=1):
+        self.host = host
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        # Start at a quarter and let successes raise it
+        self.limit = float(max(min_concurrency, max_concurrency // 4))
+        self.tokens = float(burst)
+        self.refilled = time.monotonic()
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.cond = threading.Condition()
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.refilled) * self.rate)
+        self.refilled = now
+
+    def acquire(self):
+        """Waits for a slot and a token. Returns the start time to pass to
+        release()."""
+        with self.cond:
+            while True:
+                now = time.monotonic()
+                wait = self.paused_until - now
+                if wait <= 0:
+                    if self.in_flight >= int(self.limit):
+                        # release() notifies
+                        wait = None
+                    else:
+                        self.refill(now)
+                        if self.tokens >= 1:
+                            self.tokens -= 1
+                            self.in_flight += 1
+                            self.requests += 1
+                            return now
+                        wait = (1 - self.tokens) / self.rate
+                self.cond.wait(wait)
+
+    def release(self, started, error=False, retry_after=None):
+        """Records how the request went. error is a failure or a throttling
+        answer, retry_after the seconds the host asked us to wait."""
+        with self.cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if retry_after:
+                self.throttled += 1
+                self.paused_until = max(self.paused_until, now + min(retry_after, MAX_PAUSE))
+                print(f"{self.host}: throttled, pausing for {min(retry_after, MAX_PAUSE):.0f}s", file=sys.stderr)
+            if error:
+                self.errors += 1
+            if error or retry_after or now - started > TARGET_LATENCY:
+                # One cut per window, the other requests in flight when
+                # things went wrong would otherwise cut it again
+                if now - self.last_decrease > TARGET_LATENCY:
+                    self.limit = max(self.min_concurrency, self.limit * DECREASE)
+                    self.last_decrease = now
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self.cond.notify_all()
+
+    def describe(self):
+        return (f"{self.host}: {self.requests} requests, {self.errors} errors, "
+                f"{self.throttled} throttled, concurrency {int(self.limit)}")
+
+
+limiters = {}
+limiters_lock = threading.Lock()
+
+
+def get_limiter(host):
+    """The shared limiter for host, or None when it isn't limited."""
+    if host not in HOSTS:
+        return None
+    with limiters_lock:
+        limiter = limiters.get(host)
+        if limiter is None:
+            limiter = limiters[host] = AdaptiveLimiter(host, *HOSTS[host])
+        return limiter
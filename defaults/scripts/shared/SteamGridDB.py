@@ -1,8 +1,10 @@
-import json
+import concurrent.futures
 import sys
-import urllib.request
+import urllib.error
 import urllib.parse
 
+import HttpClient
+
 
 class SteamGridDB:
     BASE_URL = "https://www.steamgriddb.com/api/v2"
@@ -18,21 +20,29 @@ class SteamGridDB:
 
     def __init__(self, api_key):
         self.api_key = api_key
+        # Requests that failed rather than found nothing, so callers can tell
+        # "SGDB doesn't have it" from "couldn't ask"
+        self.errors = 0
 
     def _request(self, endpoint):
+        """The response's data, [] when SGDB has nothing for it, or None if
+        the request failed."""
         url = f"{self.BASE_URL}/{endpoint}"
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "User-Agent": "GameVault/1.0",
         }
-        req = urllib.request.Request(url, headers=headers)
         try:
-            response = urllib.request.urlopen(req, timeout=15)
-            data = json.loads(response.read())
+            data = HttpClient.get(url, headers=headers, timeout=15).json()
             if data.get("success"):
                 return data.get("data", [])
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return []
+            print(f"SteamGridDB API error ({endpoint}): {e}", file=sys.stderr)
         except Exception as e:
             print(f"SteamGridDB API error ({endpoint}): {e}", file=sys.stderr)
+        self.errors += 1
         return None
 
     def find_game(self, store_name, game_id, game_name):
@@ -60,13 +70,24 @@ class SteamGridDB:
         print(f"SteamGridDB: no match for {store_name}/{game_id} '{game_name}'", file=sys.stderr)
         return None
 
-    def get_images(self, sgdb_game_id):
-        """Fetch image URLs for all slots. Returns {type: url} dict."""
+    def get_images(self, sgdb_game_id, types=None):
+        """Fetch image URLs for all slots, or just those in types. Returns
+        {type: url} dict, url is None where SGDB has no image and types whose
+        request failed are left out. The endpoints are queried concurrently."""
+        endpoints = {endpoint: info for endpoint, info in self.IMAGE_ENDPOINTS.items()
+                     if types is None or info["type"] in types}
         result = {}
-        for endpoint, info in self.IMAGE_ENDPOINTS.items():
-            data = self._request(f"{endpoint}/game/{sgdb_game_id}?{info['params']}")
-            if data and len(data) > 0:
-                url = data[0].get("url")
-                if url:
-                    result[info["type"]] = url
+        if not endpoints:
+            return result
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(endpoints)) as executor:
+            futures = {
+                executor.submit(self._request, f"{endpoint}/game/{sgdb_game_id}?{info['params']}"): info["type"]
+                for endpoint, info in endpoints.items()
+            }
+            for future in concurrent.futures.as_completed(futures):
+                data = future.result()
+                if data is None:
+                    continue
+                url = data[0].get("url") if len(data) > 0 else None
+                result[futures[future]] = url or None
         return result
@@ -1,17 +1,11 @@
 #!/usr/bin/env python3
 import os
 import json
-import sqlite3
 import shutil
 import sys
 
-# Store name -> DB filename mapping
-STORES = {
-    "GOG": "gog.db",
-    "Epic": "epic.db",
-    "Amazon": "amazon.db",
-    "itch.io": "itchio.db",
-}
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "shared"))
+import Library
 
 # Default install directories per store
 DEFAULT_INSTALL_DIRS = {
@@ -22,30 +16,6 @@ DEFAULT_INSTALL_DIRS = {
 }
 
 
-def parse_size_to_bytes(size_str):
-    """Parse formatted size string back to bytes (e.g., '45.20 GB' -> 48536870912)."""
-    if not size_str or not isinstance(size_str, str):
-        return 0
-    size_str = size_str.strip()
-    try:
-        parts = size_str.split()
-        if len(parts) != 2:
-            return 0
-        value = float(parts[0])
-        unit = parts[1].upper()
-        if unit == "GB":
-            return int(value * 1024**3)
-        elif unit == "MB":
-            return int(value * 1024**2)
-        elif unit == "KB":
-            return int(value * 1024)
-        elif unit == "BYTES":
-            return int(value)
-        return 0
-    except (ValueError, IndexError):
-        return 0
-
-
 def convert_bytes(size):
     """Convert bytes to human-readable string."""
     try:
@@ -64,51 +34,35 @@ def convert_bytes(size):
 def get_storage_stats(runtime_dir):
     """Query all store databases and return storage statistics."""
     home = os.path.expanduser("~")
-    stores = []
     all_games = []
+    totals = {}
 
-    for store_name, db_filename in STORES.items():
-        db_path = os.path.join(runtime_dir, db_filename)
-        if not os.path.exists(db_path):
-            continue
-
-        try:
-            conn = sqlite3.connect(db_path)
-            conn.execute("PRAGMA journal_mode=WAL;")
-            c = conn.cursor()
-            c.row_factory = sqlite3.Row
-
-            # Get installed games (SteamClientID set)
-            c.execute(
-                "SELECT ShortName, Title, Size, InstallPath FROM Game "
-                "WHERE SteamClientID IS NOT NULL AND SteamClientID <> ''"
-            )
-            games = c.fetchall()
-            conn.close()
-
-            store_total_bytes = 0
-            for game in games:
-                size_bytes = parse_size_to_bytes(game["Size"])
-                store_total_bytes += size_bytes
-                all_games.append({
-                    "shortname": game["ShortName"],
-                    "store": store_name,
-                    "title": game["Title"] or game["ShortName"],
-                    "size": game["Size"] or "Unknown",
-                    "size_bytes": size_bytes,
-                })
-
-            stores.append({
-                "name": store_name,
-                "size": convert_bytes(store_total_bytes),
-                "size_bytes": store_total_bytes,
-                "count": len(games),
+    # Installed games (SteamClientID set) from every store DB in one query
+    library = Library.Library(runtime_dir)
+    try:
+        for store, (size_bytes, count) in library.get_store_totals().items():
+            totals[store] = {"size_bytes": size_bytes, "count": count}
+        # Already largest first
+        for game in library.get_installed_games():
+            size_bytes = game["SizeBytes"] or 0
+            all_games.append({
+                "shortname": game["ShortName"],
+                "store": Library.TITLES.get(game["Store"], game["Store"]),
+                "title": game["Title"] or game["ShortName"],
+                "size": game["Size"] or "Unknown",
+                "size_bytes": size_bytes,
             })
-        except Exception as e:
-            print(f"Error reading {store_name} DB: {e}", file=sys.stderr)
-
-    # Sort games by size (largest first)
-    all_games.sort(key=lambda g: g["size_bytes"], reverse=True)
+    except Exception as e:
+        print(f"Error reading store DBs: {e}", file=sys.stderr)
+    finally:
+        library.close()
+
+    stores = [{
+        "name": Library.TITLES.get(store, store),
+        "size": convert_bytes(total["size_bytes"]),
+        "size_bytes": total["size_bytes"],
+        "count": total["count"],
+    } for store, total in totals.items()]
 
     # Sort stores by size (largest first)
     stores.sort(key=lambda s: s["size_bytes"], reverse=True)
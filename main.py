@@ -6,12 +6,28 @@ import sys
 
 from aiohttp import web
 import shlex
+import signal
 import decky_plugin
 import zipfile
 import shutil
 import aiohttp
 import os
 import concurrent.futures
+import functools
+import contextlib
+import heapq
+import itertools
+import importlib
+import time
+
+# Stores whose databases can be read directly by the plugin process.
+# Keyed by the platform name used in "./scripts/gamevault.sh <platform> <action>".
+STORE_LIBRARIES = {
+    "GOG": {"db": "gog.db", "url": "https://www.gog.com/"},
+    "Epic": {"db": "epic.db", "url": "https://store.epicgames.com/"},
+    "Amazon": {"db": "amazon.db", "url": "https://gaming.amazon.com/"},
+    "Itchio": {"db": "itchio.db", "url": "https://itch.io/"},
+}
 
 
 def _make_ssl_context():
@@ -33,6 +49,629 @@ def _make_ssl_context():
     return False
 
 
+class SharedScripts:
+    """The store scripts' shared modules (GameSet, Library, ...), reused
+    in-process so hot read actions don't need a bash + python round trip.
+
+    They're imported on first use from the scripts directory gamevault.sh
+    runs from, so the plugin reads the databases with the code that writes
+    them, and a missing or broken copy only sends actions back to the shell
+    scripts rather than stopping the plugin from loading."""
+
+    directory = None  # the shared directory the modules were imported from
+
+    @staticmethod
+    def find_directory():
+        # A custom backend in the runtime dir may bring its own copy
+        for base in (Helper.working_directory, decky_plugin.DECKY_PLUGIN_DIR):
+            directory = os.path.join(base, "scripts", "shared")
+            if os.path.exists(os.path.join(directory, "GameSet.py")):
+                return directory
+        raise ImportError("No scripts/shared directory to import from")
+
+    @staticmethod
+    def get(name):
+        directory = SharedScripts.find_directory()
+        if directory != SharedScripts.directory:
+            SharedScripts.reset()
+            sys.path.insert(0, directory)
+            SharedScripts.directory = directory
+        return importlib.import_module(name)
+
+    @staticmethod
+    def reset():
+        """Forgets the imported modules and everything made from them, e.g.
+        after the scripts were replaced, so the next get() imports afresh."""
+        directory, SharedScripts.directory = SharedScripts.directory, None
+        if directory is None:
+            return
+        LibraryReader.close()
+        Helper.image_cache = None
+        if directory in sys.path:
+            sys.path.remove(directory)
+        for name, module in list(sys.modules.items()):
+            if os.path.dirname(getattr(module, "__file__", None) or "") == directory:
+                del sys.modules[name]
+
+
+class LibraryReader:
+    """Answers read-only store actions straight from the per-store databases.
+    Each database gets its own single worker thread, so its sqlite connection
+    never crosses threads and queries never block the event loop.
+    Returning None from execute() means "use the shell script instead"."""
+
+    executors = {}  # platform -> ThreadPoolExecutor
+    game_sets = {}  # platform -> GameSet.GameSet
+    library = None  # Library.Library over every store, runs on the "Library" executor
+
+    @staticmethod
+    def parse_command(cmd):
+        """Split "./scripts/gamevault.sh <platform> <action>" into (platform, action)."""
+        try:
+            parts = shlex.split(cmd)
+        except ValueError:
+            return None, None
+        if len(parts) != 3 or os.path.basename(parts[0]) != "gamevault.sh":
+            return None, None
+        return parts[1], parts[2]
+
+    @staticmethod
+    def get_game_set(platform):
+        library = STORE_LIBRARIES.get(platform)
+        if not library:
+            return None
+        db_file = os.path.join(decky_plugin.DECKY_PLUGIN_RUNTIME_DIR, library["db"])
+        if not os.path.exists(db_file):
+            # Let the store script create and populate the database first
+            return None
+        game_set = LibraryReader.game_sets.get(platform)
+        if game_set is None or game_set.db_file != db_file:
+            game_set = SharedScripts.get("GameSet").GameSet(db_file, platform, "Proton")
+            game_set.storeURL = library["url"]
+            LibraryReader.game_sets[platform] = game_set
+        return game_set
+
+    @staticmethod
+    def get_library():
+        runtime_dir = decky_plugin.DECKY_PLUGIN_RUNTIME_DIR
+        library = LibraryReader.library
+        if library is None or library.runtime_dir != runtime_dir:
+            library = SharedScripts.get("Library").Library(runtime_dir)
+            LibraryReader.library = library
+        return library
+
+    @staticmethod
+    async def run(platform, fn, *args):
+        executor = LibraryReader.executors.get(platform)
+        if executor is None:
+            executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix=f"library-{platform}"
+            )
+            LibraryReader.executors[platform] = executor
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(fn, *args))
+
+    @staticmethod
+    def arg(args, index, default=""):
+        # Mirrors the `[ -z "${n}" ]` defaults in the store.sh functions
+        if len(args) > index and args[index]:
+            return str(args[index])
+        return default
+
+    @staticmethod
+    async def execute(cmd, args):
+        platform, action = LibraryReader.parse_command(cmd)
+        if action not in ("getgames", "getgamedetails", "getsetting", "getgamesize"):
+            return None
+        arg = functools.partial(LibraryReader.arg, args)
+        try:
+            game_set = LibraryReader.get_game_set(platform)
+            if game_set is None:
+                return None
+            if action == "getgames":
+                filter_str = arg(0)
+                installed = arg(1, "false")
+                result = json.loads(
+                    await LibraryReader.run(
+                        platform,
+                        game_set.get_games_with_images,
+                        "",
+                        filter_str,
+                        installed,
+                        arg(2, "true"),
+                        False,
+                        "true",
+                        arg(3),
+                        arg(4),
+                        arg(5),
+                    )
+                )
+                if (
+                    not result["Content"]["Games"]
+                    and filter_str == ""
+                    and installed == "false"
+                    and arg(3) == ""
+                ):
+                    # Empty library: the store script runs init before listing
+                    return None
+                return result
+
+            if action == "getgamedetails":
+                result = await LibraryReader.run(
+                    platform,
+                    game_set.get_game_data,
+                    arg(0),
+                    "",
+                    False,
+                    "Windows",
+                    "Proton",
+                    "null",
+                )
+                return json.loads(result) if result else None
+
+            if action == "getsetting":
+                return json.loads(
+                    await LibraryReader.run(platform, game_set.get_setting, arg(0))
+                )
+
+            if action == "getgamesize" and arg(1) == "true":
+                size = await LibraryReader.run(platform, game_set.get_disk_size, arg(0))
+                return {"Type": "GameSize", "Content": {"Size": size}}
+
+        except Exception as e:
+            decky_plugin.logger.error(
+                f"LibraryReader failed for {platform} {action}, using script: {e}"
+            )
+        return None
+
+    @staticmethod
+    def close():
+        for executor in LibraryReader.executors.values():
+            executor.shutdown(wait=False)
+        LibraryReader.executors = {}
+        LibraryReader.game_sets = {}
+        if LibraryReader.library is not None:
+            LibraryReader.library.close()
+            LibraryReader.library = None
+
+
+class PrioritySemaphore:
+    """A semaphore whose waiters are served by lane first and arrival order
+    second, so a queued background job gives way to anything interactive
+    that shows up while it is waiting."""
+
+    def __init__(self, value):
+        self.value = value
+        self.waiters = []  # heap of (lane, seq, future)
+        self.seq = itertools.count()
+
+    async def acquire(self, lane=1):
+        if self.value > 0:
+            self.value -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (lane, next(self.seq), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Slot was handed over just before the cancel, pass it on
+                self.release()
+            raise
+
+    def release(self):
+        while self.waiters:
+            _, _, future = heapq.heappop(self.waiters)
+            if not future.done():
+                future.set_result(True)
+                return
+        self.value += 1
+
+
+class ActionScheduler:
+    """Decides how many subprocesses may run side by side.
+    Actions are classified from their gamevault.sh action name:
+      read  - quick lookups, run concurrently up to read_limit
+      write - local config/database changes, one at a time per store
+      long  - network or disk heavy jobs, one per store and long_limit overall
+    Each class has its own slots, so a library refresh never queues the
+    details view or image fetches behind it. Within a class waiting actions
+    are ordered by lane, taken from the action's "Lane" in static.json."""
+
+    READ = "read"
+    WRITE = "write"
+    LONG = "long"
+
+    LANES = {"interactive": 0, "default": 1, "background": 2}
+
+    read_limit = 8
+    long_limit = 2
+    # Default deadlines in seconds, an action's "Timeout" in static.json wins
+    timeouts = {READ: 60, WRITE: 120, LONG: 3600}
+    # Queueing delay above which a wait is logged
+    slow_wait = 0.1
+
+    write_actions = {
+        "saveconfig", "savebats", "savesetting", "savetabconfig",
+        "saveplatformconfig", "uninstall", "cancelinstall", "logout",
+        "toggle-autosync", "enable-eos-overlay", "disable-eos-overlay",
+        "registry-fix", "remove-overlay",
+    }
+    long_actions = {
+        "init", "refresh", "download", "install", "update", "verify", "repair",
+        "repair_and_update", "move", "import", "login", "protontricks", "run-exe",
+        "download-saves", "upload-saves", "update-umu-id", "retrodetect-game-types",
+        "lookup-protonfixes", "apply-protonfixes", "install-overlay", "update-overlay",
+    }
+
+    semaphores = {}  # slot key -> PrioritySemaphore
+    stats = {}  # (action class, lane) -> counters
+
+    @staticmethod
+    def classify(cmd):
+        """Returns (action_class, store) for an action command."""
+        platform, action = LibraryReader.parse_command(cmd)
+        parts = cmd.split()
+        if action is None and len(parts) == 2 and os.path.basename(parts[0]) == "gamevault.sh":
+            # "./scripts/gamevault.sh init" runs the action for every store
+            platform, action = "", parts[1]
+        if action is None:
+            # Not a store action, keep these serialised like before
+            return ActionScheduler.WRITE, ""
+        if action in ActionScheduler.long_actions:
+            return ActionScheduler.LONG, platform
+        if action in ActionScheduler.write_actions:
+            return ActionScheduler.WRITE, platform
+        return ActionScheduler.READ, platform
+
+    @staticmethod
+    def semaphore(key, limit):
+        sem = ActionScheduler.semaphores.get(key)
+        if sem is None:
+            sem = PrioritySemaphore(limit)
+            ActionScheduler.semaphores[key] = sem
+        return sem
+
+    @staticmethod
+    def slot_semaphores(action_class, store):
+        # Always acquired per-store first, then global, so waits can't deadlock
+        if action_class == ActionScheduler.READ:
+            return [ActionScheduler.semaphore(("read",), ActionScheduler.read_limit)]
+        if action_class == ActionScheduler.LONG:
+            return [
+                ActionScheduler.semaphore(("long", store), 1),
+                ActionScheduler.semaphore(("long",), ActionScheduler.long_limit),
+            ]
+        return [ActionScheduler.semaphore(("write", store), 1)]
+
+    @staticmethod
+    @contextlib.asynccontextmanager
+    async def slot(action_class, store="", name="", lane="default"):
+        if lane not in ActionScheduler.LANES:
+            lane = "default"
+        loop = asyncio.get_running_loop()
+        stats = ActionScheduler.stats.setdefault(
+            (action_class, lane),
+            {"count": 0, "running": 0, "wait_total": 0.0, "wait_max": 0.0, "slow": 0},
+        )
+        start = loop.time()
+        acquired = []
+        try:
+            for sem in ActionScheduler.slot_semaphores(action_class, store):
+                await sem.acquire(ActionScheduler.LANES[lane])
+                acquired.append(sem)
+            wait = loop.time() - start
+            stats["count"] += 1
+            stats["wait_total"] += wait
+            stats["wait_max"] = max(stats["wait_max"], wait)
+            if wait > ActionScheduler.slow_wait:
+                stats["slow"] += 1
+                decky_plugin.logger.info(
+                    f"{lane} {action_class} action {name} waited {wait * 1000:.0f} ms for a slot"
+                )
+            stats["running"] += 1
+            try:
+                yield
+            finally:
+                stats["running"] -= 1
+        finally:
+            for sem in reversed(acquired):
+                sem.release()
+
+    @staticmethod
+    def get_stats():
+        result = {}
+        for (action_class, lane), stats in ActionScheduler.stats.items():
+            count = stats["count"]
+            result.setdefault(action_class, {})[lane] = {
+                "count": count,
+                "running": stats["running"],
+                "avg_wait_ms": round(stats["wait_total"] / count * 1000, 1) if count else 0,
+                "max_wait_ms": round(stats["wait_max"] * 1000, 1),
+                "slow_waits": stats["slow"],
+            }
+        return result
+
+
+class StoreWorker:
+    """A long-lived "<store>-config.py --worker" process per store.
+    Actions with "WorkerArgs" in their definition are sent to it as JSON lines
+    instead of paying for bash, settings.sh and a cold python start every time.
+    Calls to one worker are serialised, so only quick local actions get
+    "WorkerArgs"; anything that waits on the network or a store CLI (artwork,
+    sizes of games not installed, update checks) would hold up the progress
+    polls and settings behind it. A dead worker is respawned on next use."""
+
+    workers = {}  # platform -> StoreWorker
+    # Shell actions after which a warm worker may hold stale settings or credentials
+    restart_actions = ("savetabconfig", "login", "logout")
+    # base64 artwork responses come back as a single line
+    line_limit = 32 * 1024 * 1024
+
+    def __init__(self, platform):
+        self.platform = platform
+        self.proc = None
+        self.log_file = None
+        # Ordered by lane like the scheduler's slots, so an interactive call
+        # waiting for the worker goes ahead of queued background ones
+        self.lock = PrioritySemaphore(1)
+        self.request_id = 0
+
+    @staticmethod
+    def get(platform):
+        worker = StoreWorker.workers.get(platform)
+        if worker is None:
+            worker = StoreWorker(platform)
+            StoreWorker.workers[platform] = worker
+        return worker
+
+    async def start(self):
+        log_path = os.path.join(
+            decky_plugin.DECKY_PLUGIN_LOG_DIR, f"{self.platform.lower()}-worker.log"
+        )
+        self.log_file = open(log_path, "w")
+        env = Helper.get_environment()
+        self.proc = await asyncio.create_subprocess_shell(
+            f"./scripts/gamevault.sh {shlex.quote(self.platform)} worker",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=self.log_file,
+            env=env,
+            cwd=Helper.working_directory,
+            start_new_session=True,
+            limit=StoreWorker.line_limit,
+        )
+        decky_plugin.logger.info(
+            f"Started {self.platform} worker (pid {self.proc.pid})"
+        )
+
+    async def stop(self):
+        proc, self.proc = self.proc, None
+        if proc is not None and proc.returncode is None:
+            try:
+                proc.stdin.close()
+                await asyncio.wait_for(proc.wait(), timeout=2.0)
+            except Exception:
+                try:
+                    proc.kill()
+                    await proc.wait()
+                except Exception:
+                    pass
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
+
+    async def send(self, request):
+        self.proc.stdin.write((json.dumps(request) + "\n").encode())
+        await self.proc.stdin.drain()
+
+    async def call(
+        self, argv, args, input_data="", timeout=None, action_key=None, slot=None, lane="default"
+    ):
+        """Runs one command line in the worker and returns its stdout, or
+        None if the request never reached the worker, so the caller can run
+        it through the shell instead. Once sent, a failure is reported as an
+        error rather than retried, the worker may already have applied it.
+
+        slot, an ActionScheduler.slot(), is only entered once the worker is
+        free, so calls queued behind another don't hold scheduler slots.
+        Waiting calls get the worker in lane order.
+        timeout covers the wait for both as well as the call itself; a call
+        that overruns it once sent, or gets cancelled, takes the worker down
+        with it."""
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+
+        def remaining():
+            return None if deadline is None else max(0.0, deadline - loop.time())
+
+        async with contextlib.AsyncExitStack() as stack:
+            try:
+                await asyncio.wait_for(
+                    self.lock.acquire(ActionScheduler.LANES.get(lane, 1)), remaining()
+                )
+                stack.callback(self.lock.release)
+                if slot is not None:
+                    await asyncio.wait_for(stack.enter_async_context(slot), remaining())
+            except asyncio.TimeoutError:
+                decky_plugin.logger.error(
+                    f"{self.platform} worker busy, timed out after {timeout} s waiting to run {argv}"
+                )
+                return Helper.error_output(f"Timed out after {timeout} s")
+            self.request_id += 1
+            request = {
+                "id": self.request_id,
+                "method": "execute",
+                "params": {"argv": argv, "args": list(args), "input": input_data},
+            }
+            sent = False
+            try:
+                if self.proc is None or self.proc.returncode is not None:
+                    await self.start()
+                try:
+                    await self.send(request)
+                except (BrokenPipeError, ConnectionResetError):
+                    # Worker died while idle, give it one fresh start
+                    await self.stop()
+                    await self.start()
+                    await self.send(request)
+                sent = True
+                entry = Helper.track(self.proc, action_key)
+                try:
+                    line = await asyncio.wait_for(self.proc.stdout.readline(), remaining())
+                finally:
+                    Helper.untrack(self.proc)
+                if entry["cancelled"]:
+                    await self.stop()
+                    return Helper.error_output("Action cancelled", "Cancelled")
+                if not line:
+                    raise RuntimeError("worker exited")
+                response = json.loads(line)
+                if response.get("id") != self.request_id:
+                    raise RuntimeError(f"unexpected response id {response.get('id')}")
+                if "error" in response:
+                    raise RuntimeError(response["error"].get("message"))
+                result = response["result"]
+                if result.get("returncode"):
+                    decky_plugin.logger.info(
+                        f"{self.platform} worker returned {result['returncode']} for {argv}"
+                    )
+                return result.get("stdout")
+            except asyncio.TimeoutError:
+                decky_plugin.logger.error(
+                    f"{self.platform} worker timed out after {timeout} s on {argv}"
+                )
+                await Helper.kill_process_group(self.proc)
+                await self.stop()
+                return Helper.error_output(f"Timed out after {timeout} s")
+            except Exception as e:
+                decky_plugin.logger.error(f"{self.platform} worker failed: {e}")
+                await self.stop()
+                if sent:
+                    return Helper.error_output(f"{self.platform} worker failed: {e}")
+                return None
+
+    @staticmethod
+    async def restart(platform):
+        """Drops a store's worker so the next call starts from fresh config
+        and credentials."""
+        worker = StoreWorker.workers.get(platform)
+        if worker is not None:
+            await worker.lock.acquire(ActionScheduler.LANES["interactive"])
+            try:
+                await worker.stop()
+            finally:
+                worker.lock.release()
+
+    @staticmethod
+    async def stop_all():
+        for worker in list(StoreWorker.workers.values()):
+            await worker.stop()
+        StoreWorker.workers = {}
+
+
+class ResponseCache:
+    """Short-lived cache for results of idempotent actions.
+    An action opts in with "CacheTTL" (seconds) in its static.json definition.
+    Actions that change a game or store drop the entries for that store and
+    shortname (args[0]); store-wide actions drop everything for the store.
+    Each drop also bumps a generation, and a read only stores its result if
+    the generation it started in is still current, so a read that raced a
+    write can't put the old data back."""
+
+    entries = {}  # key -> (expires, platform, shortname, result)
+    generation = 0  # bumped when everything is dropped
+    generations = {}  # platform -> generation
+    max_entries = 500
+    hits = 0
+    misses = 0
+
+    game_actions = {
+        "install", "uninstall", "update", "verify", "repair", "repair_and_update",
+        "download", "cancelinstall", "move", "import", "saveconfig",
+        "toggle-autosync", "update-umu-id", "apply-protonfixes",
+    }
+    store_actions = {
+        "init", "refresh", "saveplatformconfig", "savetabconfig", "login", "logout",
+    }
+
+    @staticmethod
+    def key(actionSet, actionName, args, input_data):
+        return (actionSet, actionName, tuple(str(arg) for arg in args), input_data)
+
+    @staticmethod
+    def get(key):
+        entry = ResponseCache.entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            ResponseCache.entries.pop(key, None)
+            ResponseCache.misses += 1
+            return None
+        ResponseCache.hits += 1
+        return entry[3]
+
+    @staticmethod
+    def get_generation(platform):
+        return (ResponseCache.generation, ResponseCache.generations.get(platform, 0))
+
+    @staticmethod
+    def put(key, ttl, platform, shortname, result, generation):
+        if generation != ResponseCache.get_generation(platform):
+            return
+        if len(ResponseCache.entries) >= ResponseCache.max_entries:
+            now = time.monotonic()
+            ResponseCache.entries = {
+                k: v for k, v in ResponseCache.entries.items() if v[0] >= now
+            }
+            if len(ResponseCache.entries) >= ResponseCache.max_entries:
+                ResponseCache.entries.clear()
+        ResponseCache.entries[key] = (
+            time.monotonic() + ttl,
+            platform,
+            shortname,
+            result,
+        )
+
+    @staticmethod
+    def invalidate(platform, shortname=None):
+        """Drops a store's entries, or only those for one game. An empty
+        platform (the top-level init) drops everything."""
+        if platform:
+            ResponseCache.generations[platform] = ResponseCache.generations.get(platform, 0) + 1
+        else:
+            ResponseCache.generation += 1
+        ResponseCache.entries = {
+            k: v
+            for k, v in ResponseCache.entries.items()
+            if platform
+            and (v[1] != platform or (shortname is not None and v[2] != shortname))
+        }
+
+    @staticmethod
+    def clear():
+        ResponseCache.invalidate("")
+
+    @staticmethod
+    def after_action(cmd, args):
+        """Invalidates whatever the given action may have changed."""
+        action_class, store = ActionScheduler.classify(cmd)
+        _, shell_action = LibraryReader.parse_command(cmd)
+        if shell_action is None and action_class == ActionScheduler.LONG:
+            # "./scripts/gamevault.sh init"
+            ResponseCache.invalidate("")
+        elif shell_action in ResponseCache.store_actions:
+            ResponseCache.invalidate(store)
+        elif shell_action in ResponseCache.game_actions:
+            ResponseCache.invalidate(store, str(args[0]) if args else None)
+
+    @staticmethod
+    def get_stats():
+        return {
+            "Entries": len(ResponseCache.entries),
+            "Hits": ResponseCache.hits,
+            "Misses": ResponseCache.misses,
+        }
+
+
 class Helper:
     websocket_port = 8765
     action_cache = {}
@@ -40,6 +679,7 @@ class Helper:
     dir_size_cache = {}  # path -> (size, timestamp)
 
     ws_loop = None
+    image_cache = None
     app = None
     site = None
     runner = None
@@ -47,7 +687,9 @@ class Helper:
 
     verbose = False
 
-    lock = asyncio.Lock()
+    in_flight = {}  # (actionSet, actionName, args, input, ids) -> (asyncio.Task, cache generation)
+    running = {}  # pid -> {"key": (actionSet, actionName, args), "proc", "cancelled"}
+    spawns_saved = 0
 
     @staticmethod
     async def pyexec_subprocess(
@@ -59,11 +701,14 @@ class Helper:
         stream_output: bool = False,
         app_id="",
         game_id="",
+        action_class=ActionScheduler.WRITE,
+        store="",
+        lane="default",
+        timeout=None,
+        action_key=None,
     ):
-        decky_plugin.logger.info(f"creating lock")
-        async with Helper.lock:
+        async with ActionScheduler.slot(action_class, store, cmd, lane):
             try:
-                decky_plugin.logger.info(f"inside lock")
                 if unprivilege:
                     cmd = f"sudo -u {decky_plugin.DECKY_USER} {cmd}"
                 decky_plugin.logger.info(f"running cmd: {cmd}")
@@ -112,8 +757,30 @@ class Helper:
                     )
                     return {"returncode": proc.returncode}
                 else:
+                    entry = Helper.track(proc, action_key)
                     try:
-                        stdout, stderr = await proc.communicate(input.encode())
+                        try:
+                            stdout, stderr = await asyncio.wait_for(
+                                proc.communicate(input.encode()), timeout
+                            )
+                        except asyncio.TimeoutError:
+                            decky_plugin.logger.error(
+                                f"Timed out after {timeout} s, killing: {cmd}"
+                            )
+                            await Helper.kill_process_group(proc)
+                            return {
+                                "returncode": proc.returncode,
+                                "stdout": "",
+                                "stderr": "",
+                                "error": f"Timed out after {timeout} s",
+                            }
+                        if entry["cancelled"]:
+                            return {
+                                "returncode": proc.returncode,
+                                "stdout": "",
+                                "stderr": "",
+                                "cancelled": True,
+                            }
                         stdout = stdout.decode()
                         stderr = stderr.decode()
                         if Helper.verbose:
@@ -126,14 +793,11 @@ class Helper:
                             "stderr": stderr,
                         }
                     finally:
+                        Helper.untrack(proc)
                         # Ensure process is terminated and cleaned up
                         if proc.returncode is None:
                             try:
-                                proc.terminate()
-                                await asyncio.wait_for(proc.wait(), timeout=5.0)
-                            except asyncio.TimeoutError:
-                                proc.kill()
-                                await proc.wait()
+                                await Helper.kill_process_group(proc)
                             except Exception:
                                 pass
 
@@ -142,17 +806,64 @@ class Helper:
                 # Clean up process on error
                 try:
                     if "proc" in locals() and proc.returncode is None:
-                        proc.terminate()
-                        await asyncio.wait_for(proc.wait(), timeout=5.0)
+                        await Helper.kill_process_group(proc)
                 except Exception:
-                    if "proc" in locals():
-                        try:
-                            proc.kill()
-                            await proc.wait()
-                        except Exception:
-                            pass
+                    pass
                 return None
 
+    @staticmethod
+    def track(proc, action_key):
+        """Registers a running process so cancel_action can find it."""
+        entry = {"key": action_key, "proc": proc, "cancelled": False}
+        if action_key is not None:
+            Helper.running[proc.pid] = entry
+        return entry
+
+    @staticmethod
+    def untrack(proc):
+        Helper.running.pop(proc.pid, None)
+
+    @staticmethod
+    async def kill_process_group(proc, grace=5.0):
+        """Every action runs in its own session, so its pid is also its process
+        group. SIGTERM the group, then SIGKILL whatever is left after grace."""
+        try:
+            os.killpg(proc.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return
+        try:
+            await asyncio.wait_for(proc.wait(), timeout=grace)
+        except asyncio.TimeoutError:
+            pass
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        await proc.wait()
+
+    @staticmethod
+    def error_output(message, type="Error"):
+        """Script-style output for results produced by the plugin itself."""
+        return json.dumps({"Type": type, "Content": {"Message": message}})
+
+    @staticmethod
+    def cancel(actionSet, actionName, args):
+        """Kills running processes of an action. args narrows the match to
+        calls whose arguments start with the given values."""
+        args = tuple(str(arg) for arg in args)
+        count = 0
+        for entry in list(Helper.running.values()):
+            key_set, key_name, key_args = entry["key"]
+            if (
+                key_set == actionSet
+                and key_name == actionName
+                and key_args[: len(args)] == args
+            ):
+                entry["cancelled"] = True
+                asyncio.ensure_future(Helper.kill_process_group(entry["proc"]))
+                count += 1
+        return count
+
     @staticmethod
     def get_environment(platform=""):
         env = {
@@ -171,7 +882,18 @@ class Helper:
         return env
 
     @staticmethod
-    async def call_script(cmd: str, *args, input_data="", app_id="", game_id=""):
+    async def call_script(
+        cmd: str,
+        *args,
+        input_data="",
+        app_id="",
+        game_id="",
+        action_class=ActionScheduler.WRITE,
+        store="",
+        lane="default",
+        timeout=None,
+        action_key=None,
+    ):
         try:
             decky_plugin.logger.info(f"call_script: {cmd} {args} {input_data}")
             encoded_args = [shlex.quote(arg) for arg in args]
@@ -181,8 +903,20 @@ class Helper:
             cmd = f"{cmd} {' '.join(encoded_args)}"
 
             res = await Helper.pyexec_subprocess(
-                cmd, input_data, app_id=app_id, game_id=game_id
+                cmd,
+                input_data,
+                app_id=app_id,
+                game_id=game_id,
+                action_class=action_class,
+                store=store,
+                lane=lane,
+                timeout=timeout,
+                action_key=action_key,
             )
+            if res.get("cancelled"):
+                return Helper.error_output("Action cancelled", "Cancelled")
+            if res.get("error"):
+                return Helper.error_output(res["error"])
             if Helper.verbose:
                 decky_plugin.logger.info(f"call_script result: {res['stdout'][:100]}")
             return res["stdout"]
@@ -215,6 +949,80 @@ class Helper:
     @staticmethod
     async def execute_action(
         actionSet, actionName, *args, input_data="", app_id="", game_id=""
+    ):
+        """Read actions with a "CacheTTL" are answered from ResponseCache while
+        fresh, and identical read actions that are already running share one
+        execution instead of each spawning their own script. Anything else
+        invalidates the cached results it may have changed."""
+        action = Helper.get_action(actionSet, actionName)
+        cmd = (action or {}).get("Command") or ""
+        action_class, store = ActionScheduler.classify(cmd)
+        if not action or action_class != ActionScheduler.READ:
+            result = await Helper.run_action(
+                actionSet,
+                actionName,
+                *args,
+                input_data=input_data,
+                app_id=app_id,
+                game_id=game_id,
+            )
+            ResponseCache.after_action(cmd, args)
+            return result
+        ttl = action.get("CacheTTL")
+        cache_key = ResponseCache.key(actionSet, actionName, args, input_data)
+        if ttl:
+            cached = ResponseCache.get(cache_key)
+            if cached is not None:
+                return cached
+        key = (
+            actionSet,
+            actionName,
+            tuple(str(arg) for arg in args),
+            input_data,
+            app_id,
+            game_id,
+        )
+        generation = ResponseCache.get_generation(store)
+        task, task_generation = Helper.in_flight.get(key, (None, None))
+        if task is not None and task_generation != generation:
+            # Started before a write to the store, its answer may be stale
+            task = None
+        if task is not None:
+            Helper.spawns_saved += 1
+            if Helper.verbose:
+                decky_plugin.logger.info(f"joining in-flight {actionSet} {actionName}")
+        else:
+            task = asyncio.ensure_future(
+                Helper.run_action(
+                    actionSet,
+                    actionName,
+                    *args,
+                    input_data=input_data,
+                    app_id=app_id,
+                    game_id=game_id,
+                )
+            )
+            Helper.in_flight[key] = (task, generation)
+
+            def done(finished):
+                if Helper.in_flight.get(key, (None,))[0] is finished:
+                    del Helper.in_flight[key]
+
+            task.add_done_callback(done)
+        # One caller going away must not cancel the run the others are waiting on
+        result = await asyncio.shield(task)
+        if (
+            ttl
+            and isinstance(result, dict)
+            and result.get("Type") not in ("Error", "Cancelled")
+        ):
+            shortname = str(args[0]) if args else None
+            ResponseCache.put(cache_key, ttl, store, shortname, result, generation)
+        return result
+
+    @staticmethod
+    async def run_action(
+        actionSet, actionName, *args, input_data="", app_id="", game_id=""
     ):
         try:
             result = ""
@@ -228,13 +1036,40 @@ class Helper:
                 decky_plugin.logger.info(f"execute_action game_id: {game_id}")
 
                 decky_plugin.logger.info(f"execute_action input_data: {input_data}")
-                result = await Helper.call_script(
-                    os.path.expanduser(cmd),
-                    *args,
-                    input_data=input_data,
-                    app_id=app_id,
-                    game_id=game_id,
-                )
+                json_result = await LibraryReader.execute(cmd, args)
+                if json_result is not None:
+                    return json_result
+                platform, shell_action = LibraryReader.parse_command(cmd)
+                action_class, store = ActionScheduler.classify(cmd)
+                lane = action.get("Lane", "default")
+                timeout = action.get("Timeout") or ActionScheduler.timeouts[action_class]
+                action_key = (actionSet, actionName, tuple(str(arg) for arg in args))
+                result = None
+                if platform in STORE_LIBRARIES and action.get("WorkerArgs"):
+                    result = await StoreWorker.get(platform).call(
+                        action["WorkerArgs"],
+                        args,
+                        input_data,
+                        timeout=timeout,
+                        action_key=action_key,
+                        slot=ActionScheduler.slot(action_class, store, cmd, lane),
+                        lane=lane,
+                    )
+                if result is None:
+                    result = await Helper.call_script(
+                        os.path.expanduser(cmd),
+                        *args,
+                        input_data=input_data,
+                        app_id=app_id,
+                        game_id=game_id,
+                        action_class=action_class,
+                        store=store,
+                        lane=lane,
+                        timeout=timeout,
+                        action_key=action_key,
+                    )
+                if platform in STORE_LIBRARIES and shell_action in StoreWorker.restart_actions:
+                    await StoreWorker.restart(platform)
                 if result is None:
                     return {
                         "Type": "Error",
@@ -486,18 +1321,21 @@ class Helper:
                         "./scripts/install_deps.sh",
                         websocket=websocket,
                         stream_output=True,
+                        action_class=ActionScheduler.LONG,
                     )
                 if data["action"] == "uninstall_dependencies":
                     await Helper.pyexec_subprocess(
                         "./scripts/install_deps.sh uninstall",
                         websocket=websocket,
                         stream_output=True,
+                        action_class=ActionScheduler.LONG,
                     )
                 if data["action"] == "install_ge_proton":
                     await Helper.pyexec_subprocess(
                         "./scripts/install_ge_proton.sh",
                         websocket=websocket,
                         stream_output=True,
+                        action_class=ActionScheduler.LONG,
                     )
                 if data["action"] == "self_update":
                     download_url = data.get("download_url", "")
@@ -517,6 +1355,40 @@ class Helper:
 
         return websocket
 
+    @staticmethod
+    async def image_handler(request):
+        """Serves a cached image. Files are named by their content, so the
+        hash is a strong ETag and a URL's content never changes."""
+        key = request.match_info["key"]
+        ImageCache = SharedScripts.get("ImageCache")
+        if not ImageCache.is_key(key):
+            raise web.HTTPNotFound()
+        headers = {
+            "ETag": f'"{key}"',
+            "Cache-Control": "public, max-age=31536000, immutable",
+            # The frontend fetches artwork from Steam's own origin
+            "Access-Control-Allow-Origin": "*",
+        }
+        if Helper.image_cache is None:
+            Helper.image_cache = ImageCache.ImageCache(
+                ImageCache.get_cache_dir(decky_plugin.DECKY_PLUGIN_RUNTIME_DIR))
+        # Runs on its own thread, the index lookup shouldn't block the event loop
+        found = await LibraryReader.run("Images", Helper.image_cache.open, key)
+        if found is None:
+            raise web.HTTPNotFound()
+        if request.headers.get("If-None-Match") == headers["ETag"]:
+            return web.Response(status=304, headers=headers)
+        path, content_type = found
+
+        def read_image():
+            with open(path, "rb") as f:
+                return f.read()
+
+        # A plain response rather than FileResponse, which would replace the
+        # ETag with one made from the file's mtime
+        body = await LibraryReader.run("Images", read_image)
+        return web.Response(body=body, content_type=content_type, headers=headers)
+
     async def start_ws_server():
         Helper.ws_loop = asyncio.get_event_loop()
         # Don't use ThreadPoolExecutor for async tasks - just call directly
@@ -536,6 +1408,11 @@ class Helper:
                     # Helper.runner.setup()
                     Helper.app = web.Application()
                     Helper.app.router.add_get("/ws", Helper.ws_handler)
+                    try:
+                        route = SharedScripts.get("ImageCache").ROUTE
+                        Helper.app.router.add_get(route + "{key}", Helper.image_handler)
+                    except Exception as e:
+                        decky_plugin.logger.error(f"Not serving cached images: {e}")
                     Helper.runner = web.AppRunner(Helper.app)
                     await Helper.runner.setup()
                     Helper.site = web.TCPSite(Helper.runner, "localhost", port)
@@ -662,6 +1539,7 @@ class Plugin:
     async def reload(self):
         try:
             Helper.action_cache = {}
+            ResponseCache.clear()
             if os.path.exists(
                 os.path.join(decky_plugin.DECKY_PLUGIN_RUNTIME_DIR, "init.json")
             ):
@@ -700,16 +1578,27 @@ class Plugin:
             current_version = data.get("version", "0.0.0")
 
             api_url = "https://api.github.com/repos/Starkka15/junkstore/releases/latest"
+            # Conditional on the last answer, GitHub doesn't count a 304
+            # against the unauthenticated rate limit
+            HttpClient = SharedScripts.get("HttpClient")
+            cache = HttpClient.get_validator_cache(decky_plugin.DECKY_PLUGIN_RUNTIME_DIR)
+            entry = await LibraryReader.run("HttpCache", cache.get, api_url)
+            headers = {"Accept": "application/vnd.github.v3+json", **HttpClient.get_conditional_headers(entry)}
             async with aiohttp.ClientSession(
                 connector=aiohttp.TCPConnector(ssl=_make_ssl_context())
             ) as session:
-                async with session.get(api_url, headers={"Accept": "application/vnd.github.v3+json"}) as response:
-                    if response.status != 200:
+                async with session.get(api_url, headers=headers) as response:
+                    if response.status == 304 and entry is not None:
+                        body = entry[2]
+                    elif response.status != 200:
                         return {
                             "Type": "Error",
                             "Content": {"Message": f"GitHub API returned status {response.status}"},
                         }
-                    release = await response.json()
+                    else:
+                        body = await response.read()
+                        await LibraryReader.run("HttpCache", cache.put, api_url, response.headers, body)
+            release = json.loads(body)
 
             latest_tag = release.get("tag_name", "")
             latest_version = latest_tag.lstrip("v")
@@ -774,6 +1663,53 @@ class Plugin:
             decky_plugin.logger.error(f"Error in execute_action: {e}")
             return None
 
+    async def cancel_action(
+        self, actionSet, actionName, inputData="", gameId="", appId="", *args, **kwargs
+    ):
+        """Kills running processes of an action, narrowed down by the same
+        arguments the frontend passed to execute_action."""
+        try:
+            count = Helper.cancel(actionSet, actionName, (*args, *kwargs.values()))
+            decky_plugin.logger.info(
+                f"cancel_action: {actionSet} {actionName} killed {count} process(es)"
+            )
+            return {"Type": "Cancelled", "Content": {"Count": count}}
+        except Exception as e:
+            decky_plugin.logger.error(f"Error in cancel_action: {e}")
+            return None
+
+    async def search_library(self, filter="", installed="false", cursor="", page_size=""):
+        """Searches every store's games at once; results carry a Store field
+        and page like the store grids, see Library.Library.search."""
+        try:
+            library = LibraryReader.get_library()
+            return await LibraryReader.run(
+                "Library",
+                library.search,
+                filter,
+                str(installed).lower() == "true",
+                cursor,
+                page_size or None,
+            )
+        except Exception as e:
+            decky_plugin.logger.error(f"Error in search_library: {e}")
+            return {
+                "Type": "Error",
+                "Content": {"Message": str(e)},
+            }
+
+    async def get_action_stats(self):
+        """Queueing statistics per action class, for diagnosing slow actions."""
+        return {
+            "Type": "ActionStats",
+            "Content": {
+                "Scheduler": ActionScheduler.get_stats(),
+                "InFlight": len(Helper.in_flight),
+                "SpawnsSaved": Helper.spawns_saved,
+                "ResponseCache": ResponseCache.get_stats(),
+            },
+        }
+
     async def download_custom_backend(self, url, backup: bool = False):
         try:
             runtime_dir = decky_plugin.DECKY_PLUGIN_RUNTIME_DIR
@@ -840,6 +1776,8 @@ class Plugin:
 
             # Clear action cache so new scripts are picked up
             Helper.action_cache.clear()
+            ResponseCache.clear()
+            SharedScripts.reset()
             decky_plugin.logger.info("Download and extraction completed successfully")
 
         except Exception as e:
@@ -855,32 +1793,8 @@ class Plugin:
 
     async def get_storage_stats(self):
         try:
-            runtime_dir = decky_plugin.DECKY_PLUGIN_RUNTIME_DIR
             home = os.path.abspath(decky_plugin.DECKY_USER_HOME)
 
-            STORES = {
-                "GOG": "gog.db",
-                "Epic": "epic.db",
-                "Amazon": "amazon.db",
-                "itch.io": "itchio.db",
-            }
-
-            def parse_size(size_str):
-                if not size_str or not isinstance(size_str, str):
-                    return 0
-                try:
-                    parts = size_str.strip().split()
-                    if len(parts) != 2:
-                        return 0
-                    value = float(parts[0])
-                    unit = parts[1].upper()
-                    if unit == "GB": return int(value * 1024**3)
-                    elif unit == "MB": return int(value * 1024**2)
-                    elif unit == "KB": return int(value * 1024)
-                    return 0
-                except Exception:
-                    return 0
-
             def fmt_bytes(size):
                 if size >= 1024**3: return f"{size / 1024**3:.2f} GB"
                 elif size >= 1024**2: return f"{size / 1024**2:.2f} MB"
@@ -908,54 +1822,44 @@ class Plugin:
                 Helper.dir_size_cache[path] = (total, now)
                 return total
 
-            stores = []
+            Library = SharedScripts.get("Library")
+            library = LibraryReader.get_library()
+
+            def read_library():
+                return library.get_stores(), library.get_installed_games()
+
+            # One query over every store's database
+            store_names, games = await LibraryReader.run("Library", read_library)
+            totals = {store: {"size_bytes": 0, "count": 0} for store in store_names}
             all_games = []
 
-            for store_name, db_filename in STORES.items():
-                db_path = os.path.join(runtime_dir, db_filename)
-                if not os.path.exists(db_path):
-                    continue
-                try:
-                    import sqlite3
-                    conn = sqlite3.connect(db_path)
-                    conn.execute("PRAGMA journal_mode=WAL;")
-                    conn.row_factory = sqlite3.Row
-                    c = conn.cursor()
-                    c.execute(
-                        "SELECT ShortName, Title, Size, InstallPath, RootFolder FROM Game "
-                        "WHERE SteamClientID IS NOT NULL AND SteamClientID <> ''"
-                    )
-                    games = c.fetchall()
-                    conn.close()
-
-                    store_total = 0
-                    for g in games:
-                        sb = parse_size(g["Size"])
-                        size_label = g["Size"]
-
-                        # If no size in DB, calculate from install directory
-                        if sb == 0:
-                            game_dir = g["RootFolder"] or g["InstallPath"]
-                            if game_dir and os.path.isdir(game_dir):
-                                sb = dir_size(game_dir)
-                                size_label = fmt_bytes(sb) if sb > 0 else None
-
-                        store_total += sb
-                        all_games.append({
-                            "shortname": g["ShortName"],
-                            "store": store_name,
-                            "title": g["Title"] or g["ShortName"],
-                            "size": size_label or "Unknown",
-                            "size_bytes": sb,
-                        })
-                    stores.append({
-                        "name": store_name,
-                        "size": fmt_bytes(store_total),
-                        "size_bytes": store_total,
-                        "count": len(games),
-                    })
-                except Exception as e:
-                    decky_plugin.logger.error(f"Error reading {store_name} DB: {e}")
+            for g in games:
+                store_name = Library.TITLES.get(g["Store"], g["Store"])
+                sb = g["SizeBytes"] or 0
+                size_label = g["Size"]
+
+                # If no size in DB, calculate from install directory
+                if sb == 0:
+                    game_dir = g["RootFolder"] or g["InstallPath"]
+                    if game_dir and os.path.isdir(game_dir):
+                        sb = dir_size(game_dir)
+                        size_label = fmt_bytes(sb) if sb > 0 else None
+
+                totals[g["Store"]]["size_bytes"] += sb
+                totals[g["Store"]]["count"] += 1
+                all_games.append({
+                    "shortname": g["ShortName"],
+                    "store": store_name,
+                    "title": g["Title"] or g["ShortName"],
+                    "size": size_label or "Unknown",
+                    "size_bytes": sb,
+                })
+            stores = [{
+                "name": Library.TITLES.get(store, store),
+                "size": fmt_bytes(total["size_bytes"]),
+                "size_bytes": total["size_bytes"],
+                "count": total["count"],
+            } for store, total in totals.items()]
 
             all_games.sort(key=lambda g: g["size_bytes"], reverse=True)
             stores.sort(key=lambda s: s["size_bytes"], reverse=True)
@@ -1067,6 +1971,9 @@ class Plugin:
 
             # Clear the action cache
             Helper.action_cache.clear()
+            ResponseCache.clear()
+            LibraryReader.close()
+            await StoreWorker.stop_all()
 
             decky_plugin.logger.info("GameVault out!")
         except Exception as e:
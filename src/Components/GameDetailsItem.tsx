@@ -2,7 +2,7 @@ import { Focusable, ServerAPI, ModalRoot, sleep, gamepadDialogClasses, showModal
 import { useState, useEffect, VFC, useRef } from "react";
 import GameDisplay from "./GameDisplay";
 import { ContentError, ContentResult, ContentType, EmptyContent, ExecuteGetGameDetailsArgs, ExecuteInstallArgs, GameDetails, GameImages, LaunchOptions, MenuAction, ProgressUpdate, ScriptActions } from "../Types/Types";
-import { runApp } from "../Utils/utils";
+import { runApp, setShortcutArtwork } from "../Utils/utils";
 import Logger from "../Utils/logger";
 import { Loading } from "./Loading";
 import { executeAction } from "../Utils/executeAction";
@@ -321,22 +321,7 @@ export const GameDetailsItem: VFC<GameDetailsItemProperties> = ({ serverAPI, sho
         }
         const images = imageResult.Content;
         logger.debug("images", images);
-        if (images.Grid !== null) {
-            logger.debug("setting grid image:" + id)
-            await SteamClient.Apps.SetCustomArtworkForApp(id, images.Grid, 'png', 0);
-        }
-        if (images.Hero !== null) {
-            logger.debug("setting hero image:" + id)
-            await SteamClient.Apps.SetCustomArtworkForApp(id, images.Hero, "png", 1);
-        }
-        if (images.Logo !== null) {
-            logger.debug("setting logo image:" + id)
-            await SteamClient.Apps.SetCustomArtworkForApp(id, images.Logo, "png", 2);
-        }
-        if (images.GridH !== null) {
-            logger.debug("setting gridh image:" + id)
-            await SteamClient.Apps.SetCustomArtworkForApp(id, images.GridH, "png", 3);
-        }
+        await setShortcutArtwork(serverAPI, id, images);
     };
 
     const cleanupIds = () => {
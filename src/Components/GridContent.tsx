@@ -1,10 +1,10 @@
 import { DialogButton, Focusable, Menu, MenuItem, Navigation, ProgressBar, ServerAPI, Spinner, TextField, gamepadTabbedPageClasses, showContextMenu, showModal } from "decky-frontend-lib";
-import { ContentResult, ContentType, ExecuteArgs, GameData, GameDataList, MenuAction, ScriptActions } from "../Types/Types";
+import { ContentResult, ContentType, ExecuteArgs, ExecuteGetContentArgs, GameData, GameDataList, MenuAction, ScriptActions } from "../Types/Types";
 import { Dispatch, SetStateAction, VFC, memo, useEffect, useRef, useState } from "react";
 import GameGridItem from './GameGridItem';
 import { GameDetailsItem } from './GameDetailsItem';
 import Logger from "../Utils/logger";
-import { FaSlidersH, FaCog, FaRegCheckCircle } from 'react-icons/fa';
+import { FaSlidersH, FaCog, FaRegCheckCircle, FaSortAmountDown } from 'react-icons/fa';
 import { LoginContent } from './LoginContent';
 import { executeAction } from '../Utils/executeAction';
 import { ConfEditor } from '../ConfEditor';
@@ -18,18 +18,41 @@ interface GridContentArgs {
     filter?: string;
     installed?: boolean;
     limited?: boolean;
+    sort?: string;
 }
 
 interface GridContentCache {
     filter: string;
     installed: boolean;
+    sort?: string;
+}
+
+// getgames sort orders, "" is by title (or best match while searching)
+const sortOptions: { value: string; label: string; }[] = [
+    { value: "", label: "Title" },
+    { value: "sortingtitle", label: "Sorting Title" },
+    { value: "releasedate", label: "Release Date" },
+    { value: "size", label: "Size" },
+    { value: "installed", label: "Installed First" },
+];
+
+//* getgames reads its arguments by position: filter, installed, limited, cursor, page size, sort
+export function gridContentArgs(args: GridContentArgs, cursor: string = ""): ExecuteGetContentArgs {
+    return {
+        filter: args.filter ?? "",
+        installed: String(args.installed ?? false),
+        limited: String(args.limited ?? true),
+        cursor: cursor,
+        page_size: "",
+        sort: args.sort ?? "",
+    };
 }
 
 interface GridContentProps {
     content: GameDataList;
     serverAPI: ServerAPI;
     initActionSet: string;
-    refreshContent: (actionArgs: GridContentArgs, onFinish?: () => void) => void;
+    refreshContent: (actionArgs: ExecuteGetContentArgs, onFinish?: () => void) => void;
     argsCache: GridContentCache;
     setArgsCache: Dispatch<SetStateAction<GridContentCache>>;
 }
@@ -45,6 +68,48 @@ export const GridContent: VFC<GridContentProps> = ({ content, serverAPI, initAct
     const [selectMode, setSelectMode] = useState(false);
     const [selectedGames, setSelectedGames] = useState<Set<string>>(new Set());
     const [queueState, setQueueState] = useState<QueueState>(installQueue.getState());
+    const [games, setGames] = useState<GameData[]>(content.Games ?? []);
+    const [nextCursor, setNextCursor] = useState(content.NextCursor);
+    const [pageLoading, setPageLoading] = useState(false);
+    // The loader's observer outlives renders, so it reads the current page state from refs
+    const pageCursorRef = useRef(content.NextCursor);
+    const pageRequestRef = useRef<string>();
+    const pageArgsRef = useRef<GridContentArgs>({});
+    pageArgsRef.current = { ...argsCache, limited: isLimited };
+
+    useEffect(() => {
+        // A fresh first page (new filter, toggle, refresh) replaces the pages loaded so far
+        setGames(content.Games ?? []);
+        setNextCursor(content.NextCursor);
+        pageCursorRef.current = content.NextCursor;
+        pageRequestRef.current = undefined;
+        setPageLoading(false);
+    }, [content]);
+
+    const loadNextPage = async () => {
+        const cursor = pageCursorRef.current;
+        if (!cursor || pageRequestRef.current === cursor) return;
+        pageRequestRef.current = cursor;
+        setPageLoading(true);
+        try {
+            const res = await executeAction<ExecuteGetContentArgs, GameDataList>(serverAPI, initActionSet, "GetContent", gridContentArgs(pageArgsRef.current, cursor));
+            // Drop the page if the grid was reloaded while it was being fetched
+            if (pageCursorRef.current !== cursor) return;
+            if (res) {
+                setGames(prev => prev.concat(res.Content.Games ?? []));
+                setNextCursor(res.Content.NextCursor);
+                pageCursorRef.current = res.Content.NextCursor;
+            }
+            else {
+                pageRequestRef.current = undefined;
+            }
+        }
+        catch (e) {
+            logger.error(e);
+            pageRequestRef.current = undefined;
+        }
+        setPageLoading(false);
+    };
 
     useEffect(() => {
         installQueue.setServerAPI(serverAPI);
@@ -67,8 +132,8 @@ export const GridContent: VFC<GridContentProps> = ({ content, serverAPI, initAct
     };
 
     const startBatchInstall = () => {
-        const games = content.Games?.filter(g => selectedGames.has(g.ShortName)) ?? [];
-        games.forEach(g => installQueue.add(g.ShortName, g.Name, initActionSet));
+        const selected = games.filter(g => selectedGames.has(g.ShortName));
+        selected.forEach(g => installQueue.add(g.ShortName, g.Name, initActionSet));
         setSelectMode(false);
         setSelectedGames(new Set());
         installQueue.start();
@@ -108,7 +173,7 @@ export const GridContent: VFC<GridContentProps> = ({ content, serverAPI, initAct
                             };
                             const result = await executeAction<ExecuteArgs, ContentResult<ContentType>>(serverAPI, initActionSet, action.ActionId, args);
                             if (result?.Type == "RefreshContent") {
-                                refreshContent({ ...argsCache, limited: isLimited });
+                                refreshContent(gridContentArgs({ ...argsCache, limited: isLimited }));
                             }
                             logger.debug("runScript result", result);
                         }}
@@ -121,10 +186,23 @@ export const GridContent: VFC<GridContentProps> = ({ content, serverAPI, initAct
         );
     };
 
+    const sortMenu = (e: any) => {
+        showContextMenu(
+            <Menu label="Sort By" cancelText="Cancel" onCancel={() => { }}>
+                {sortOptions.map((option) =>
+                    <MenuItem onSelected={() => updateCache('sort', option.value)}>
+                        {option.label}{(argsCache.sort ?? "") === option.value ? " \u2713" : ""}
+                    </MenuItem>
+                )}
+            </Menu>,
+            e.currentTarget ?? window
+        );
+    };
+
     const updateCache: <Param extends keyof GridContentArgs>(param: Param, value: GridContentArgs[Param], onFinish?: () => void) => void =
         (param, value, onFinish) => {
             const newCache = { ...argsCache, [param]: value };
-            refreshContent({ ...newCache, limited: isLimited }, () => {
+            refreshContent(gridContentArgs({ ...newCache, limited: isLimited }), () => {
                 setArgsCache(newCache);
                 onFinish?.();
             });
@@ -139,7 +217,7 @@ export const GridContent: VFC<GridContentProps> = ({ content, serverAPI, initAct
             }}
             onOptionsButton={() => {
                 setIsLimitedLoading(true);
-                refreshContent({ ...argsCache, limited: !isLimited }, () => {
+                refreshContent(gridContentArgs({ ...argsCache, limited: !isLimited }), () => {
                     setIsLimited(!isLimited);
                     setIsLimitedLoading(false);
                 });
@@ -180,6 +258,12 @@ export const GridContent: VFC<GridContentProps> = ({ content, serverAPI, initAct
                         }}
                     />
                 </div>
+                <DialogButton
+                    onClick={sortMenu}
+                    style={{ width: "48px", minWidth: 'initial', padding: 'initial' }}
+                >
+                    <FaSortAmountDown style={{ verticalAlign: 'middle' }} />
+                </DialogButton>
                 <DialogButton
                     onClick={actionsMenu}
                     disabled={!scriptActions}
@@ -194,7 +278,7 @@ export const GridContent: VFC<GridContentProps> = ({ content, serverAPI, initAct
                             initActionSet={initActionSet}
                             initAction="GetTabConfigActions"
                             contentId="0"
-                            refreshParent={() => refreshContent({ ...argsCache, limited: isLimited })}
+                            refreshParent={() => refreshContent(gridContentArgs({ ...argsCache, limited: isLimited }))}
                         />
                     )}
                     style={{ width: "48px", minWidth: 'initial', padding: 'initial' }}
@@ -277,7 +361,7 @@ export const GridContent: VFC<GridContentProps> = ({ content, serverAPI, initAct
                     <div style={{ backgroundColor: '#8b929a66', flex: 'auto', height: '1px' }} />
                 </div>
             )}
-            {content.Games?.length === 0 && (
+            {games.length === 0 && (
                 <div style={{ textAlign: 'center', padding: '15px' }}>
                    
                     {argsCache.filter !== "" && (
@@ -294,17 +378,41 @@ export const GridContent: VFC<GridContentProps> = ({ content, serverAPI, initAct
             )}
             <GridItems
                 serverAPI={serverAPI}
-                games={content.Games ?? []}
+                games={games}
                 initActionSet={initActionSet}
                 initAction=""
                 selectMode={selectMode}
                 selectedGames={selectedGames}
                 onToggleSelect={toggleSelection}
             />
+            {nextCursor && <NextPageLoader key={nextCursor} loading={pageLoading} onVisible={loadNextPage} />}
         </Focusable>
     );
 };
 
+interface NextPageLoaderProps {
+    loading: boolean;
+    onVisible: () => void;
+}
+
+//* sits under the grid and asks for the next page once the user scrolls close to it
+const NextPageLoader: VFC<NextPageLoaderProps> = ({ loading, onVisible }) => {
+    const ref = useRef<HTMLDivElement>(null);
+    useEffect(() => {
+        const observer = new IntersectionObserver(([entry]) => entry.isIntersecting && onVisible(), { root: null, rootMargin: '0px 0px 1500px 0px', threshold: 0 });
+        if (ref.current) {
+            observer.observe(ref.current);
+        }
+        return () => observer.disconnect();
+    }, []);
+
+    return (
+        <div ref={ref} style={{ display: 'flex', justifyContent: 'center', padding: '15px' }}>
+            {loading && <Spinner style={{ width: '28px' }} />}
+        </div>
+    );
+};
+
 interface GridItemsProperties {
     games: GameData[];
     serverAPI: ServerAPI;
@@ -5,7 +5,7 @@ import Logger from "./Utils/logger";
 import { executeAction } from "./Utils/executeAction";
 import { Loading } from "./Components/Loading";
 import { ErrorDisplay } from "./Components/ErrorDisplay";
-import { GridContent, contentTabsContainerClass } from "./Components/GridContent";
+import { GridContent, contentTabsContainerClass, gridContentArgs } from "./Components/GridContent";
 import { HtmlContent } from "./HtmlContent";
 import { TextContent } from "./TextContent";
 import { MainMenu } from "./MainMenu";
@@ -104,7 +104,7 @@ export const Content: VFC<{ serverAPI: ServerAPI; initActionSet: string; initAct
                 if (actionSetRes === null) return;
 
                 const actionSet = actionSetRes.Content;
-                const contentRes = await getContent(actionSet.SetName, hadGridCache ? stringifyArgs(gridContentCache) : {});
+                const contentRes = await getContent(actionSet.SetName, hadGridCache ? stringifyArgs(gridContentArgs(gridContentCache)) : {});
                 if (contentRes === null) return;
 
                 setActionSetName(actionSet.SetName);
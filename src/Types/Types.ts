@@ -83,6 +83,7 @@ export interface ScriptActions extends ContentType {
 export interface GameDataList extends ContentType {
   NeedsLogin?: string;
   storeURL?: string;
+  NextCursor?: string;
   Games: GameData[];
 }
 export interface GameData {
@@ -132,11 +133,15 @@ export interface ProgressUpdate extends ContentType {
   Description: string;
   Error?: string;
 }
+// Paths into the plugin's image cache, or base64 when there is no cache
 export interface GameImages extends ContentType {
-  Grid: string;
-  GridH: string;
-  Hero: string;
-  Logo: string;
+  Grid: string | null;
+  GridH: string | null;
+  Hero: string | null;
+  Logo: string | null;
+}
+export interface GameImagesBatch extends ContentType {
+  Images: { [shortname: string]: GameImages };
 }
 export interface SectionEditorProps {
   section: Section;
@@ -220,6 +225,9 @@ export interface ExecuteGetContentArgs extends ExecuteArgs {
   filter?: string;
   installed?: string;
   limited?: string;
+  cursor?: string;
+  page_size?: string;
+  sort?: string;
 }
 
 export interface ExecuteLoginArgs extends ExecuteArgs {
@@ -81,6 +81,11 @@ export async function executeAction<Arguments extends ExecuteArgs, Content exten
         }
     }
 
+    if (res.result.Type === 'Cancelled') {
+        logger.log(`${actionName} was cancelled`);
+        return null;
+    }
+
     if (res.result.Type === 'Error') {
         const error = res.result.Content as ContentError; //only acceptable if this is gauranteed that in this case (res.result.Type === 'Error') Content is indeed ContentError
         showModal(<ErrorModal Error={error} />);
@@ -89,4 +94,14 @@ export async function executeAction<Arguments extends ExecuteArgs, Content exten
     }
 
     return res.result as ContentResult<Content>; //only acceptable because we've handle the other possibilities explicitly
-}
\ No newline at end of file
+}
+
+//* kills a running action; args narrow it down the same way they are passed to executeAction
+export async function cancelAction<Arguments extends ExecuteArgs>(serverAPI: ServerAPI, actionSet: string, actionName: string, args: Arguments): Promise<number> {
+    const res = await serverAPI.callPluginMethod<{}, ContentResult<{ Count: number }>>("cancel_action", {
+        actionSet: actionSet,
+        actionName: actionName,
+        ...args
+    });
+    return res.success && res.result ? res.result.Content.Count : 0;
+}
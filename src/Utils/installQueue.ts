@@ -1,6 +1,7 @@
 import { ServerAPI, sleep } from "decky-frontend-lib";
-import { ContentResult, ContentType, ExecuteGetGameDetailsArgs, ExecuteInstallArgs, GameDetails, GameImages, LaunchOptions, ProgressUpdate } from "../Types/Types";
-import { executeAction } from "./executeAction";
+import { ContentResult, ContentType, ExecuteArgs, ExecuteGetGameDetailsArgs, ExecuteInstallArgs, GameDetails, GameImages, GameImagesBatch, LaunchOptions, ProgressUpdate } from "../Types/Types";
+import { cancelAction, executeAction } from "./executeAction";
+import { setShortcutArtwork } from "./utils";
 import Logger from "./logger";
 
 export type QueueItemStatus = "queued" | "downloading" | "installing" | "done" | "error";
@@ -160,8 +161,8 @@ class InstallQueue {
 
     remove(shortname: string) {
         const item = this.state.items.find(i => i.shortname === shortname);
-        if (item && item.status === "downloading") {
-            // Cancel active download
+        if (item && (item.status === "downloading" || item.status === "installing")) {
+            // Cancel active download or install
             this.cancelItem(shortname);
             return;
         }
@@ -180,11 +181,28 @@ class InstallQueue {
             } catch (e) {
                 logger.error("Failed to cancel download", e);
             }
+        } else if (item.status === "installing") {
+            await this.cancelInstall(item);
         }
         this.state.items = this.state.items.filter(i => i.shortname !== shortname);
         this.notify();
     }
 
+    /**
+     * Kill the item's running Install action; processItem sees the item gone
+     * from the queue and stops there.
+     */
+    private async cancelInstall(item: QueueItem) {
+        if (!this.serverAPI) return;
+        try {
+            await cancelAction<ExecuteGetGameDetailsArgs>(
+                this.serverAPI, item.initActionSet, "Install", { shortname: item.shortname }
+            );
+        } catch (e) {
+            logger.error("Failed to cancel install", e);
+        }
+    }
+
     clear() {
         if (this.state.isProcessing) {
             this.cancelled = true;
@@ -196,6 +214,10 @@ class InstallQueue {
                 this.serverAPI, downloading.initActionSet, "CancelInstall", { shortname: downloading.shortname }
             ).catch(() => {});
         }
+        const installing = this.state.items.find(i => i.status === "installing");
+        if (installing) {
+            this.cancelInstall(installing);
+        }
         this.state.items = [];
         this.state.isProcessing = false;
         this.notify();
@@ -256,6 +278,7 @@ class InstallQueue {
         const myGeneration = this.runGeneration;
         this.state.isProcessing = true;
         this.notify();
+        this.prefetchArtwork();
 
         // Continuously drain the queue — new items added during processing
         // will be picked up automatically
@@ -285,6 +308,25 @@ class InstallQueue {
         }
     }
 
+    /**
+     * Resolve the artwork of everything queued in one batch per store, so by
+     * the time each game is added to Steam its images are already cached.
+     */
+    private prefetchArtwork() {
+        const api = this.serverAPI;
+        if (!api) return;
+        const byActionSet = new Map<string, string[]>();
+        for (const item of this.state.items.filter(i => i.status === "queued")) {
+            byActionSet.set(item.initActionSet, [...(byActionSet.get(item.initActionSet) ?? []), item.shortname]);
+        }
+        byActionSet.forEach((shortnames, actionSet) => {
+            if (shortnames.length < 2) return;
+            executeAction<ExecuteArgs, GameImagesBatch>(
+                api, actionSet, "GetJsonImagesBatch", { inputData: JSON.stringify(shortnames) }
+            ).catch((e) => logger.error("Failed to prefetch artwork", e));
+        });
+    }
+
     private async processItem(item: QueueItem) {
         const api = this.serverAPI!;
 
@@ -402,6 +444,8 @@ class InstallQueue {
                 api, item.initActionSet, "Install",
                 { shortname: item.shortname, steamClientID: steamId.toString() }
             );
+            // Removed from the queue while installing, the install was cancelled
+            if (!this.state.items.includes(item)) return;
 
             if (installResult && installResult.Type === "LaunchOptions") {
                 const launchOptions = installResult.Content as LaunchOptions;
@@ -447,11 +491,7 @@ class InstallQueue {
             );
 
             if (imageResult) {
-                const images = imageResult.Content;
-                if (images.Grid) await SteamClient.Apps.SetCustomArtworkForApp(steamId, images.Grid, 'png', 0);
-                if (images.Hero) await SteamClient.Apps.SetCustomArtworkForApp(steamId, images.Hero, 'png', 1);
-                if (images.Logo) await SteamClient.Apps.SetCustomArtworkForApp(steamId, images.Logo, 'png', 2);
-                if (images.GridH) await SteamClient.Apps.SetCustomArtworkForApp(steamId, images.GridH, 'png', 3);
+                await setShortcutArtwork(api, steamId, imageResult.Content);
             }
 
             item.status = "done";
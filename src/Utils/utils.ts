@@ -1,4 +1,5 @@
-import { LaunchOptions } from "../Types/Types";
+import { ServerAPI } from "decky-frontend-lib";
+import { GameImages, LaunchOptions } from "../Types/Types";
 import Logger from "./logger";
 
 export enum AppRunStateChange {
@@ -80,4 +81,44 @@ export function configureShortcut(id: number, launchOptions: LaunchOptions) {
             SteamClient.Apps.SpecifyCompatTool(id, launchOptions.CompatToolName ?? '');
         }
     }
-}
\ No newline at end of file
+}
+
+// GetJsonImages answers with paths into the plugin's image cache (/images/<hash>),
+// served by its local web server. Steam only takes artwork as base64, so the
+// file is fetched and encoded here. Anything else is already base64.
+export async function getArtwork(serverAPI: ServerAPI, image: string | null): Promise<string | null> {
+    if (!image || !image.startsWith("/images/")) {
+        return image;
+    }
+    const logger = new Logger("getArtwork");
+    try {
+        const port = await serverAPI.callPluginMethod<{}, number>("get_websocket_port", {});
+        if (!port.success) {
+            return null;
+        }
+        const response = await fetch(`http://localhost:${port.result}${image}`);
+        if (!response.ok) {
+            logger.error(`Failed to fetch ${image}: ${response.status}`);
+            return null;
+        }
+        const blob = await response.blob();
+        return await new Promise<string | null>((resolve) => {
+            const reader = new FileReader();
+            reader.onloadend = () => resolve(typeof reader.result === "string" ? reader.result.split(",")[1] : null);
+            reader.readAsDataURL(blob);
+        });
+    } catch (e) {
+        logger.error(`Failed to fetch ${image}`, e);
+        return null;
+    }
+}
+
+export async function setShortcutArtwork(serverAPI: ServerAPI, appId: number, images: GameImages) {
+    const assets: [keyof GameImages, number][] = [["Grid", 0], ["Hero", 1], ["Logo", 2], ["GridH", 3]];
+    for (const [slot, assetType] of assets) {
+        const data = await getArtwork(serverAPI, images[slot] as string | null);
+        if (data) {
+            await SteamClient.Apps.SetCustomArtworkForApp(appId, data, 'png', assetType);
+        }
+    }
+}